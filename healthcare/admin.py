@@ -1,15 +1,17 @@
 from django.contrib import admin
-from .models import Patient, Doctor, Address, Admin
+from .models import Patient, Doctor, Address, Admin, ProfilePictureUpload, Notification, AppointmentSeries, WaitlistEntry, MedicalHistoryEntry, Medication, MedicationInteraction, DoctorPatient
 
 @admin.register(Patient)
 class PatientAdmin(admin.ModelAdmin):
     list_display = ['user', 'full_name', 'phone', 'date_of_birth']
-    search_fields = ['user__username', 'user__first_name', 'user__last_name', 'phone']
+    list_select_related = ['user']
+    search_fields = ['display_name', 'user__username', 'phone']
 
 @admin.register(Doctor)
 class DoctorAdmin(admin.ModelAdmin):
     list_display = ['user', 'full_name', 'specialization', 'license_number']
-    search_fields = ['user__username', 'user__first_name', 'user__last_name', 'specialization']
+    list_select_related = ['user']
+    search_fields = ['display_name', 'user__username', 'specialization']
 
 @admin.register(Address)
 class AddressAdmin(admin.ModelAdmin):
@@ -19,4 +21,62 @@ class AddressAdmin(admin.ModelAdmin):
 @admin.register(Admin)
 class AdminAdmin(admin.ModelAdmin):
     list_display = ['user', 'phone']
+    list_select_related = ['user']
     search_fields = ['user__username', 'user__first_name', 'user__last_name', 'phone']
+
+@admin.register(ProfilePictureUpload)
+class ProfilePictureUploadAdmin(admin.ModelAdmin):
+    list_display = ['original_name', 'user', 'profile_type', 'status', 'created_at']
+    list_select_related = ['user']
+    list_filter = ['status', 'profile_type']
+    search_fields = ['user__username', 'original_name']
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'channel', 'destination', 'status', 'attempts', 'send_after', 'sent_at']
+    list_filter = ['status', 'channel', 'kind']
+    search_fields = ['destination', 'recipient__username', 'dedupe_key']
+    raw_id_fields = ['recipient', 'appointment']
+
+@admin.register(AppointmentSeries)
+class AppointmentSeriesAdmin(admin.ModelAdmin):
+    list_display = ['patient', 'doctor', 'frequency', 'interval', 'start_date', 'appointment_time', 'count', 'until']
+    list_select_related = ['patient', 'doctor']
+    list_filter = ['frequency']
+    raw_id_fields = ['patient', 'doctor', 'created_by']
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ['patient', 'doctor', 'specialization', 'earliest_date', 'latest_date', 'priority', 'status', 'offer_expires_at', 'created_at']
+    list_select_related = ['patient', 'doctor']
+    list_filter = ['status', 'priority']
+    list_editable = ['priority']
+    raw_id_fields = ['patient', 'doctor', 'offered_appointment']
+
+@admin.register(MedicalHistoryEntry)
+class MedicalHistoryEntryAdmin(admin.ModelAdmin):
+    list_display = ['patient', 'entry_type', 'title', 'recorded_on', 'recorded_by']
+    list_select_related = ['patient', 'recorded_by']
+    list_filter = ['entry_type']
+    search_fields = ['title']
+    raw_id_fields = ['patient', 'recorded_by']
+
+@admin.register(Medication)
+class MedicationAdmin(admin.ModelAdmin):
+    list_display = ['name', 'drug_class']
+    list_filter = ['drug_class']
+    search_fields = ['name']
+
+@admin.register(MedicationInteraction)
+class MedicationInteractionAdmin(admin.ModelAdmin):
+    list_display = ['medication', 'interacts_with', 'severity']
+    list_select_related = ['medication', 'interacts_with']
+    list_filter = ['severity']
+    search_fields = ['medication__name', 'interacts_with__name']
+    raw_id_fields = ['medication', 'interacts_with']
+
+@admin.register(DoctorPatient)
+class DoctorPatientAdmin(admin.ModelAdmin):
+    list_display = ['doctor', 'patient', 'first_visit', 'last_visit', 'visit_count']
+    list_select_related = ['doctor', 'patient']
+    raw_id_fields = ['doctor', 'patient']
@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.models.signals import post_migrate
 
 
 class HealthcareConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'healthcare'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .demo import setup_demo_after_migrate
+        from .notifications import check_notification_backends
+        from .sessions import check_session_cache
+
+        post_migrate.connect(setup_demo_after_migrate, sender=self)
+        checks.register(check_session_cache, checks.Tags.caches)
+        checks.register(check_notification_backends)
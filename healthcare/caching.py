@@ -0,0 +1,208 @@
+"""
+Response caching for the role dashboards.
+
+Rendered dashboard pages are cached per user and keyed on the request path,
+query string (the ``filter`` parameter), the current date and two data-version
+stamps: a global one that is bumped whenever a profile changes, and a per-user
+one that is bumped whenever one of the user's appointments or prescriptions
+changes. The stamps are bumped from model signals (see ``signals.py``), so a
+cached page is simply never looked up again once its data is out of date.
+
+Pages with forms embed a CSRF token. On a cache hit, the cached tokens are
+replaced with one for the current request, which also makes the CSRF
+middleware set the cookie it belongs to.
+"""
+
+import hashlib
+import logging
+import re
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_VERSION_KEY = 'healthcare:data_version'
+USER_VERSION_KEY = 'healthcare:data_version:user:{}'
+VIEW_KEY = 'healthcare:view:{name}:{user_id}:{path}:{stamp}'
+HITS_KEY = 'healthcare:cache_stats:hits'
+# The hidden input {% csrf_token %} renders
+CSRF_INPUT = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*"')
+MISSES_KEY = 'healthcare:cache_stats:misses'
+
+
+def _new_stamp():
+    # Stamps are timestamps rather than counters so that a stamp evicted from
+    # the cache can never be recreated with a value an old entry was keyed on.
+    return time.time_ns()
+
+
+def get_data_versions(user_id):
+    """
+    Get the global and per-user data-version stamps in one cache round trip.
+
+    Returns:
+        tuple: (global stamp, user stamp)
+    """
+    user_key = USER_VERSION_KEY.format(user_id)
+    stamps = cache.get_many([GLOBAL_VERSION_KEY, user_key])
+    for key in (GLOBAL_VERSION_KEY, user_key):
+        if key not in stamps:
+            cache.add(key, _new_stamp(), timeout=None)
+            stamps[key] = cache.get(key)
+    return stamps[GLOBAL_VERSION_KEY], stamps[user_key]
+
+
+async def aget_data_versions(user_id):
+    """Async version of get_data_versions()"""
+    user_key = USER_VERSION_KEY.format(user_id)
+    stamps = await cache.aget_many([GLOBAL_VERSION_KEY, user_key])
+    for key in (GLOBAL_VERSION_KEY, user_key):
+        if key not in stamps:
+            await cache.aadd(key, _new_stamp(), timeout=None)
+            stamps[key] = await cache.aget(key)
+    return stamps[GLOBAL_VERSION_KEY], stamps[user_key]
+
+
+def bump_data_version(*user_ids):
+    """
+    Invalidate cached dashboards.
+
+    With user ids, only the dashboards of those users are invalidated;
+    without, every cached dashboard is.
+    """
+    stamp = _new_stamp()
+    if user_ids:
+        cache.set_many({USER_VERSION_KEY.format(user_id): stamp for user_id in user_ids if user_id}, timeout=None)
+    else:
+        cache.set(GLOBAL_VERSION_KEY, stamp, timeout=None)
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counter missing or evicted; start it again.
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+async def _aincr(key):
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        if not await cache.aadd(key, 1, timeout=None):
+            await cache.aincr(key)
+
+
+def get_cache_stats():
+    """
+    Get dashboard cache hit/miss counters.
+
+    Returns:
+        dict: hits, misses and hit_ratio (percentage)
+    """
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits * 100 / total, 1) if total else 0,
+    }
+
+
+def _cache_timeout():
+    return getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+
+def _is_cacheable_request(request):
+    return request.method == 'GET' and _cache_timeout() and not len(messages.get_messages(request))
+
+
+def _is_cacheable_response(request, response):
+    # Don't cache a page that has a flash message added by the view baked into it
+    messages_added = messages.get_messages(request).added_new
+    return response.status_code == 200 and not response.streaming and not messages_added
+
+
+def _with_fresh_csrf_token(request, response):
+    """Give the forms of a cached page a CSRF token for this request"""
+    if b'csrfmiddlewaretoken' in response.content:
+        token = get_token(request).encode()
+        response.content = CSRF_INPUT.sub(lambda match: match.group(1) + token + b'"', response.content)
+    return response
+
+
+def _view_key(view_func, request, user, global_stamp, user_stamp):
+    return VIEW_KEY.format(
+        name=view_func.__name__,
+        user_id=user.pk,
+        path=hashlib.md5(request.get_full_path().encode()).hexdigest(),
+        stamp='{}.{}.{}.{}'.format(
+            global_stamp,
+            user_stamp,
+            timezone.localdate().isoformat(),
+            int(bool(request.session.get('is_demo_user'))),
+        ),
+    )
+
+
+def cache_dashboard(view_func):
+    """
+    Cache the rendered response of a dashboard view per user.
+
+    Only successful GET responses are cached, and requests with pending flash
+    messages always go to the view so the messages get rendered. Works on both
+    sync and async views.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_view(request, *args, **kwargs):
+            # Resolve the user without a sync database hit, so request.user
+            # stays usable in the async view and its templates
+            user = request.user = await request.auser()
+            if not _is_cacheable_request(request):
+                return await view_func(request, *args, **kwargs)
+
+            key = _view_key(view_func, request, user, *await aget_data_versions(user.pk))
+            response = await cache.aget(key)
+            if response is not None:
+                await _aincr(HITS_KEY)
+                logger.debug(f'Dashboard cache hit for {view_func.__name__} (user {user.pk})')
+                return _with_fresh_csrf_token(request, response)
+
+            await _aincr(MISSES_KEY)
+            response = await view_func(request, *args, **kwargs)
+            if _is_cacheable_response(request, response):
+                await cache.aset(key, response, _cache_timeout())
+            return response
+
+        return _wrapped_view
+
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if not _is_cacheable_request(request):
+            return view_func(request, *args, **kwargs)
+
+        key = _view_key(view_func, request, request.user, *get_data_versions(request.user.pk))
+        response = cache.get(key)
+        if response is not None:
+            _incr(HITS_KEY)
+            logger.debug(f'Dashboard cache hit for {view_func.__name__} (user {request.user.pk})')
+            return _with_fresh_csrf_token(request, response)
+
+        _incr(MISSES_KEY)
+        response = view_func(request, *args, **kwargs)
+        if _is_cacheable_response(request, response):
+            cache.set(key, response, _cache_timeout())
+        return response
+
+    return _wrapped_view
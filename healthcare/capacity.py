@@ -0,0 +1,149 @@
+"""
+Doctor capacity: the daily patient limit and working hours from DoctorSettings.
+
+Checking a booking against capacity needs two numbers: the doctor's limits
+and how many appointments they already have that day. Both are kept in the
+cache, so a check is a few O(1) lookups. The booked count is a plain integer
+per doctor and day, recounted with one indexed COUNT when it is missing. It is
+keyed on a version stamp of the doctor's day, which the appointment signals
+bump whenever that day changes. A count taken before a change committed is
+stored under the old stamp, so it can't overwrite the invalidation and is
+never read again; it expires after ``BOOKED_TIMEOUT``.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Appointment, Doctor, DoctorSettings
+
+logger = logging.getLogger(__name__)
+
+BOOKED_KEY = 'healthcare:capacity:booked:{}:{:%Y%m%d}:{}'
+BOOKED_VERSION_KEY = 'healthcare:capacity:booked_version:{}:{:%Y%m%d}'
+# Counts and stamps of days nobody checks any more drop out of the cache after a day
+BOOKED_TIMEOUT = 60 * 60 * 24
+LIMITS_KEY = 'healthcare:capacity:limits:{}'
+
+# Appointments that don't take up a place
+FREE_STATUSES = ['cancelled']
+
+# Limits of doctors who never saved their practice settings: no working
+# hours are enforced, only the default daily limit
+DEFAULT_LIMITS = (DoctorSettings._meta.get_field('max_patients_per_day').default, None, None)
+
+
+def get_limits(doctor_id):
+    """
+    Get a doctor's capacity limits.
+
+    Returns:
+        tuple: (max patients per day, working hours start, working hours end);
+        the hours are None when the doctor has no practice settings
+    """
+    key = LIMITS_KEY.format(doctor_id)
+    limits = cache.get(key)
+    if limits is None:
+        row = (
+            DoctorSettings.objects
+            .filter(doctor_id=doctor_id)
+            .values_list('max_patients_per_day', 'working_hours_start', 'working_hours_end')
+            .first()
+        )
+        limits = row or DEFAULT_LIMITS
+        cache.set(key, limits, timeout=None)
+    return limits
+
+
+def get_booked_count(doctor_id, date):
+    """Get the number of appointments taking up a place in a doctor's day"""
+    version_key = BOOKED_VERSION_KEY.format(doctor_id, date)
+    stamp = cache.get(version_key)
+    if stamp is None:
+        # Timestamps, like the dashboard stamps, so an evicted stamp never comes back with an old value
+        cache.add(version_key, time.time_ns(), timeout=BOOKED_TIMEOUT)
+        stamp = cache.get(version_key)
+    key = BOOKED_KEY.format(doctor_id, date, stamp)
+    count = cache.get(key)
+    if count is None:
+        count = (
+            Appointment.objects
+            .filter(doctor_id=doctor_id, appointment_date=date)
+            .exclude(status__in=FREE_STATUSES)
+            .count()
+        )
+        cache.set(key, count, timeout=BOOKED_TIMEOUT)
+    return count
+
+
+def invalidate_booked_counts(doctor_days):
+    """Give (doctor_id, date) pairs new version stamps after their appointments changed"""
+    stamp = time.time_ns()
+    cache.set_many(
+        {BOOKED_VERSION_KEY.format(doctor_id, date): stamp for doctor_id, date in set(doctor_days) if doctor_id and date},
+        timeout=BOOKED_TIMEOUT,
+    )
+
+
+def invalidate_limits(doctor_id):
+    cache.delete(LIMITS_KEY.format(doctor_id))
+
+
+def check_capacity(doctor_id, date, time):
+    """
+    Check whether a doctor can take another appointment at a slot.
+
+    Returns:
+        str: Why the slot is over capacity, or None when it fits
+    """
+    max_per_day, start, end = get_limits(doctor_id)
+    if start and end and not start <= time < end:
+        return f"Outside the doctor's working hours ({start:%H:%M}-{end:%H:%M})."
+    if get_booked_count(doctor_id, date) >= max_per_day:
+        return 'The doctor is fully booked on this day.'
+    return None
+
+
+def utilization_heatmap(weeks=4, start=None):
+    """
+    Booked places against the daily limit for every doctor over the next weeks.
+
+    All appointment counts come from one grouped query.
+
+    Returns:
+        tuple: (list of dates, list of (doctor, list of cells)), where each
+        cell is a dict with date, booked, limit and percent
+    """
+    start = start or timezone.localdate()
+    dates = [start + timedelta(days=offset) for offset in range(weeks * 7)]
+    booked = {
+        (row['doctor_id'], row['appointment_date']): row['booked']
+        for row in (
+            Appointment.objects
+            .filter(appointment_date__range=(dates[0], dates[-1]))
+            .exclude(status__in=FREE_STATUSES)
+            .order_by()
+            .values('doctor_id', 'appointment_date')
+            .annotate(booked=Count('id'))
+        )
+    }
+    limits = dict(DoctorSettings.objects.values_list('doctor_id', 'max_patients_per_day'))
+
+    rows = []
+    for doctor in Doctor.objects.select_related('user').order_by('user__last_name', 'user__first_name'):
+        limit = limits.get(doctor.pk, DEFAULT_LIMITS[0])
+        cells = []
+        for date in dates:
+            count = booked.get((doctor.pk, date), 0)
+            cells.append({
+                'date': date,
+                'booked': count,
+                'limit': limit,
+                'percent': round(100 * count / limit) if limit else 100,
+            })
+        rows.append((doctor, cells))
+    return dates, rows
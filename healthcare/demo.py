@@ -0,0 +1,251 @@
+"""
+Demo accounts: a doctor and a few patients with a history of appointments and prescriptions.
+
+provision_demo_data() creates them, in bulk and with one password hash, from
+the ``setup_demo`` command or, with ``DEMO_SETUP_ON_MIGRATE``, after
+``migrate``. It does nothing when they already exist, so both are safe to
+run on every deploy. Demo login only looks the accounts up.
+
+The ids of the demo accounts are looked up once per process and cached in
+the module. Like the doctor directory, they are looked up again when a
+version stamp in the shared cache changes, which provisioning bumps when it
+commits, so every process sees accounts recreated with ``setup_demo
+--reset``. Demo login also looks again when its cached id no longer exists.
+Reports count through reportable(), which
+leaves out the demo accounts and everything belonging to them, and the
+request metrics skip demo sessions. With ``DEMO_ACCOUNTS`` off there are no
+demo logins and no lookups.
+"""
+
+import logging
+import threading
+from datetime import time, timedelta
+from time import time_ns
+from typing import NamedTuple
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .caching import bump_data_version
+from .capacity import invalidate_booked_counts
+from .models import Address, Appointment, Doctor, DoctorSchedule, Patient, Prescription, user_display_name
+from .patients import refresh_doctor_patients
+from .synthetic import MEDICATIONS, WORKDAYS
+
+logger = logging.getLogger(__name__)
+
+DEMO_PASSWORD = 'demo123'
+DEMO_VERSION_KEY = 'healthcare:demo:version'
+
+DEMO_DOCTOR = {
+    'username': 'demo_doctor', 'first_name': 'Jane', 'last_name': 'Smith', 'email': 'demo.doctor@example.com',
+}
+DEMO_PATIENTS = [
+    {'username': 'demo_patient', 'first_name': 'John', 'last_name': 'Doe', 'email': 'demo.patient@example.com'},
+    {'username': 'demo_patient_2', 'first_name': 'Maria', 'last_name': 'Garcia', 'email': 'demo.maria@example.com'},
+    {'username': 'demo_patient_3', 'first_name': 'Wei', 'last_name': 'Chen', 'email': 'demo.wei@example.com'},
+]
+DEMO_USERNAMES = [DEMO_DOCTOR['username'], *(patient['username'] for patient in DEMO_PATIENTS)]
+# Who a demo login logs in as
+DEMO_LOGINS = {'patient': 'demo_patient', 'doctor': 'demo_doctor'}
+
+# Every four weeks over the past half year, and once in the coming weeks
+PAST_VISITS = 6
+VISIT_WEEKS = 4
+
+
+class DemoAccounts(NamedTuple):
+    users: frozenset
+    doctors: frozenset
+    patients: frozenset
+    logins: dict
+
+
+NO_ACCOUNTS = DemoAccounts(frozenset(), frozenset(), frozenset(), {})
+
+_accounts = None
+_accounts_version = None
+_lock = threading.Lock()
+
+
+def demo_enabled():
+    return getattr(settings, 'DEMO_ACCOUNTS', True)
+
+
+def _load_accounts():
+    users = dict(User.objects.filter(username__in=DEMO_USERNAMES).values_list('username', 'pk'))
+    if not users:
+        return NO_ACCOUNTS
+    return DemoAccounts(
+        users=frozenset(users.values()),
+        doctors=frozenset(Doctor.objects.filter(user_id__in=users.values()).values_list('pk', flat=True)),
+        patients=frozenset(Patient.objects.filter(user_id__in=users.values()).values_list('pk', flat=True)),
+        logins={kind: users[username] for kind, username in DEMO_LOGINS.items() if username in users},
+    )
+
+
+def demo_accounts(refresh=False):
+    """
+    Get the ids of the demo accounts, looked up once per process and again when they are recreated.
+
+    Returns:
+        DemoAccounts: User, doctor and patient ids, and the user id per demo
+        login type; empty when demo accounts are off or not set up
+    """
+    global _accounts, _accounts_version
+
+    if not demo_enabled():
+        return NO_ACCOUNTS
+    version = cache.get(DEMO_VERSION_KEY)
+    if version is None:
+        cache.add(DEMO_VERSION_KEY, time_ns(), timeout=None)
+        version = cache.get(DEMO_VERSION_KEY)
+    if _accounts is None or _accounts_version != version or refresh:
+        with _lock:
+            if _accounts is None or _accounts_version != version or refresh:
+                _accounts = _load_accounts()
+                _accounts_version = version
+    return _accounts
+
+
+def invalidate_demo_accounts():
+    """Make every process look the demo accounts up again once the current transaction commits"""
+    transaction.on_commit(lambda: cache.set(DEMO_VERSION_KEY, time_ns(), timeout=None))
+
+
+def reset_demo_cache():
+    global _accounts, _accounts_version
+    _accounts = _accounts_version = None
+
+
+def reportable(model):
+    """
+    Get the rows of a model that reports should count: all but the demo accounts and their data.
+
+    Returns:
+        QuerySet
+    """
+    queryset = model._default_manager.all()
+    accounts = demo_accounts()
+    if not accounts.users:
+        return queryset
+    if model is User:
+        return queryset.exclude(pk__in=accounts.users)
+    if model is Doctor:
+        return queryset.exclude(pk__in=accounts.doctors)
+    if model is Patient:
+        return queryset.exclude(pk__in=accounts.patients)
+    # Appointments and prescriptions
+    return queryset.exclude(Q(doctor_id__in=accounts.doctors) | Q(patient_id__in=accounts.patients))
+
+
+def _remove_demo_data():
+    # Deleting the addresses deletes the profiles, and with them their appointments and prescriptions
+    Address.objects.filter(
+        Q(patient__user__username__in=DEMO_USERNAMES) | Q(doctor__user__username__in=DEMO_USERNAMES)
+    ).delete()
+    User.objects.filter(username__in=DEMO_USERNAMES).delete()
+
+
+def _visit_days(today, offset):
+    """Weekdays every VISIT_WEEKS weeks before today and one in the coming weeks, shifted by offset days"""
+    days = [today - timedelta(weeks=VISIT_WEEKS * n, days=-offset) for n in range(PAST_VISITS, 0, -1)]
+    days.append(today + timedelta(days=7 + offset))
+    # Move weekend days to the Monday after
+    return [day + timedelta(days=(7 - day.weekday()) % 7 if day.weekday() >= 5 else 0) for day in days]
+
+
+@transaction.atomic
+def provision_demo_data(reset=False):
+    """
+    Create the demo accounts and their data, unless they already exist.
+
+    Partly created accounts are removed and created again, as is everything
+    when reset is set.
+
+    Returns:
+        dict: Number of rows created per model, or None if the accounts already existed
+    """
+    existing = User.objects.filter(username__in=DEMO_USERNAMES).count()
+    if existing == len(DEMO_USERNAMES) and not reset:
+        demo_accounts(refresh=True)
+        return None
+    if existing:
+        _remove_demo_data()
+
+    today = timezone.localdate()
+    # One hash for every demo user, as hashing is deliberately slow
+    password = make_password(DEMO_PASSWORD)
+    doctor_user, *patient_users = User.objects.bulk_create(
+        [User(password=password, **account) for account in (DEMO_DOCTOR, *DEMO_PATIENTS)]
+    )
+    doctor_address, *patient_addresses = Address.objects.bulk_create(
+        [Address(line1='456 Doctor Lane', city='Med City', state='Health State', pincode='67890')]
+        + [
+            Address(line1=f'{123 + i} Demo Street', city='Demo City', state='Demo State', pincode='12345')
+            for i in range(len(DEMO_PATIENTS))
+        ]
+    )
+    doctor = Doctor.objects.create(
+        user=doctor_user, address=doctor_address, specialization='General Medicine',
+        license_number='DOC12345', experience_years=5, phone='555-DOC1',
+    )
+    patients = Patient.objects.bulk_create([
+        Patient(
+            user=user, address=address, date_of_birth=today.replace(year=today.year - 30 - 12 * i, day=1),
+            phone=f'555-123{4 + i}', medical_history='Demo medical history for testing purposes',
+            # bulk_create skips save(), which fills this in
+            display_name=user_display_name(user),
+        )
+        for i, (user, address) in enumerate(zip(patient_users, patient_addresses))
+    ])
+    DoctorSchedule.objects.bulk_create([
+        DoctorSchedule(doctor=doctor, day_of_week=day, start_time=time(9), end_time=time(17)) for day in WORKDAYS
+    ])
+
+    appointments = []
+    prescriptions = []
+    for i, patient in enumerate(patients):
+        days = _visit_days(today, i)
+        for n, day in enumerate(days):
+            if day > today:
+                status = 'confirmed'
+            else:
+                # One missed visit each, the rest completed
+                status = 'cancelled' if n == i + 1 else 'completed'
+            appointments.append(Appointment(
+                doctor=doctor, patient=patient, appointment_date=day, appointment_time=time(10 + i),
+                reason='Follow-up visit' if n else 'Initial consultation', status=status,
+            ))
+        for name, dosage, frequency, duration in MEDICATIONS[i * 2:i * 2 + 2]:
+            prescriptions.append(Prescription(
+                doctor=doctor, patient=patient, medication_name=name, dosage=dosage,
+                frequency=frequency, duration=duration, instructions='Demo prescription',
+            ))
+    Appointment.objects.bulk_create(appointments)
+    Prescription.objects.bulk_create(prescriptions)
+
+    # bulk_create sends no signals
+    refresh_doctor_patients((doctor.pk, patient.pk) for patient in patients)
+    invalidate_booked_counts((doctor.pk, appointment.appointment_date) for appointment in appointments)
+    bump_data_version()
+    invalidate_demo_accounts()
+
+    counts = {
+        'users': 1 + len(patients),
+        'appointments': len(appointments),
+        'prescriptions': len(prescriptions),
+    }
+    logger.info(f'Demo accounts created: {counts}')
+    return counts
+
+
+def setup_demo_after_migrate(using=DEFAULT_DB_ALIAS, **kwargs):
+    """post_migrate handler: provision the demo accounts when DEMO_SETUP_ON_MIGRATE is set"""
+    if using == DEFAULT_DB_ALIAS and demo_enabled() and getattr(settings, 'DEMO_SETUP_ON_MIGRATE', False):
+        provision_demo_data()
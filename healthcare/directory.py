@@ -0,0 +1,121 @@
+"""
+The doctor directory: every doctor's id, name, specialization and experience.
+
+Doctor pickers, the admin doctor list and doctor search all read the same
+``DoctorDirectory``. It is built once per process with one query and holds an
+immutable, name-ordered tuple of ``DirectoryEntry`` tuples, so rendering a
+list of doctors runs no queries and touches no model instances. Like the
+medication index, it is rebuilt when a version stamp in the shared cache
+changes. The signals bump the stamp whenever a doctor is saved or deleted,
+or a user's details change (see signals.py). The stamp is bumped when the
+change commits: bumping it earlier would let another process rebuild from
+the old rows and keep them under the new stamp.
+"""
+
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Doctor
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY_VERSION_KEY = 'healthcare:doctors:version'
+
+SEARCH_LIMIT = 20
+
+
+class DirectoryEntry(NamedTuple):
+    id: int
+    name: str
+    specialization: str
+    experience_years: int
+
+
+class DoctorDirectory:
+    """All doctors as DirectoryEntry tuples ordered by name, with a lookup by id"""
+
+    def __init__(self, rows):
+        """
+        Args:
+            rows: (id, first_name, last_name, username, specialization, experience_years) rows
+        """
+        entries = []
+        for pk, first_name, last_name, username, specialization, experience_years in rows:
+            name = f'{first_name} {last_name}'.strip() or username
+            entries.append(DirectoryEntry(pk, name, specialization or '', experience_years))
+        self.entries = tuple(entries)
+        self.by_id = {entry.id: entry for entry in self.entries}
+        # Lowercased words of each entry's name and specialization, for search
+        self._words = tuple(
+            tuple(f'{entry.name} {entry.specialization}'.lower().split()) for entry in self.entries
+        )
+        self.choices = tuple((entry.id, f'Dr. {entry.name}') for entry in self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def get(self, pk):
+        return self.by_id.get(pk)
+
+    def search(self, query='', specialization='', limit=SEARCH_LIMIT):
+        """
+        Find doctors whose name or specialization words start with every word of the query.
+
+        Returns:
+            list: Matching DirectoryEntry tuples in name order
+        """
+        terms = query.lower().split()
+        specialization = specialization.strip().lower()
+        results = []
+        for entry, words in zip(self.entries, self._words):
+            if specialization and entry.specialization.lower() != specialization:
+                continue
+            if all(any(word.startswith(term) for word in words) for term in terms):
+                results.append(entry)
+                if len(results) == limit:
+                    break
+        return results
+
+
+_directory = None
+_directory_version = None
+_directory_lock = threading.Lock()
+
+
+def get_doctor_directory():
+    """Get this process's doctor directory, rebuilding it if the doctors changed"""
+    global _directory, _directory_version
+
+    version = cache.get(DIRECTORY_VERSION_KEY)
+    if version is None:
+        cache.add(DIRECTORY_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(DIRECTORY_VERSION_KEY)
+    if _directory is not None and _directory_version == version:
+        return _directory
+
+    with _directory_lock:
+        if _directory is None or _directory_version != version:
+            _directory = DoctorDirectory(
+                Doctor.objects
+                .order_by('user__last_name', 'user__first_name', 'pk')
+                .values_list(
+                    'pk', 'user__first_name', 'user__last_name', 'user__username',
+                    'specialization', 'experience_years',
+                )
+            )
+            _directory_version = version
+            logger.info(f'Built doctor directory: {len(_directory)} doctors')
+    return _directory
+
+
+def invalidate_doctor_directory():
+    """Make every process rebuild its doctor directory once the current transaction commits"""
+    transaction.on_commit(lambda: cache.set(DIRECTORY_VERSION_KEY, time.time_ns(), timeout=None))
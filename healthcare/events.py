@@ -0,0 +1,109 @@
+"""
+In-process publish/subscribe for live appointment updates.
+
+Each open Server-Sent Events stream subscribes a queue for its user. When an
+appointment is created or its status changes, the event is fanned out to the
+queues of the appointment's patient and doctor. Streams that are idle just
+wait on their queue, so they cost no queries.
+
+Subscribers live in the memory of the process serving them, so with more than
+one ASGI worker an event only reaches the streams of the worker that saved the
+appointment. Put a shared broker (e.g. Redis pub/sub) behind publish() before
+scaling out.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Events queued for a stream that is not reading them are dropped beyond this
+MAX_QUEUED_EVENTS = 100
+
+
+class AppointmentEventBroker:
+    """Fan appointment events out to the event streams of the users involved"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """
+        Register a queue receiving the events of a user.
+
+        Must be called from the event loop the queue will be read on.
+
+        Returns:
+            asyncio.Queue: The queue events are put on
+        """
+        queue = asyncio.Queue(maxsize=MAX_QUEUED_EVENTS)
+        subscription = (queue, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        queue.subscription = subscription
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            subscriptions = self._subscribers.get(user_id)
+            if subscriptions is not None:
+                subscriptions.discard(queue.subscription)
+                if not subscriptions:
+                    del self._subscribers[user_id]
+
+    def has_subscribers(self, *user_ids):
+        with self._lock:
+            return any(user_id in self._subscribers for user_id in user_ids)
+
+    def publish(self, user_ids, event):
+        """Send an event to every stream of the given users; safe to call from any thread"""
+        with self._lock:
+            subscriptions = [
+                subscription
+                for user_id in set(user_ids)
+                for subscription in self._subscribers.get(user_id, ())
+            ]
+        for queue, loop in subscriptions:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                # The stream's event loop has already been closed
+                pass
+
+    @staticmethod
+    def _deliver(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning(f"Dropped {event['type']} event for a stream that is not reading")
+
+
+broker = AppointmentEventBroker()
+
+
+def publish_appointment_event(appointment, event_type):
+    """Publish an appointment event to the patient and doctor, if either of them is listening"""
+    try:
+        user_ids = (appointment.patient.user_id, appointment.doctor.user_id)
+    except Exception as e:
+        logger.error(f'Error resolving users for appointment {appointment.pk} event: {str(e)}')
+        return
+    if not broker.has_subscribers(*user_ids):
+        return
+    broker.publish(user_ids, {
+        'type': event_type,
+        'appointment': {
+            'id': appointment.pk,
+            'date': appointment.appointment_date.isoformat(),
+            'formatted_date': appointment.formatted_date,
+            'time': appointment.appointment_time.strftime('%H:%M'),
+            'formatted_time': appointment.formatted_time,
+            'status': appointment.status,
+            'status_display': appointment.get_status_display(),
+            'patient': appointment.patient.full_name,
+            'doctor': appointment.doctor.full_name,
+        },
+    })
@@ -1,7 +1,31 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.validators import validate_image_file_extension
+from django.template.defaultfilters import filesizeformat
 from .models import Patient, Doctor, Address
 
+class ProfilePictureField(forms.FileField):
+    """
+    Accept a profile picture upload without decoding it.
+
+    Only the extension and size are checked here; the image itself is
+    validated and processed in the background (see images.stage_profile_picture).
+    """
+    default_validators = [validate_image_file_extension]
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('widget', forms.ClearableFileInput(attrs={'accept': 'image/*'}))
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        data = super().clean(data, initial)
+        max_size = getattr(settings, 'PROFILE_PICTURE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+        if data and hasattr(data, 'size') and data.size > max_size:
+            raise forms.ValidationError(f"Profile picture must be smaller than {filesizeformat(max_size)}.")
+        return data
+
 class UserForm(forms.ModelForm):
     password = forms.CharField(widget=forms.PasswordInput())
     confirm_password = forms.CharField(widget=forms.PasswordInput())
@@ -28,6 +52,7 @@ class AddressForm(forms.ModelForm):
         fields = ('line1', 'city', 'state', 'pincode')
 
 class PatientForm(forms.ModelForm):
+    profile_picture = ProfilePictureField()
     date_of_birth = forms.DateField(
         widget=forms.DateInput(attrs={'type': 'date'}),
         required=False
@@ -40,9 +65,10 @@ class PatientForm(forms.ModelForm):
     
     class Meta:
         model = Patient
-        fields = ('profile_picture', 'date_of_birth', 'phone', 'medical_history')
+        fields = ('date_of_birth', 'phone', 'medical_history')
 
 class DoctorForm(forms.ModelForm):
+    profile_picture = ProfilePictureField()
     specialization = forms.CharField(max_length=100, required=False)
     license_number = forms.CharField(max_length=50, required=False)
     experience_years = forms.IntegerField(
@@ -55,16 +81,39 @@ class DoctorForm(forms.ModelForm):
     
     class Meta:
         model = Doctor
-        fields = ('profile_picture', 'specialization', 'license_number', 'experience_years', 'phone')
+        fields = ('specialization', 'license_number', 'experience_years', 'phone')
+
+class DoctorChoiceField(forms.ChoiceField):
+    """
+    Pick a doctor from the cached doctor directory.
+
+    The choices come from directory.get_doctor_directory(), so rendering the
+    field runs no queries; only cleaning a submitted choice loads the Doctor.
+    """
+
+    def __init__(self, *, empty_label='---------', **kwargs):
+        self.empty_label = empty_label
+        kwargs.setdefault('widget', forms.Select(attrs={'class': 'form-select'}))
+        super().__init__(choices=self._directory_choices, **kwargs)
+
+    def _directory_choices(self):
+        from .directory import get_doctor_directory
+        return [('', self.empty_label), *get_doctor_directory().choices]
+
+    def clean(self, value):
+        value = super().clean(value)
+        if value in self.empty_values:
+            return None
+        try:
+            return Doctor.objects.get(pk=value)
+        except (Doctor.DoesNotExist, ValueError):
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value},
+            )
+
 
 class AppointmentForm(forms.Form):
-    from .models import Doctor
-    
-    doctor = forms.ModelChoiceField(
-        queryset=Doctor.objects.all(),
-        empty_label="Select a Doctor",
-        widget=forms.Select(attrs={'class': 'form-select'})
-    )
+    doctor = DoctorChoiceField(empty_label="Select a Doctor")
     appointment_date = forms.DateField(
         widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
         help_text="Select a date for your appointment"
@@ -98,21 +147,137 @@ class AppointmentForm(forms.Form):
                 raise forms.ValidationError(
                     "This doctor already has an appointment scheduled at the selected time. Please choose a different time."
                 )
+
+            from .models import TimeOffRequest
+            on_leave = TimeOffRequest.objects.filter(
+                doctor=doctor,
+                status='approved',
+                start_date__lte=appointment_date,
+                end_date__gte=appointment_date
+            ).exists()
+
+            if on_leave:
+                raise forms.ValidationError(
+                    "This doctor is on leave on the selected date. Please choose a different date or doctor."
+                )
+
+            from .capacity import check_capacity
+            over_capacity = check_capacity(doctor.pk, appointment_date, appointment_time)
+            if over_capacity:
+                raise forms.ValidationError(f"{over_capacity} Please choose a different time or doctor.")
         
         return cleaned_data
 
+class AppointmentSeriesForm(forms.ModelForm):
+    """Book a recurring appointment; the view drops the doctor or patient field for the booking user"""
+
+    doctor = DoctorChoiceField()
+
+    class Meta:
+        from .models import AppointmentSeries
+        model = AppointmentSeries
+        fields = ['doctor', 'patient', 'frequency', 'interval', 'start_date', 'appointment_time', 'count', 'until', 'reason']
+        widgets = {
+            'patient': forms.Select(attrs={'class': 'form-select'}),
+            'frequency': forms.Select(attrs={'class': 'form-select'}),
+            'interval': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+            'start_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+            'appointment_time': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
+            'count': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+            'until': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+            'reason': forms.Textarea(attrs={'rows': 3, 'class': 'form-control', 'placeholder': 'Brief reason for the visits'}),
+        }
+        labels = {
+            'interval': 'Repeat every (weeks/months)',
+            'start_date': 'First visit',
+            'count': 'Number of visits',
+            'until': 'Last possible date',
+        }
+
+    def clean(self):
+        from django.utils import timezone
+        from .scheduling import MAX_SERIES_OCCURRENCES
+
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        count = cleaned_data.get('count')
+        until = cleaned_data.get('until')
+
+        if not count and not until:
+            raise forms.ValidationError('Enter the number of visits or a last possible date.')
+        if count and count > MAX_SERIES_OCCURRENCES:
+            self.add_error('count', f'A series can have at most {MAX_SERIES_OCCURRENCES} visits.')
+        if start_date and start_date < timezone.now().date():
+            self.add_error('start_date', 'The first visit cannot be in the past.')
+        if start_date and until and until < start_date:
+            self.add_error('until', 'The last possible date must be after the first visit.')
+        if cleaned_data.get('interval') == 0:
+            self.add_error('interval', 'Enter a whole number of at least 1.')
+        return cleaned_data
+
 class DoctorScheduleForm(forms.ModelForm):
+    """One shift of the weekly schedule; a shift left without times is ignored"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['start_time'].required = False
+        self.fields['end_time'].required = False
+
     class Meta:
         from .models import DoctorSchedule
         model = DoctorSchedule
         fields = ['day_of_week', 'start_time', 'end_time', 'is_available']
         widgets = {
-            'day_of_week': forms.Select(attrs={'class': 'form-select'}),
+            'day_of_week': forms.HiddenInput(),
             'start_time': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
             'end_time': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
             'is_available': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        start_time = cleaned_data.get('start_time')
+        end_time = cleaned_data.get('end_time')
+        if bool(start_time) != bool(end_time):
+            raise forms.ValidationError('Enter both a start and an end time, or leave both empty.')
+        if start_time and end_time and end_time <= start_time:
+            raise forms.ValidationError('End time must be after start time.')
+        return cleaned_data
+
+    @property
+    def shift(self):
+        """(day_of_week, start_time, end_time, is_available), or None for an empty or deleted shift"""
+        data = getattr(self, 'cleaned_data', None)
+        if not data or data.get('DELETE') or not data.get('start_time'):
+            return None
+        return (data['day_of_week'], data['start_time'], data['end_time'], data.get('is_available', False))
+
+class BaseWeeklyScheduleFormSet(forms.BaseFormSet):
+    """All shifts of a doctor's week, edited and saved together"""
+
+    def clean(self):
+        if any(self.errors):
+            return
+        from .models import DoctorSchedule
+        days = dict(DoctorSchedule.DAYS_OF_WEEK)
+        by_day = {}
+        for form in self.forms:
+            if form.shift:
+                by_day.setdefault(form.shift[0], []).append(form.shift)
+        for day, shifts in by_day.items():
+            shifts.sort(key=lambda shift: shift[1])
+            for previous, shift in zip(shifts, shifts[1:]):
+                if shift[1] < previous[2]:
+                    raise forms.ValidationError(f'Shifts on {days[day]} overlap.')
+
+    @property
+    def shifts(self):
+        return [form.shift for form in self.forms if form.shift]
+
+WeeklyScheduleFormSet = forms.formset_factory(
+    DoctorScheduleForm, formset=BaseWeeklyScheduleFormSet, extra=0, can_delete=True,
+)
+
 class TimeOffRequestForm(forms.ModelForm):
     class Meta:
         from .models import TimeOffRequest
@@ -125,23 +290,42 @@ class TimeOffRequestForm(forms.ModelForm):
         }
 
 class PrescriptionForm(forms.ModelForm):
+    acknowledge_warnings = forms.BooleanField(
+        required=False,
+        label='I have reviewed the warnings above and want to prescribe anyway',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
+
     def __init__(self, *args, **kwargs):
         self.doctor = kwargs.pop('doctor', None)
         super().__init__(*args, **kwargs)
+        # (severity, message) tuples from the interaction and duplicate check
+        self.warnings = []
         if self.doctor:
-            # Only show patients who have appointments with this doctor
-            from .models import Appointment
-            patient_ids = Appointment.objects.filter(doctor=self.doctor).values_list('patient', flat=True).distinct()
-            from .models import Patient
-            self.fields['patient'].queryset = Patient.objects.filter(id__in=patient_ids)
+            # Only patients who have appointments with this doctor; the queryset
+            # is only used to validate the choice, which is picked by searching
+            self.fields['patient'].queryset = Patient.objects.filter(doctor_links__doctor=self.doctor)
+
+    @property
+    def selected_patient(self):
+        """The patient currently chosen in the picker, for redisplaying the form"""
+        value = self['patient'].value()
+        if not value:
+            return None
+        try:
+            return self.fields['patient'].queryset.select_related('user').get(pk=value)
+        except (Patient.DoesNotExist, ValueError, TypeError):
+            return None
 
     class Meta:
         from .models import Prescription
         model = Prescription
         fields = ['patient', 'medication_name', 'dosage', 'frequency', 'duration', 'instructions']
         widgets = {
-            'patient': forms.Select(attrs={'class': 'form-select'}),
-            'medication_name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Amoxicillin 500mg'}),
+            'patient': forms.HiddenInput(),
+            'medication_name': forms.TextInput(attrs={
+                'class': 'form-control', 'placeholder': 'e.g., Amoxicillin 500mg', 'list': 'medication-options', 'autocomplete': 'off',
+            }),
             'dosage': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 1 tablet'}),
             'frequency': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Twice daily'}),
             'duration': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 7 days'}),
@@ -155,8 +339,28 @@ class PrescriptionForm(forms.ModelForm):
             'instructions': 'Instructions',
         }
 
+    def clean(self):
+        from .medications import active_prescriptions, check_prescription, get_medication_index
+
+        cleaned_data = super().clean()
+        patient = cleaned_data.get('patient')
+        medication_name = cleaned_data.get('medication_name')
+        if not patient or not medication_name:
+            return cleaned_data
+
+        index = get_medication_index()
+        self.instance.medication_id = index.resolve(medication_name)
+        # An empty index can't resolve anything; check_prescription() then warns instead of passing it
+        if self.instance.medication_id is None and index.medications:
+            return cleaned_data
+        self.warnings = check_prescription(self.instance.medication_id, active_prescriptions(patient), index)
+        if self.warnings and not cleaned_data.get('acknowledge_warnings'):
+            raise forms.ValidationError([message for _, message in self.warnings])
+        return cleaned_data
+
 # Doctor Settings Forms
 class DoctorProfileUpdateForm(forms.ModelForm):
+    profile_picture = ProfilePictureField()
     first_name = forms.CharField(max_length=30, required=True)
     last_name = forms.CharField(max_length=30, required=True)
     email = forms.EmailField(required=True)
@@ -168,7 +372,7 @@ class DoctorProfileUpdateForm(forms.ModelForm):
 
     class Meta:
         model = Doctor
-        fields = ['profile_picture', 'specialization', 'license_number', 'experience_years', 'phone', 'bio']
+        fields = ['specialization', 'license_number', 'experience_years', 'phone', 'bio']
         widgets = {
             'specialization': forms.TextInput(attrs={'class': 'form-input', 'placeholder': 'e.g., Cardiology, Pediatrics'}),
             'license_number': forms.TextInput(attrs={'class': 'form-input'}),
@@ -184,6 +388,9 @@ class DoctorProfileUpdateForm(forms.ModelForm):
             self.fields['first_name'].initial = self.user.first_name
             self.fields['last_name'].initial = self.user.last_name
             self.fields['email'].initial = self.user.email
+        # profile_picture isn't in Meta.fields, so give it the current picture by hand;
+        # without an initial value the widget has no "Clear" checkbox
+        self.fields['profile_picture'].initial = self.instance.profile_picture
 
 class DoctorChangePasswordForm(forms.Form):
     current_password = forms.CharField(
@@ -255,3 +462,74 @@ class DoctorPracticeSettingsForm(forms.ModelForm):
             'max_patients_per_day': 'Maximum Patients Per Day',
             'consultation_notes_auto_save': 'Auto-save Consultation Notes',
         }
+
+
+class WaitlistEntryForm(forms.ModelForm):
+    """Join the waitlist for a doctor, a specialization or any doctor"""
+
+    doctor = DoctorChoiceField(required=False, label='Doctor (leave empty for any doctor)')
+
+    class Meta:
+        from .models import WaitlistEntry
+        model = WaitlistEntry
+        fields = ['doctor', 'specialization', 'earliest_date', 'latest_date', 'reason']
+        widgets = {
+            'specialization': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g. Cardiology'}),
+            'earliest_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+            'latest_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+            'reason': forms.Textarea(attrs={'rows': 3, 'class': 'form-control', 'placeholder': 'Brief reason for the visit'}),
+        }
+        labels = {
+            'specialization': 'Specialization (when no doctor is chosen)',
+            'earliest_date': 'Earliest date',
+            'latest_date': 'Latest date',
+        }
+
+    def clean(self):
+        from django.utils import timezone
+
+        cleaned_data = super().clean()
+        earliest_date = cleaned_data.get('earliest_date')
+        latest_date = cleaned_data.get('latest_date')
+
+        if cleaned_data.get('doctor'):
+            cleaned_data['specialization'] = ''
+        if earliest_date and earliest_date < timezone.now().date():
+            self.add_error('earliest_date', 'The earliest date cannot be in the past.')
+        if earliest_date and latest_date and latest_date < earliest_date:
+            self.add_error('latest_date', 'The latest date must be after the earliest date.')
+        return cleaned_data
+
+
+class MedicalHistoryEntryForm(forms.ModelForm):
+    """Add a dated entry to a patient's medical history"""
+
+    class Meta:
+        from .models import MedicalHistoryEntry
+        model = MedicalHistoryEntry
+        fields = ['entry_type', 'title', 'recorded_on', 'details']
+        widgets = {
+            'entry_type': forms.Select(attrs={'class': 'form-select'}),
+            'title': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g. Asthma, Penicillin'}),
+            'recorded_on': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+            'details': forms.Textarea(attrs={'rows': 2, 'class': 'form-control'}),
+        }
+        labels = {
+            'entry_type': 'Type',
+            'title': 'Condition / allergen / medication',
+            'recorded_on': 'Date',
+        }
+
+    def __init__(self, *args, **kwargs):
+        from django.utils import timezone
+
+        super().__init__(*args, **kwargs)
+        self.fields['recorded_on'].initial = timezone.localdate()
+
+    def clean_recorded_on(self):
+        from django.utils import timezone
+
+        recorded_on = self.cleaned_data['recorded_on']
+        if recorded_on > timezone.localdate():
+            raise forms.ValidationError('The date cannot be in the future.')
+        return recorded_on
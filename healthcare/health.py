@@ -0,0 +1,223 @@
+"""
+System health: process, database and cache metrics, and their recent history.
+
+current_health() reads the numbers as they are now: process uptime and
+resident memory, request and error totals from the request metrics, the
+database size (page and freelist counts on SQLite, size and connections on
+PostgreSQL) and the dashboard cache hit ratio.
+
+Every ``HEALTH_SAMPLE_SECONDS`` the request metrics middleware calls
+sample_if_due(), which adds a sample to a fixed-size time series covering
+24 hours. Each field of the series is an ``array('d')`` ring buffer, so the
+history is a few kilobytes however long the process runs. Rates are computed
+from the change in the totals since the previous sample. Like the request
+metrics, the history belongs to one worker process; hours without requests
+have no samples.
+"""
+
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from .caching import get_cache_stats
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+PROCESS_STARTED = time.time()
+HISTORY_SECONDS = 24 * 60 * 60
+
+HEALTH_FIELDS = (
+    'requests_per_minute',
+    'error_rate',
+    'slow_queries',
+    'rss_mb',
+    'db_size_mb',
+    'db_freelist_pages',
+    'cache_hit_ratio',
+)
+
+
+class TimeSeries:
+    """Fixed number of timestamped samples, one array('d') ring buffer per field"""
+
+    def __init__(self, fields, size):
+        self.fields = fields
+        self.size = size
+        self.times = array('d', [math.nan]) * size
+        self.values = {field: array('d', [math.nan]) * size for field in fields}
+        self.next = 0
+        self._lock = threading.Lock()
+
+    def append(self, timestamp, sample):
+        """Add a sample (dict of field values; missing ones are stored as NaN), overwriting the oldest"""
+        with self._lock:
+            self.times[self.next] = timestamp
+            for field in self.fields:
+                value = sample.get(field)
+                self.values[field][self.next] = math.nan if value is None else value
+            self.next = (self.next + 1) % self.size
+
+    def since(self, start):
+        """
+        Get the samples taken since a timestamp, oldest first.
+
+        Returns:
+            dict: 'times' and each field mapped to a list of values, None for missing values
+        """
+        with self._lock:
+            order = [i % self.size for i in range(self.next, self.next + self.size)]
+            kept = [i for i in order if self.times[i] >= start]
+            history = {'times': [self.times[i] for i in kept]}
+            for field in self.fields:
+                column = self.values[field]
+                history[field] = [None if math.isnan(column[i]) else column[i] for i in kept]
+        return history
+
+
+def _sample_seconds():
+    return getattr(settings, 'HEALTH_SAMPLE_SECONDS', 300)
+
+
+history = TimeSeries(HEALTH_FIELDS, max(1, HISTORY_SECONDS // _sample_seconds()))
+
+_lock = threading.Lock()
+_next_sample = 0.0
+_last_totals = None
+
+
+def rss_bytes():
+    """Resident memory of this process, or None if it can't be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current memory; ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def database_stats():
+    """
+    Get the size of the database and, where the backend has them, its page or connection stats.
+
+    Returns:
+        dict: vendor, ok, and size_bytes plus page_size, page_count and
+        freelist_count (SQLite) or connections (PostgreSQL)
+    """
+    stats = {'vendor': connection.vendor, 'ok': True}
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                for pragma in ('page_size', 'page_count', 'freelist_count'):
+                    cursor.execute(f'PRAGMA {pragma}')
+                    stats[pragma] = cursor.fetchone()[0]
+                stats['size_bytes'] = stats['page_size'] * stats['page_count']
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT pg_database_size(current_database()), numbackends '
+                    'FROM pg_stat_database WHERE datname = current_database()'
+                )
+                stats['size_bytes'], stats['connections'] = cursor.fetchone()
+            else:
+                cursor.execute('SELECT 1')
+    except DatabaseError as e:
+        logger.error(f'Database health check failed: {e}')
+        stats['ok'] = False
+    return stats
+
+
+def format_duration(seconds):
+    """Format a number of seconds as e.g. '3d 4h 12m'"""
+    minutes, _ = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f'{days}d {hours}h {minutes}m'
+    if hours:
+        return f'{hours}h {minutes}m'
+    return f'{minutes}m'
+
+
+def current_health(now=None):
+    """
+    Get the current health of this process and the database.
+
+    Returns:
+        dict: uptime_seconds, uptime, rss_bytes, requests, errors, error_rate
+        (percentage of all requests), slow_queries, database (see
+        database_stats) and cache (see get_cache_stats)
+    """
+    now = now or time.time()
+    totals = registry.totals()
+    return {
+        'uptime_seconds': now - PROCESS_STARTED,
+        'uptime': format_duration(now - PROCESS_STARTED),
+        'rss_bytes': rss_bytes(),
+        **totals,
+        'error_rate': round(totals['errors'] * 100 / totals['requests'], 2) if totals['requests'] else 0,
+        'database': database_stats(),
+        'cache': get_cache_stats(),
+    }
+
+
+def take_sample(now=None):
+    """Add the current health to the history"""
+    global _last_totals
+
+    now = now or time.time()
+    health = current_health(now)
+    totals = {field: health[field] for field in ('requests', 'errors', 'slow_queries')}
+    previous_time, previous = _last_totals or (PROCESS_STARTED, dict.fromkeys(totals, 0))
+    _last_totals = (now, totals)
+
+    requests = totals['requests'] - previous['requests']
+    minutes = max(now - previous_time, 1) / 60
+    rss = health['rss_bytes']
+    database = health['database']
+    history.append(now, {
+        'requests_per_minute': requests / minutes,
+        'error_rate': (totals['errors'] - previous['errors']) * 100 / requests if requests else 0,
+        'slow_queries': totals['slow_queries'] - previous['slow_queries'],
+        'rss_mb': rss / 2**20 if rss is not None else None,
+        'db_size_mb': database['size_bytes'] / 2**20 if 'size_bytes' in database else None,
+        'db_freelist_pages': database.get('freelist_count'),
+        'cache_hit_ratio': health['cache']['hit_ratio'],
+    })
+
+
+def sample_if_due(now=None):
+    """Take a health sample if HEALTH_SAMPLE_SECONDS have passed since the last one"""
+    global _next_sample
+
+    now = now or time.time()
+    if now < _next_sample:
+        return
+    with _lock:
+        if now < _next_sample:
+            return
+        _next_sample = now + _sample_seconds()
+    try:
+        take_sample(now)
+    except Exception:
+        logger.exception('Failed to take a health sample')
+
+
+def recent_history(now=None):
+    """Get the samples of the last 24 hours, with times in milliseconds for charting"""
+    now = now or time.time()
+    samples = history.since(now - HISTORY_SECONDS)
+    samples['times'] = [int(timestamp * 1000) for timestamp in samples['times']]
+    return samples
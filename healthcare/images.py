@@ -0,0 +1,250 @@
+"""
+Image pipeline for uploaded profile pictures.
+
+Uploads are not decoded inside the request: they are moved to a staging
+directory and a ``ProfilePictureUpload`` row tracks them while a background
+thread validates the image, strips its metadata, downscales it and moves it
+into place on the profile.
+
+Resized WebP thumbnails are then generated, also in the background, and
+stored under ``MEDIA_ROOT/thumbnails/<size>/``. Templates pick a size with
+the ``thumbnail`` filter, which falls back to the original image until the
+thumbnail exists. A picture that is replaced or cleared is deleted from
+storage along with its thumbnails.
+"""
+
+import logging
+import os
+import posixpath
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.move import file_move_safe
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels; roughly 2x the size avatars are displayed at
+THUMBNAIL_SIZES = {
+    'small': 96,
+    'medium': 240,
+    'large': 400,
+}
+THUMBNAIL_QUALITY = 80
+
+# Uploads are downscaled so their longest edge is at most this many pixels
+MAX_PICTURE_SIZE = 1600
+# Formats kept as they are; anything else is converted to PNG
+KEPT_FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def thumbnail_name(name, size):
+    """Get the storage name of the ``size`` thumbnail of the image ``name``"""
+    stem, _ = posixpath.splitext(name)
+    return f'thumbnails/{size}/{stem}.webp'
+
+
+def generate_thumbnails(name):
+    """
+    Generate the missing WebP thumbnails of an uploaded image.
+
+    Returns:
+        list: Storage names of the thumbnails that were created
+    """
+    missing = {
+        size: thumbnail_name(name, size)
+        for size in THUMBNAIL_SIZES
+        if not default_storage.exists(thumbnail_name(name, size))
+    }
+    if not missing:
+        return []
+
+    with default_storage.open(name) as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    created = []
+    for size, thumb_name in missing.items():
+        thumb = image.copy()
+        thumb.thumbnail((THUMBNAIL_SIZES[size], THUMBNAIL_SIZES[size]), Image.LANCZOS)
+        buffer = BytesIO()
+        thumb.save(buffer, 'WEBP', quality=THUMBNAIL_QUALITY, method=4)
+        created.append(default_storage.save(thumb_name, ContentFile(buffer.getvalue())))
+    logger.info(f'Generated {len(created)} thumbnails for {name}')
+    return created
+
+
+def delete_picture_files(name):
+    """Delete a stored picture and its thumbnails"""
+    for path in [name, *(thumbnail_name(name, size) for size in THUMBNAIL_SIZES)]:
+        try:
+            default_storage.delete(path)
+        except Exception as e:
+            logger.error(f'Error deleting {path}: {str(e)}')
+
+
+def _generate_in_background(name):
+    try:
+        if generate_thumbnails(name):
+            # Cached dashboards still point at the full-size image
+            from .caching import bump_data_version
+            bump_data_version()
+    except Exception as e:
+        logger.error(f'Error generating thumbnails for {name}: {str(e)}')
+
+
+def get_executor():
+    """Get the shared thread pool used for image processing"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_WORKER_THREADS', 2),
+                thread_name_prefix='healthcare-images',
+            )
+    return _executor
+
+
+def schedule_thumbnails(name):
+    """Generate thumbnails for ``name`` in the background once the current transaction commits"""
+    transaction.on_commit(lambda: get_executor().submit(_generate_in_background, name))
+
+
+def get_staging_dir():
+    """Get the directory uploads wait in until they have been processed"""
+    staging_dir = getattr(settings, 'UPLOAD_STAGING_DIR', None) or os.path.join(tempfile.gettempdir(), 'healthcare-uploads')
+    os.makedirs(staging_dir, exist_ok=True)
+    return staging_dir
+
+
+def stage_profile_picture(uploaded_file, user, profile_type, uploaded_by=None):
+    """
+    Stage an uploaded profile picture and process it in the background.
+
+    The upload is moved (or, when it is held in memory, streamed) into the
+    staging directory without being decoded, and is processed once the
+    current transaction commits.
+
+    Returns:
+        ProfilePictureUpload: The record tracking the upload
+    """
+    from .models import ProfilePictureUpload
+
+    _, ext = os.path.splitext(uploaded_file.name)
+    staged_path = os.path.join(get_staging_dir(), f'{uuid.uuid4().hex}{ext.lower()}')
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        file_move_safe(uploaded_file.temporary_file_path(), staged_path)
+    else:
+        with open(staged_path, 'wb') as f:
+            for chunk in uploaded_file.chunks():
+                f.write(chunk)
+
+    upload = ProfilePictureUpload.objects.create(
+        user=user,
+        uploaded_by=uploaded_by,
+        profile_type=profile_type,
+        original_name=os.path.basename(uploaded_file.name)[:255],
+        staged_path=staged_path,
+    )
+    transaction.on_commit(lambda: get_executor().submit(_process_in_background, upload.pk))
+    return upload
+
+
+def _profile_model(profile_type):
+    from .models import Admin, Doctor, Patient
+    return {'patient': Patient, 'doctor': Doctor, 'admin': Admin}[profile_type]
+
+
+def process_profile_picture(upload):
+    """
+    Validate a staged upload, strip its metadata, downscale it and set it as
+    the profile picture, deleting the picture it replaces.
+
+    Returns:
+        str: Storage name of the stored picture
+    """
+    with Image.open(upload.staged_path) as image:
+        image.verify()
+
+    with Image.open(upload.staged_path) as image:
+        image_format = image.format if image.format in KEPT_FORMATS else 'PNG'
+        # Apply the EXIF orientation; the EXIF block itself is not written back
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((MAX_PICTURE_SIZE, MAX_PICTURE_SIZE), Image.LANCZOS)
+        if image_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA')
+        buffer = BytesIO()
+        image.save(buffer, image_format, **({'quality': 85} if image_format != 'PNG' else {}))
+
+    model = _profile_model(upload.profile_type)
+    field = model._meta.get_field('profile_picture')
+    stem, _ = os.path.splitext(upload.original_name)
+    name = field.storage.save(
+        field.generate_filename(None, f'{stem}{KEPT_FORMATS.get(image_format, ".png")}'),
+        ContentFile(buffer.getvalue()),
+    )
+    profiles = model.objects.filter(user_id=upload.user_id)
+    previous = profiles.values_list('profile_picture', flat=True).first()
+    # update() rather than save() so the upload isn't processed a second time by signals
+    profiles.update(profile_picture=name)
+    if previous and previous != name:
+        delete_picture_files(previous)
+    return name
+
+
+def _process_in_background(upload_id):
+    from .caching import bump_data_version
+    from .models import ProfilePictureUpload
+
+    try:
+        upload = ProfilePictureUpload.objects.get(pk=upload_id)
+        upload.status = 'processing'
+        upload.save(update_fields=['status', 'updated_at'])
+        try:
+            name = process_profile_picture(upload)
+            generate_thumbnails(name)
+            upload.status = 'completed'
+        except Exception as e:
+            logger.error(f'Error processing profile picture upload {upload_id}: {str(e)}')
+            upload.status = 'failed'
+            upload.error = 'The file could not be read as an image.' if isinstance(e, (OSError, SyntaxError)) else str(e)
+        finally:
+            if os.path.exists(upload.staged_path):
+                os.remove(upload.staged_path)
+        upload.save(update_fields=['status', 'error', 'updated_at'])
+        bump_data_version()
+    except Exception as e:
+        logger.error(f'Error in profile picture worker for upload {upload_id}: {str(e)}')
+    finally:
+        connection.close()
+
+
+def thumbnail_url(image_field, size='medium'):
+    """
+    Get the URL of a thumbnail of an image field.
+
+    Returns:
+        str: The thumbnail URL, or the original image URL while the thumbnail
+        has not been generated yet ('' when there is no image)
+    """
+    if not image_field:
+        return ''
+    if size in THUMBNAIL_SIZES:
+        name = thumbnail_name(image_field.name, size)
+        if default_storage.exists(name):
+            return default_storage.url(name)
+    return image_field.url
@@ -0,0 +1,86 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from healthcare.metrics import percentile
+
+ENGINES = ['db', 'cached_db', 'cache', 'signed_cookies']
+
+
+class _SessionQueryCounter:
+    def __init__(self):
+        self.total = 0
+        self.session = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        if Session._meta.db_table in sql:
+            self.session += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare session backends: latency and database queries of logging in and of an authenticated '
+        'page view, on a throwaway test database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES)
+        parser.add_argument('--requests', type=int, default=200, help='Logins and page views per backend')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # A staff user's dashboard is a redirect, so the page view is mostly session and user loading
+            user = User.objects.create_user(username='session_benchmark', is_staff=True)
+            url = reverse('healthcare:dashboard')
+            allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+            self.stdout.write(
+                f"{'Backend':<16} {'Login p50':>10} {'Login p95':>10} {'Login SQL':>10} "
+                f"{'Page p50':>9} {'Page p95':>9} {'Page SQL':>9} {'Session SQL':>12}"
+            )
+            for engine in options['engines']:
+                with override_settings(
+                    SESSION_ENGINE=f'django.contrib.sessions.backends.{engine}', ALLOWED_HOSTS=allowed_hosts,
+                ):
+                    login, page = self._run(user, url, options['requests'])
+                self.stdout.write(
+                    f"{engine:<16} {login['p50']:>10.3f} {login['p95']:>10.3f} {login['queries']:>10.1f} "
+                    f"{page['p50']:>9.3f} {page['p95']:>9.3f} {page['queries']:>9.1f} {page['session_queries']:>12.1f}"
+                )
+            self.stdout.write('Latencies in ms; SQL columns are queries per request, Session SQL those on the session table.')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _run(self, user, url, requests):
+        logins, pages = [], []
+        login_counter, page_counter = _SessionQueryCounter(), _SessionQueryCounter()
+        for _ in range(requests):
+            client = Client()
+            with connection.execute_wrapper(login_counter):
+                start = time.perf_counter()
+                client.force_login(user)
+                logins.append((time.perf_counter() - start) * 1000)
+            with connection.execute_wrapper(page_counter):
+                start = time.perf_counter()
+                response = client.get(url)
+                pages.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 302:
+                raise CommandError(f'{url} returned {response.status_code}')
+        return self._summary(logins, login_counter, requests), self._summary(pages, page_counter, requests)
+
+    def _summary(self, timings, counter, requests):
+        ordered = sorted(timings)
+        return {
+            'p50': percentile(ordered, 50),
+            'p95': percentile(ordered, 95),
+            'queries': counter.total / requests,
+            'session_queries': counter.session / requests,
+        }
@@ -0,0 +1,70 @@
+import statistics
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+
+TEMPLATE_ROOT = Path(__file__).resolve().parents[2] / 'templates'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark render time and output size of the healthcare templates with and without the cached loader'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Renders per template and loader')
+        parser.add_argument('--filter', default='', help='Only benchmark templates whose name contains this text')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        engines = {
+            'uncached': self._engine(cached=False),
+            'cached': self._engine(cached=True),
+        }
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        request.session = {}
+
+        names = sorted(
+            path.relative_to(TEMPLATE_ROOT).as_posix()
+            for path in TEMPLATE_ROOT.rglob('*.html')
+            if options['filter'] in path.name
+        )
+
+        self.stdout.write(f"{'Template':<50} {'Uncached ms':>12} {'Cached ms':>10} {'Bytes':>8}")
+        for name in names:
+            results = {}
+            size = 0
+            try:
+                for label, engine in engines.items():
+                    timings = []
+                    for _ in range(iterations):
+                        start = time.perf_counter()
+                        # get_template is part of the measured cost: it is what the cached loader saves
+                        output = engine.get_template(name).render({}, request)
+                        timings.append((time.perf_counter() - start) * 1000)
+                    results[label] = statistics.median(timings)
+                    size = len(output.encode())
+            except Exception as e:
+                # Some templates can't render without the context their view provides
+                self.stdout.write(self.style.WARNING(f'{name:<50} skipped: {e}'))
+                continue
+            self.stdout.write(f"{name:<50} {results['uncached']:>12.2f} {results['cached']:>10.2f} {size:>8}")
+
+    def _engine(self, cached):
+        config = settings.TEMPLATES[0]
+        loaders = [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]
+        if cached:
+            loaders = [('django.template.loaders.cached.Loader', loaders)]
+        return DjangoTemplates({
+            'NAME': f'benchmark-{"cached" if cached else "uncached"}',
+            'DIRS': config.get('DIRS', []),
+            'APP_DIRS': False,
+            'OPTIONS': {**config.get('OPTIONS', {}), 'loaders': loaders},
+        })
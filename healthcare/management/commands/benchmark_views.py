@@ -0,0 +1,89 @@
+import asyncio
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+DEFAULT_VIEWS = [
+    'patient_dashboard',
+    'doctor_dashboard',
+    'show_appointments',
+    'view_reports',
+    'appointments_api',
+    'dashboard_stats_api',
+]
+
+
+def percentiles(timings):
+    """Get the p50 and p99 of a list of timings"""
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return cuts[49], cuts[98]
+
+
+class Command(BaseCommand):
+    help = 'Compare p50/p99 latency of views served through the sync (WSGI) and async (ASGI) request paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='User to log in as (a doctor or patient with data)')
+        parser.add_argument('--views', nargs='+', default=DEFAULT_VIEWS, help='URL names in the healthcare namespace')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per view and path')
+        parser.add_argument('--concurrency', type=int, default=10, help='Concurrent requests on the async path')
+        parser.add_argument('--with-cache', action='store_true', help='Keep the dashboard response cache enabled')
+
+    def handle(self, *args, **options):
+        try:
+            self.user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist")
+
+        cache_timeout = settings.DASHBOARD_CACHE_TIMEOUT if options['with_cache'] else 0
+        # The test clients send requests for the host "testserver"
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with override_settings(DASHBOARD_CACHE_TIMEOUT=cache_timeout, ALLOWED_HOSTS=allowed_hosts):
+            self.stdout.write(
+                f"{'View':<22} {'Sync p50':>9} {'Sync p99':>9} {'Sync rps':>9} "
+                f"{'Async p50':>10} {'Async p99':>10} {'Async rps':>10}"
+            )
+            for name in options['views']:
+                url = reverse(f'healthcare:{name}')
+                results = []
+                for run in (self._run_sync, async_to_sync(self._run_async)):
+                    start = time.perf_counter()
+                    timings = run(url, options)
+                    throughput = len(timings) / (time.perf_counter() - start)
+                    results.extend([*percentiles(timings), throughput])
+                self.stdout.write('{:<22} {:>9.2f} {:>9.2f} {:>9.0f} {:>10.2f} {:>10.2f} {:>10.0f}'.format(name, *results))
+            self.stdout.write('Latencies in ms. Async latencies include time spent waiting on the other concurrent requests.')
+
+    def _run_sync(self, url, options):
+        client = Client()
+        client.force_login(self.user)
+        timings = []
+        for _ in range(options['requests']):
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code} on the sync path')
+        return timings
+
+    async def _run_async(self, url, options):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def timed_request():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(url)
+                elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code} on the async path')
+            return elapsed
+
+        return await asyncio.gather(*(timed_request() for _ in range(options['requests'])))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from healthcare.waitlist import expire_offers
+
+
+class Command(BaseCommand):
+    help = 'Pass lapsed waitlist offers on to the next patient and expire past waitlist entries (run from cron every minute)'
+
+    def handle(self, *args, **options):
+        stats = expire_offers()
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['lapsed']} offers passed on, {stats['expired']} waitlist entries expired"
+        ))
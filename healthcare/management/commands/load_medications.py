@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from healthcare.medications import DATASET_PATH, load_medications
+
+
+class Command(BaseCommand):
+    help = 'Load the medication reference table and known interactions from the bundled dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=str(DATASET_PATH), help='Dataset to load instead of the bundled one')
+
+    def handle(self, *args, **options):
+        medications, interactions = load_medications(options['path'])
+        self.stdout.write(self.style.SUCCESS(f'Loaded {medications} medications and {interactions} interactions'))
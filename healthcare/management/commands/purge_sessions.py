@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from healthcare.sessions import purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired sessions from the database in batches of short transactions '
+        '(run from cron, e.g. hourly). Cache and signed cookie sessions need no purging.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Sessions deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_sessions(options['batch_size'], options['pause'])
+        if deleted is None:
+            self.stdout.write('The session backend keeps no sessions in the database; nothing to purge')
+            return
+        self.stdout.write(self.style.SUCCESS(f'{deleted} expired sessions deleted'))
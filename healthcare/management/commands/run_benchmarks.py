@@ -0,0 +1,205 @@
+import json
+import platform
+import statistics
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from healthcare.metrics import percentile
+from healthcare.models import Doctor
+from healthcare.synthetic import FUTURE_DAYS, PASSWORD, generate
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / 'data' / 'benchmark_baseline.json'
+
+# Benchmarks and the status code each request must return
+BENCHMARKS = {
+    'login_view': 302,
+    'book_appointment': 302,
+    'doctor_dashboard': 200,
+    'admin_reports': 200,
+    'prescription_history_search': 200,
+    'download_pdf': 200,
+}
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def summarize(timings, queries):
+    """Latency percentiles in ms and the most queries any request ran"""
+    ordered = sorted(timings)
+    return {
+        'iterations': len(timings),
+        'p50_ms': round(percentile(ordered, 50), 3),
+        'p95_ms': round(percentile(ordered, 95), 3),
+        'p99_ms': round(percentile(ordered, 99), 3),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'queries': max(queries),
+    }
+
+
+def find_regressions(results, baseline, threshold, min_delta_ms):
+    """
+    Compare benchmark results with a baseline.
+
+    A benchmark regresses when its p95 latency grows by more than the
+    threshold (a fraction) and by more than min_delta_ms, or when it runs
+    more queries than in the baseline.
+
+    Returns:
+        list: A message per regression
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        limit = base['p95_ms'] * (1 + threshold)
+        if result['p95_ms'] > limit and result['p95_ms'] - base['p95_ms'] > min_delta_ms:
+            regressions.append(
+                f"{name}: p95 {result['p95_ms']:.2f} ms against {base['p95_ms']:.2f} ms in the baseline"
+            )
+        if result['queries'] > base['queries']:
+            regressions.append(f"{name}: {result['queries']} queries against {base['queries']} in the baseline")
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the login, booking, dashboard, report, prescription search and PDF hot paths on a fresh '
+        'database of synthetic data. Writes latency percentiles and query counts as JSON and fails when '
+        'results regress against a baseline (regenerate the baseline on the CI machine with --output).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=20)
+        parser.add_argument('--patients', type=int, default=500)
+        parser.add_argument('--appointments', type=int, default=5000)
+        parser.add_argument('--prescriptions', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data')
+        parser.add_argument('--iterations', type=int, default=30, help='Measured requests per benchmark')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per benchmark')
+        parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help='Run only these benchmarks')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', nargs='?', const=str(DEFAULT_BASELINE),
+                            help=f'Fail on regressions against this results file (default {DEFAULT_BASELINE})')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed p95 latency growth against the baseline, as a fraction')
+        parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                            help='Ignore p95 latency growth smaller than this, which is noise')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                baseline = json.loads(Path(options['baseline']).read_text())['results']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Can't read the baseline {options['baseline']}: {e}")
+
+        # Run on a throwaway test database, so the benchmarks start from the same data every time
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            data = generate(
+                doctors=options['doctors'], patients=options['patients'], appointments=options['appointments'],
+                prescriptions=options['prescriptions'], seed=options['seed'],
+            )
+            allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+            with override_settings(DASHBOARD_CACHE_TIMEOUT=0, ALLOWED_HOSTS=allowed_hosts):
+                results = self._run(data, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'data': {key: options[key] for key in ('doctors', 'patients', 'appointments', 'prescriptions', 'seed')},
+            'results': results,
+        }
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2) + '\n')
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = find_regressions(results, baseline, options['threshold'], options['min_delta_ms'])
+            if regressions:
+                raise CommandError('Benchmarks regressed:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def _run(self, data, options):
+        doctor_user = User.objects.get(username=data['doctor_username'])
+        patient_user = User.objects.get(username=data['patient_username'])
+        staff_user = User.objects.get(username=data['staff_username'])
+        clients = {}
+        for user in (doctor_user, patient_user, staff_user):
+            clients[user.username] = Client()
+            clients[user.username].force_login(user)
+        doctor_ids = list(Doctor.objects.order_by('pk').values_list('pk', flat=True))
+        rounds = (options['warmup'] + options['iterations']) // len(doctor_ids) + 1
+        booking_days = self._booking_days(rounds)
+        requests = {
+            'login_view': lambda i: Client().post(
+                reverse('healthcare:login'), {'username': data['patient_username'], 'password': PASSWORD},
+            ),
+            # Each booking takes a fresh (doctor, day) at 9:15, between the generated half-hour slots
+            'book_appointment': lambda i: clients[patient_user.username].post(reverse('healthcare:book_appointment'), {
+                'doctor': doctor_ids[i % len(doctor_ids)],
+                'appointment_date': booking_days[i // len(doctor_ids)].isoformat(),
+                'appointment_time': '09:15',
+                'reason': 'Benchmark booking',
+            }),
+            'doctor_dashboard': lambda i: clients[doctor_user.username].get(reverse('healthcare:doctor_dashboard')),
+            'admin_reports': lambda i: clients[staff_user.username].get(reverse('healthcare:admin_reports')),
+            'prescription_history_search': lambda i: clients[doctor_user.username].get(
+                reverse('healthcare:prescription_history'), {'q': 'an'},
+            ),
+            'download_pdf': lambda i: clients[staff_user.username].get(
+                reverse('healthcare:download_pdf', args=['appointment']),
+            ),
+        }
+
+        results = {}
+        self.stdout.write(f"{'Benchmark':<30} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'Queries':>8}")
+        for name in options['only'] or BENCHMARKS:
+            timings, queries = [], []
+            for i in range(options['warmup'] + options['iterations']):
+                counter = _QueryCounter()
+                with connection.execute_wrapper(counter):
+                    start = time.perf_counter()
+                    response = requests[name](i)
+                    elapsed = (time.perf_counter() - start) * 1000
+                if response.status_code != BENCHMARKS[name]:
+                    raise CommandError(f'{name} returned {response.status_code}, expected {BENCHMARKS[name]}')
+                if i >= options['warmup']:
+                    timings.append(elapsed)
+                    queries.append(counter.count)
+            results[name] = summarize(timings, queries)
+            result = results[name]
+            self.stdout.write(
+                f"{name:<30} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['queries']:>8}"
+            )
+        return results
+
+    def _booking_days(self, count):
+        """Weekdays after the generated appointments"""
+        days = []
+        day = timezone.localdate() + timedelta(days=FUTURE_DAYS)
+        while len(days) < count:
+            day += timedelta(days=1)
+            if day.weekday() < 5:
+                days.append(day)
+        return days
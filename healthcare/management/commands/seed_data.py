@@ -0,0 +1,46 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from healthcare.synthetic import BATCH_SIZE, PASSWORD, generate
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with deterministic synthetic doctors, patients, schedules, time off, appointments and '
+        'prescriptions, for load tests and profiling at production volume. Every user gets the same password.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=200)
+        parser.add_argument('--patients', type=int, default=50000)
+        parser.add_argument('--appointments', type=int, default=1000000)
+        parser.add_argument('--prescriptions', type=int, default=250000)
+        parser.add_argument('--time-off', type=int, help='Time off requests (default two per doctor)')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator')
+        parser.add_argument('--prefix', default='synthetic', help='Start of every generated username')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per INSERT batch')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=f"{options['prefix']}_").exists():
+            raise CommandError(f"Users starting with {options['prefix']}_ already exist; pick another --prefix")
+
+        start = time.perf_counter()
+
+        def progress(label, count):
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{label.replace('_', ' '):<20} {count:>10,} rows  {elapsed:>7.1f} s")
+
+        counts = generate(
+            doctors=options['doctors'], patients=options['patients'], appointments=options['appointments'],
+            prescriptions=options['prescriptions'], time_off=options['time_off'], seed=options['seed'],
+            prefix=options['prefix'], batch_size=options['batch_size'], progress=progress,
+        )
+        elapsed = time.perf_counter() - start
+        rows = sum(count for count in counts.values() if isinstance(count, int))
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {rows:,} rows in {elapsed:.1f} s ({rows / elapsed:,.0f} rows/s). '
+            f"Log in as {counts['doctor_username']}, {counts['patient_username']} or "
+            f"{counts['staff_username']} with the password {PASSWORD}"
+        ))
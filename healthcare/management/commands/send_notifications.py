@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from healthcare.notifications import dispatch_notifications, queue_appointment_reminders
+
+
+class Command(BaseCommand):
+    help = 'Queue appointment reminders for the upcoming window and send due notifications (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window-hours', type=int, default=settings.APPOINTMENT_REMINDER_WINDOW_HOURS,
+            help='Remind appointments starting within this many hours',
+        )
+        parser.add_argument('--batch-size', type=int, default=settings.NOTIFICATION_BATCH_SIZE, help='Rows per query and insert')
+        parser.add_argument('--limit', type=int, help='Send at most this many notifications')
+        parser.add_argument('--no-reminders', action='store_true', help='Only send notifications that are already queued')
+        parser.add_argument('--no-dispatch', action='store_true', help='Only queue reminders')
+
+    def handle(self, *args, **options):
+        if not options['no_reminders']:
+            queued = queue_appointment_reminders(
+                window=timedelta(hours=options['window_hours']),
+                batch_size=options['batch_size'],
+            )
+            self.stdout.write(f'Queued {queued} appointment reminders')
+
+        if not options['no_dispatch']:
+            stats = dispatch_notifications(batch_size=options['batch_size'], limit=options['limit'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Sent {stats['sent']} notifications ({stats['retrying']} to retry, {stats['failed']} failed)"
+            ))
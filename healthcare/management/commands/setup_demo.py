@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from healthcare.demo import DEMO_LOGINS, DEMO_PASSWORD, demo_enabled, provision_demo_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the demo doctor and patients with their schedule, appointments and prescriptions. '
+        'Does nothing when they already exist, so it can run on every deploy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Delete the demo accounts and their data first')
+
+    def handle(self, *args, **options):
+        if not demo_enabled():
+            raise CommandError('Demo accounts are turned off (DEMO_ACCOUNTS)')
+        counts = provision_demo_data(reset=options['reset'])
+        if counts is None:
+            self.stdout.write('Demo accounts already exist')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['users']} demo users, {counts['appointments']} appointments and "
+            f"{counts['prescriptions']} prescriptions. Log in as {' or '.join(DEMO_LOGINS.values())} "
+            f"with the password {DEMO_PASSWORD}"
+        ))
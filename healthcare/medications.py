@@ -0,0 +1,323 @@
+"""
+Medication reference data and prescription safety checks.
+
+The ``Medication`` and ``MedicationInteraction`` tables are loaded from the
+bundled dataset in ``data/medications.json`` by migration 0017, and reloaded
+with the ``load_medications`` management command when the dataset changes.
+Without reference data nothing can be checked, so check_prescription()
+then warns that every prescription is unchecked rather than passing it.
+
+Checks run against an in-memory ``MedicationIndex`` that is built once per
+process from those tables. It maps normalized names and brand names to
+medications, stores each interaction under its unordered pair, and keeps a
+prefix trie for autocomplete. Looking up a name, a pair or a prefix is a
+couple of dict operations, so checking a new prescription against all of a
+patient's active ones takes microseconds once their prescriptions are loaded.
+The index is rebuilt when the reference tables change (see signals.py): a
+version stamp in the shared cache tells every process to rebuild.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Medication, MedicationInteraction, Prescription
+
+logger = logging.getLogger(__name__)
+
+DATASET_PATH = Path(__file__).resolve().parent / 'data' / 'medications.json'
+INDEX_VERSION_KEY = 'healthcare:medications:version'
+
+# Completions kept per trie node, in alphabetical order
+MAX_COMPLETIONS = 10
+
+# Prescriptions whose duration can't be read are treated as active for this long
+DEFAULT_ACTIVE_DAYS = 30
+# Prescriptions older than this are never checked against
+ACTIVE_WINDOW_DAYS = 365
+
+SEVERITY_ORDER = {'major': 0, 'moderate': 1, 'minor': 2}
+
+UNCHECKED_WARNING = (
+    'major', 'Interactions could not be checked because the medication reference data is not loaded.',
+)
+
+_STRENGTH = re.compile(r'\b\d+(?:\.\d+)?\s*(?:mg|mcg|g|ml|iu|units?|%)(?!\w)')
+_DOSAGE_FORMS = {
+    'tablet', 'tablets', 'tab', 'tabs', 'capsule', 'capsules', 'cap', 'caps', 'syrup', 'suspension',
+    'solution', 'injection', 'cream', 'ointment', 'drops', 'inhaler', 'er', 'xr', 'sr', 'xl', 'dr', 'oral',
+}
+_DURATION = re.compile(r'(\d+)\s*(day|week|month|year)s?')
+_DURATION_DAYS = {'day': 1, 'week': 7, 'month': 30, 'year': 365}
+_ONGOING = ('ongoing', 'indefinite', 'long-term', 'long term', 'continuous', 'lifelong')
+
+
+def normalize_name(name):
+    """
+    Reduce a medication name to the form it is indexed under.
+
+    Strengths and dosage forms are dropped, so 'Amoxicillin 500mg capsules'
+    becomes 'amoxicillin'.
+    """
+    name = _STRENGTH.sub(' ', name.lower())
+    words = re.sub(r'[^a-z0-9]+', ' ', name).split()
+    return ' '.join(word for word in words if word not in _DOSAGE_FORMS)
+
+
+class _TrieNode:
+    __slots__ = ('children', 'completions')
+
+    def __init__(self):
+        self.children = {}
+        self.completions = []
+
+
+class PrefixTrie:
+    """
+    Prefix trie whose nodes keep their first completions.
+
+    Keys must be inserted in the order completions should be returned. Each
+    node on a key's path keeps up to ``MAX_COMPLETIONS`` values, so a lookup
+    costs the length of the prefix, however many keys share it.
+    """
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def insert(self, key, value):
+        node = self.root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+            if len(node.completions) < MAX_COMPLETIONS and value not in node.completions:
+                node.completions.append(value)
+
+    def complete(self, prefix, limit=MAX_COMPLETIONS):
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.completions[:limit]
+
+
+class MedicationIndex:
+    """In-memory lookup of medications by name, of interactions by pair, and of names by prefix"""
+
+    def __init__(self, medications, interactions):
+        """
+        Args:
+            medications: (id, name, drug_class, brand_names) rows
+            interactions: (medication_id, interacts_with_id, severity, description) rows
+        """
+        self.medications = {}
+        self.by_name = {}
+        keys = []
+        for pk, name, drug_class, brand_names in medications:
+            self.medications[pk] = (name, drug_class)
+            for alias in [name, *brand_names]:
+                key = normalize_name(alias)
+                if key:
+                    self.by_name.setdefault(key, pk)
+                    keys.append((key, pk))
+
+        self.interactions = {
+            frozenset((first, second)): (severity, description)
+            for first, second, severity, description in interactions
+        }
+
+        self.trie = PrefixTrie()
+        for key, pk in sorted(keys):
+            self.trie.insert(key, pk)
+
+    def resolve(self, name):
+        """
+        Find the medication a prescribed name refers to.
+
+        Returns:
+            int: Medication id, or None when the name isn't in the reference data
+        """
+        words = normalize_name(name).split()
+        # 'metoprolol succinate' should still match 'metoprolol'
+        for end in range(len(words), 0, -1):
+            pk = self.by_name.get(' '.join(words[:end]))
+            if pk is not None:
+                return pk
+        return None
+
+    def name(self, pk):
+        return self.medications[pk][0]
+
+    def interaction(self, first, second):
+        return self.interactions.get(frozenset((first, second)))
+
+    def autocomplete(self, prefix, limit=MAX_COMPLETIONS):
+        """
+        Get the medications whose name or brand name starts with the prefix.
+
+        Returns:
+            list: (name, drug_class) tuples in alphabetical order of the matched name
+        """
+        prefix = ' '.join(re.sub(r'[^a-z0-9]+', ' ', prefix.lower()).split())
+        if not prefix:
+            return []
+        return [self.medications[pk] for pk in self.trie.complete(prefix, limit)]
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_medication_index():
+    """Get the process-wide medication index, rebuilding it if the reference data changed"""
+    global _index, _index_version
+
+    version = cache.get(INDEX_VERSION_KEY)
+    if version is None:
+        cache.add(INDEX_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(INDEX_VERSION_KEY)
+    if _index is not None and _index_version == version:
+        return _index
+
+    with _index_lock:
+        if _index is None or _index_version != version:
+            _index = MedicationIndex(
+                Medication.objects.values_list('pk', 'name', 'drug_class', 'brand_names'),
+                MedicationInteraction.objects.values_list('medication_id', 'interacts_with_id', 'severity', 'description'),
+            )
+            _index_version = version
+            logger.info(f'Built medication index: {len(_index.medications)} medications, {len(_index.interactions)} interactions')
+    return _index
+
+
+def invalidate_medication_index():
+    """Make every process rebuild its medication index on next use"""
+    cache.set(INDEX_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def load_medications(path=DATASET_PATH):
+    """
+    Load the reference dataset, updating medications and interactions that already exist.
+
+    Returns:
+        tuple: (number of medications, number of interactions) in the dataset
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    with transaction.atomic():
+        Medication.objects.bulk_create(
+            [
+                Medication(name=row['name'], drug_class=row.get('drug_class', ''), brand_names=row.get('brand_names', []))
+                for row in data['medications']
+            ],
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=['drug_class', 'brand_names'],
+        )
+        ids = dict(Medication.objects.values_list('name', 'pk'))
+        interactions = []
+        for row in data['interactions']:
+            # Each pair is stored once, in name order
+            first, second = sorted(row['drugs'])
+            interactions.append(MedicationInteraction(
+                medication_id=ids[first],
+                interacts_with_id=ids[second],
+                severity=row['severity'],
+                description=row.get('description', ''),
+            ))
+        MedicationInteraction.objects.bulk_create(
+            interactions,
+            update_conflicts=True,
+            unique_fields=['medication', 'interacts_with'],
+            update_fields=['severity', 'description'],
+        )
+    # bulk_create sends no signals
+    invalidate_medication_index()
+    return len(data['medications']), len(interactions)
+
+
+def active_days(duration):
+    """
+    Get how many days a prescription runs for from its free-text duration.
+
+    Returns:
+        int: Number of days, or None for ongoing prescriptions
+    """
+    duration = (duration or '').lower()
+    if any(word in duration for word in _ONGOING):
+        return None
+    match = _DURATION.search(duration)
+    if not match:
+        return DEFAULT_ACTIVE_DAYS
+    return int(match.group(1)) * _DURATION_DAYS[match.group(2)]
+
+
+def active_prescriptions(patient, now=None):
+    """
+    Get a patient's prescriptions that are still running.
+
+    Returns:
+        list: Prescription rows as dicts with pk, medication_id, medication_name and created_at
+    """
+    now = now or timezone.now()
+    rows = (
+        Prescription.objects
+        .filter(patient=patient, created_at__gte=now - timedelta(days=ACTIVE_WINDOW_DAYS))
+        .order_by('-created_at')
+        .values('pk', 'medication_id', 'medication_name', 'duration', 'created_at')
+    )
+    active = []
+    for row in rows:
+        days = active_days(row['duration'])
+        if days is None or row['created_at'] + timedelta(days=days) >= now:
+            active.append(row)
+    return active
+
+
+def check_prescription(medication_id, active, index=None):
+    """
+    Check a medication against a patient's active prescriptions.
+
+    Args:
+        medication_id: Reference id of the new medication
+        active: Rows from active_prescriptions()
+
+    Returns:
+        list: (severity, message) tuples, most severe first
+    """
+    index = index or get_medication_index()
+    if not index.medications:
+        logger.warning('Medication reference data is not loaded; prescriptions are not checked for interactions')
+        return [UNCHECKED_WARNING]
+    if medication_id not in index.medications:
+        return []
+    name, drug_class = index.medications[medication_id]
+
+    warnings = []
+    for row in active:
+        other_id = row['medication_id'] or index.resolve(row['medication_name'])
+        if other_id is None:
+            continue
+        started = row['created_at'].strftime('%b %d, %Y')
+        if other_id == medication_id:
+            warnings.append(('major', f"Duplicate: {name} was already prescribed on {started} ({row['medication_name']})."))
+            continue
+        interaction = index.interaction(medication_id, other_id)
+        if interaction:
+            severity, description = interaction
+            warnings.append((severity, f'{severity.title()} interaction with {index.name(other_id)}: {description}'))
+        elif drug_class and drug_class == index.medications[other_id][1]:
+            warnings.append((
+                'moderate', f'Therapeutic duplication: {index.name(other_id)} (prescribed {started}) is also a {drug_class}.',
+            ))
+    warnings.sort(key=lambda warning: SEVERITY_ORDER[warning[0]])
+    return warnings
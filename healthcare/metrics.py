@@ -0,0 +1,316 @@
+"""
+Per-view request instrumentation.
+
+``RequestMetricsMiddleware`` records, for every request that resolves to a
+named URL, the number of database queries, the time spent in the database,
+the time spent rendering templates and the total latency. Queries are timed
+with a connection execute wrapper, and templates by the
+``InstrumentedDjangoTemplates`` backend set in TEMPLATES.
+
+Each view keeps its latest ``REQUEST_METRICS_SAMPLES`` samples in a ring
+buffer, from which the admin metrics page and the Prometheus endpoint compute
+percentiles. Totals (request count and sums) cover the life of the process.
+Every worker process has its own buffers, so Prometheus should scrape each
+worker, or the numbers describe whichever worker answered.
+
+Views that run more queries than their budget in ``QUERY_BUDGETS`` (or
+``DEFAULT_QUERY_BUDGET``) log a warning, which is how N+1 queries show up.
+A budget is a number, or a dict of numbers by request method for views whose
+GET and POST cost differ.
+Process-wide totals of requests, server errors and queries slower than
+``SLOW_QUERY_MS`` feed the health history in health.py. Requests of demo
+sessions aren't recorded, so demo traffic doesn't skew the numbers.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 95, 99)
+
+# (field, Prometheus metric name, help text, scale from the sample unit to the Prometheus unit)
+METRIC_FIELDS = (
+    ('queries', 'healthcare_request_queries', 'Database queries per request', 1),
+    ('db_ms', 'healthcare_request_db_seconds', 'Time spent in the database per request', 0.001),
+    ('template_ms', 'healthcare_request_template_seconds', 'Time spent rendering templates per request', 0.001),
+    ('total_ms', 'healthcare_request_latency_seconds', 'Request latency', 0.001),
+)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class _RequestSample:
+    __slots__ = ('queries', 'db_ms', 'template_ms', 'template_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.template_depth = 0
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+class ViewMetrics:
+    """Ring buffer of a view's latest samples, plus totals since the process started"""
+
+    def __init__(self, size):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.sums = dict.fromkeys((field for field, *_ in METRIC_FIELDS), 0)
+        self.budget_violations = 0
+
+    def add(self, sample):
+        self.samples.append(sample)
+        self.count += 1
+        for field, value in sample.items():
+            self.sums[field] += value
+
+    def summary(self):
+        """
+        Returns:
+            dict: count, budget_violations, sums, and per field its percentiles and maximum over the buffer
+        """
+        summary = {'count': self.count, 'budget_violations': self.budget_violations, 'sums': dict(self.sums)}
+        for field, *_ in METRIC_FIELDS:
+            values = sorted(sample[field] for sample in self.samples)
+            summary[field] = {f'p{p}': percentile(values, p) for p in PERCENTILES}
+            summary[field]['max'] = values[-1] if values else 0
+        return summary
+
+
+class MetricsRegistry:
+    """The per-view metrics of this process"""
+
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.slow_queries = 0
+
+    def count_request(self, error=False):
+        with self._lock:
+            self.requests += 1
+            if error:
+                self.errors += 1
+
+    def count_slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def totals(self):
+        """
+        Returns:
+            dict: requests, errors and slow_queries since the process started
+        """
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors, 'slow_queries': self.slow_queries}
+
+    def record(self, view_name, sample, over_budget=False):
+        with self._lock:
+            metrics = self._views.get(view_name)
+            if metrics is None:
+                metrics = self._views[view_name] = ViewMetrics(getattr(settings, 'REQUEST_METRICS_SAMPLES', 1000))
+            metrics.add(sample)
+            if over_budget:
+                metrics.budget_violations += 1
+
+    def snapshot(self):
+        """
+        Returns:
+            list: (view name, summary dict) tuples sorted by view name
+        """
+        with self._lock:
+            return [(name, metrics.summary()) for name, metrics in sorted(self._views.items())]
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+            self.requests = self.errors = self.slow_queries = 0
+
+
+registry = MetricsRegistry()
+
+
+def query_budget(view_name, method='GET'):
+    """Get the most queries a request to a view may run, or None for no limit"""
+    default = getattr(settings, 'DEFAULT_QUERY_BUDGET', None)
+    budget = getattr(settings, 'QUERY_BUDGETS', {}).get(view_name, default)
+    if isinstance(budget, dict):
+        return budget.get(method, default)
+    return budget
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, DB time, template time and latency of each request per URL name.
+
+    Works on both the sync (WSGI) and async (ASGI) request paths, so async
+    views and streaming responses don't get adapted back to sync.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        from .health import sample_if_due
+
+        self.get_response = get_response
+        self.sample_health = sample_if_due
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sample = _RequestSample()
+        token = _current.set(sample)
+        start = time.perf_counter()
+        try:
+            with self._time_queries():
+                response = self.get_response(request)
+        except Exception:
+            registry.count_request(error=True)
+            raise
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - start) * 1000
+        session = getattr(request, 'session', None)
+        if session is None or not session.get('is_demo_user'):
+            self._record(request, response, sample, total_ms)
+        self.sample_health()
+        return response
+
+    async def __acall__(self, request):
+        sample = _RequestSample()
+        token = _current.set(sample)
+        start = time.perf_counter()
+        try:
+            # Sync code, such as the ORM under an async view, runs its queries on the connections of the
+            # request's sync thread, so the wrappers are added and removed there
+            queries = await sync_to_async(self._time_queries)()
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(queries.close)()
+        except Exception:
+            registry.count_request(error=True)
+            raise
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - start) * 1000
+        session = getattr(request, 'session', None)
+        if session is None or not await session.aget('is_demo_user'):
+            self._record(request, response, sample, total_ms)
+        # A due sample reads the database size and process stats, which block
+        await sync_to_async(self.sample_health)()
+        return response
+
+    def _time_queries(self):
+        """Time the queries of every database connection until the returned ExitStack is closed"""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self._time_query))
+        return stack
+
+    @staticmethod
+    def _record(request, response, sample, total_ms):
+        registry.count_request(error=response.status_code >= 500)
+
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.view_name:
+            budget = query_budget(match.view_name, request.method)
+            over_budget = budget is not None and sample.queries > budget
+            if over_budget:
+                logger.warning(
+                    f'{match.view_name} ran {sample.queries} queries, over its budget of {budget} '
+                    f'({request.method} {request.path})'
+                )
+            registry.record(match.view_name, {
+                'queries': sample.queries,
+                'db_ms': sample.db_ms,
+                'template_ms': sample.template_ms,
+                'total_ms': total_ms,
+            }, over_budget)
+
+    @staticmethod
+    def _time_query(execute, sql, params, many, context):
+        sample = _current.get()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if sample is not None:
+                sample.queries += 1
+                sample.db_ms += elapsed_ms
+            if elapsed_ms > getattr(settings, 'SLOW_QUERY_MS', 100):
+                registry.count_slow_query()
+
+
+class _TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        sample = _current.get()
+        if sample is None:
+            return super().render(context, request)
+        # Templates rendered while rendering another one are already in its time
+        sample.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            sample.template_depth -= 1
+            if not sample.template_depth:
+                sample.template_ms += (time.perf_counter() - start) * 1000
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing each render for RequestMetricsMiddleware"""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name).template, self)
+
+
+def prometheus_text(snapshot=None):
+    """
+    Render the metrics in the Prometheus text exposition format.
+
+    Each metric is a summary per view: quantiles over the ring buffer, and
+    _sum and _count since the process started.
+    """
+    snapshot = registry.snapshot() if snapshot is None else snapshot
+    lines = []
+    for field, name, help_text, scale in METRIC_FIELDS:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} summary')
+        for view_name, summary in snapshot:
+            for p in PERCENTILES:
+                value = summary[field][f'p{p}'] * scale
+                lines.append(f'{name}{{view="{view_name}",quantile="{p / 100}"}} {value:g}')
+            lines.append(f'{name}_sum{{view="{view_name}"}} {summary["sums"][field] * scale:g}')
+            lines.append(f'{name}_count{{view="{view_name}"}} {summary["count"]}')
+    lines.append('# HELP healthcare_query_budget_violations_total Requests that ran more queries than their budget')
+    lines.append('# TYPE healthcare_query_budget_violations_total counter')
+    for view_name, summary in snapshot:
+        lines.append(f'healthcare_query_budget_violations_total{{view="{view_name}"}} {summary["budget_violations"]}')
+    return '\n'.join(lines) + '\n'
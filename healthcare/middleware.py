@@ -0,0 +1,49 @@
+"""
+Middleware for the healthcare system.
+"""
+
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Names produced by ManifestStaticFilesStorage, e.g. "user-reports.55e7cbb9ba48.css"
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[A-Za-z0-9]+$')
+
+
+class StaticCacheControlMiddleware:
+    """
+    Serve fingerprinted static files with far-future cache headers.
+
+    A hashed file name changes whenever the file content changes, so browsers
+    can keep these files for a year and never revalidate them. Unhashed static
+    files are left alone. Front-end servers serving STATIC_ROOT directly should
+    apply the same rule. Works on both the sync and async request paths.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.max_age = getattr(settings, 'STATIC_CACHE_MAX_AGE', 60 * 60 * 24 * 365)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        static_url = '/' + settings.STATIC_URL.lstrip('/')
+        if (
+            response.status_code == 200
+            and request.path.startswith(static_url)
+            and HASHED_NAME_RE.search(request.path)
+        ):
+            response['Cache-Control'] = f'public, max-age={self.max_age}, immutable'
+        return response
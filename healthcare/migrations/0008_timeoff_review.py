@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0007_appointmentseries'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeoffrequest',
+            name='reviewed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='timeoffrequest',
+            name='reviewed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='kind',
+            field=models.CharField(choices=[('appointment_reminder', 'Appointment reminder'), ('appointment_reassigned', 'Appointment reassigned'), ('appointment_cancelled', 'Appointment cancelled')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0008_timeoff_review'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='doctorschedule',
+            options={'ordering': ['day_of_week', 'start_time']},
+        ),
+        migrations.AlterUniqueTogether(
+            name='doctorschedule',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='doctorschedule',
+            constraint=models.UniqueConstraint(fields=('doctor', 'day_of_week', 'start_time'), name='unique_doctor_shift'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0009_doctorschedule_split_shifts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='kind',
+            field=models.CharField(choices=[('appointment_reminder', 'Appointment reminder'), ('appointment_reassigned', 'Appointment reassigned'), ('appointment_cancelled', 'Appointment cancelled'), ('waitlist_offer', 'Waitlist offer')], max_length=30),
+        ),
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('specialization', models.CharField(blank=True, max_length=100)),
+                ('earliest_date', models.DateField()),
+                ('latest_date', models.DateField()),
+                ('priority', models.PositiveSmallIntegerField(choices=[(0, 'Routine'), (1, 'Soon'), (2, 'Urgent')], default=0)),
+                ('reason', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('offered', 'Offered'), ('booked', 'Booked'), ('expired', 'Expired'), ('cancelled', 'Cancelled')], default='waiting', max_length=20)),
+                ('offer_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('doctor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='healthcare.doctor')),
+                ('offered_appointment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='healthcare.appointment')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='healthcare.patient')),
+            ],
+            options={
+                'verbose_name_plural': 'waitlist entries',
+                'ordering': ['-priority', 'created_at'],
+                'indexes': [models.Index(fields=['status', '-priority', 'created_at'], name='waitlist_queue_idx'), models.Index(fields=['status', 'offer_expires_at'], name='waitlist_offer_expiry_idx')],
+            },
+        ),
+    ]
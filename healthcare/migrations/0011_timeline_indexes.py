@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0010_waitlistentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'appointment_date', 'appointment_time'], name='appointment_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['patient', 'created_at'], name='prescription_patient_date_idx'),
+        ),
+    ]
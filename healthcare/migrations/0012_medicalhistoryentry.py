@@ -0,0 +1,55 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_reported_history(apps, schema_editor):
+    """Record each patient's free-text history as a note entry, dated when they signed up"""
+    Patient = apps.get_model('healthcare', 'Patient')
+    MedicalHistoryEntry = apps.get_model('healthcare', 'MedicalHistoryEntry')
+    patients = (
+        Patient.objects.exclude(medical_history='')
+        .values_list('pk', 'medical_history', 'user__date_joined')
+        .iterator(chunk_size=1000)
+    )
+    batch = []
+    for pk, text, date_joined in patients:
+        batch.append(MedicalHistoryEntry(
+            patient_id=pk, entry_type='note', title='Reported at signup', details=text, recorded_on=date_joined.date(),
+        ))
+        if len(batch) >= 1000:
+            MedicalHistoryEntry.objects.bulk_create(batch)
+            batch = []
+    MedicalHistoryEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0011_timeline_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicalHistoryEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('condition', 'Condition'), ('allergy', 'Allergy'), ('medication', 'Medication'), ('procedure', 'Procedure'), ('note', 'Note')], default='condition', max_length=20)),
+                ('title', models.CharField(max_length=200)),
+                ('details', models.TextField(blank=True)),
+                ('recorded_on', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history_entries', to='healthcare.patient')),
+                ('recorded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'medical history entries',
+                'ordering': ['-recorded_on', '-id'],
+                'indexes': [models.Index(fields=['patient', 'recorded_on'], name='history_patient_date_idx'), models.Index(fields=['entry_type', 'title'], name='history_condition_idx')],
+            },
+        ),
+        migrations.RunPython(copy_reported_history, migrations.RunPython.noop),
+    ]
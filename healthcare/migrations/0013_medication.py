@@ -0,0 +1,44 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0012_medicalhistoryentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Medication',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('drug_class', models.CharField(blank=True, max_length=100)),
+                ('brand_names', models.JSONField(blank=True, default=list)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='prescription',
+            name='medication',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='prescriptions', to='healthcare.medication'),
+        ),
+        migrations.CreateModel(
+            name='MedicationInteraction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('severity', models.CharField(choices=[('minor', 'Minor'), ('moderate', 'Moderate'), ('major', 'Major')], max_length=20)),
+                ('description', models.TextField(blank=True)),
+                ('interacts_with', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='healthcare.medication')),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interactions', to='healthcare.medication')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('medication', 'interacts_with'), name='unique_medication_interaction')],
+            },
+        ),
+    ]
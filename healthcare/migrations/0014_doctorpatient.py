@@ -0,0 +1,56 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q
+
+
+def backfill_doctor_patients(apps, schema_editor):
+    """Create the relationship of every doctor and patient who have appointments"""
+    Appointment = apps.get_model('healthcare', 'Appointment')
+    DoctorPatient = apps.get_model('healthcare', 'DoctorPatient')
+    rows = (
+        Appointment.objects
+        .order_by()
+        .values('doctor_id', 'patient_id')
+        .annotate(
+            first_visit=Min('appointment_date'),
+            last_visit=Max('appointment_date'),
+            visit_count=Count('id', filter=~Q(status='cancelled')),
+        )
+        .iterator(chunk_size=1000)
+    )
+    batch = []
+    for row in rows:
+        batch.append(DoctorPatient(**row))
+        if len(batch) >= 1000:
+            DoctorPatient.objects.bulk_create(batch)
+            batch = []
+    DoctorPatient.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0013_medication'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorPatient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_visit', models.DateField()),
+                ('last_visit', models.DateField()),
+                ('visit_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='patient_links', to='healthcare.doctor')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='doctor_links', to='healthcare.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['doctor', 'last_visit'], name='doctor_patient_recent_idx')],
+                'constraints': [models.UniqueConstraint(fields=('doctor', 'patient'), name='unique_doctor_patient')],
+            },
+        ),
+        migrations.RunPython(backfill_doctor_patients, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:09
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Concat
+
+
+def backfill_display_names(apps, schema_editor):
+    """Copy every patient's and doctor's user name onto their profile, one UPDATE per table"""
+    User = apps.get_model('auth', 'User')
+    name = Subquery(
+        User.objects
+        .filter(pk=OuterRef('user_id'))
+        .annotate(name=Concat('first_name', Value(' '), 'last_name'))
+        .values('name')[:1]
+    )
+    for model_name in ('Patient', 'Doctor'):
+        apps.get_model('healthcare', model_name).objects.update(display_name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('healthcare', '0014_doctorpatient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='display_name',
+            field=models.CharField(blank=True, editable=False, max_length=301),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='display_name',
+            field=models.CharField(blank=True, editable=False, max_length=301),
+        ),
+        migrations.RunPython(backfill_display_names, migrations.RunPython.noop),
+    ]
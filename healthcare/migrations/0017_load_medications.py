@@ -0,0 +1,52 @@
+import json
+from pathlib import Path
+
+from django.db import migrations
+
+DATASET_PATH = Path(__file__).resolve().parent.parent / 'data' / 'medications.json'
+
+
+def load_medications(apps, schema_editor):
+    """Load the bundled medication dataset, so interaction checks work on a fresh database"""
+    Medication = apps.get_model('healthcare', 'Medication')
+    MedicationInteraction = apps.get_model('healthcare', 'MedicationInteraction')
+    with open(DATASET_PATH, encoding='utf-8') as f:
+        data = json.load(f)
+
+    Medication.objects.bulk_create(
+        [
+            Medication(name=row['name'], drug_class=row.get('drug_class', ''), brand_names=row.get('brand_names', []))
+            for row in data['medications']
+        ],
+        update_conflicts=True,
+        unique_fields=['name'],
+        update_fields=['drug_class', 'brand_names'],
+    )
+    ids = dict(Medication.objects.values_list('name', 'pk'))
+    interactions = []
+    for row in data['interactions']:
+        # Each pair is stored once, in name order
+        first, second = sorted(row['drugs'])
+        interactions.append(MedicationInteraction(
+            medication_id=ids[first],
+            interacts_with_id=ids[second],
+            severity=row['severity'],
+            description=row.get('description', ''),
+        ))
+    MedicationInteraction.objects.bulk_create(
+        interactions,
+        update_conflicts=True,
+        unique_fields=['medication', 'interacts_with'],
+        update_fields=['severity', 'description'],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0016_notification_claims'),
+    ]
+
+    operations = [
+        migrations.RunPython(load_medications, migrations.RunPython.noop),
+    ]
@@ -10,20 +10,60 @@ class Address(models.Model):
     def __str__(self):
         return f"{self.line1}, {self.city}, {self.state} - {self.pincode}"
 
+def user_display_name(user):
+    return f"{user.first_name} {user.last_name}"
+
+
+def set_display_name(profile, update_fields=None):
+    """Copy the user's name onto a patient or doctor being saved, if its user is loaded or its name is unset"""
+    if update_fields is not None and 'display_name' not in update_fields:
+        return
+    if profile.user_id and (type(profile).user.is_cached(profile) or not profile.display_name):
+        profile.display_name = user_display_name(profile.user)
+
+
+class PatientQuerySet(models.QuerySet):
+    def with_history(self):
+        """Also load the free-text medical history, which is deferred by default"""
+        return self.defer(None)
+
+    def with_condition(self, title, entry_type='condition'):
+        """Patients with a history entry of this condition (or allergy, etc.)"""
+        entries = MedicalHistoryEntry.objects.filter(
+            patient=models.OuterRef('pk'), entry_type=entry_type, title__iexact=title,
+        )
+        return self.filter(models.Exists(entries))
+
+
+class PatientManager(models.Manager.from_queryset(PatientQuerySet)):
+    def get_queryset(self):
+        # Most pages never show the free-text history, so don't load it with every patient
+        return super().get_queryset().defer('medical_history')
+
+
 class Patient(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     profile_picture = models.ImageField(upload_to='profile_pics', blank=True, null=True)
     address = models.OneToOneField(Address, on_delete=models.CASCADE)
     date_of_birth = models.DateField(blank=True, null=True)
     phone = models.CharField(max_length=20, blank=True)
+    # History reported by the patient at signup; recorded history is in MedicalHistoryEntry
     medical_history = models.TextField(blank=True)
+    # Copy of the user's name, so showing a patient needs no user query (kept in sync in signals.py)
+    display_name = models.CharField(max_length=301, blank=True, editable=False)
+
+    objects = PatientManager()
+
+    def save(self, *args, **kwargs):
+        set_display_name(self, kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.user.first_name} {self.user.last_name}"
+        return self.display_name
 
     @property
     def full_name(self):
-        return f"{self.user.first_name} {self.user.last_name}"
+        return self.display_name
 
 class Doctor(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -33,13 +73,19 @@ class Doctor(models.Model):
     license_number = models.CharField(max_length=50, blank=True, null=True)
     experience_years = models.IntegerField(default=0)
     phone = models.CharField(max_length=20, blank=True)
+    # Copy of the user's name, so showing a doctor needs no user query (kept in sync in signals.py)
+    display_name = models.CharField(max_length=301, blank=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        set_display_name(self, kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"Dr. {self.user.first_name} {self.user.last_name}"
+        return f"Dr. {self.display_name}"
 
     @property
     def full_name(self):
-        return f"Dr. {self.user.first_name} {self.user.last_name}"
+        return f"Dr. {self.display_name}"
 
 class Admin(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -63,12 +109,19 @@ class Appointment(models.Model):
     appointment_time = models.TimeField()
     reason = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    series = models.ForeignKey('AppointmentSeries', on_delete=models.SET_NULL, null=True, blank=True, related_name='appointments')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['appointment_date', 'appointment_time']
         unique_together = ['doctor', 'appointment_date', 'appointment_time']
+        indexes = [
+            # Date range scans across all doctors (e.g. finding appointments to remind)
+            models.Index(fields=['appointment_date', 'appointment_time'], name='appointment_datetime_idx'),
+            # A patient's appointments in date order (the patient timeline)
+            models.Index(fields=['patient', 'appointment_date', 'appointment_time'], name='appointment_patient_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.patient.full_name} with {self.doctor.full_name} on {self.appointment_date} at {self.appointment_time}"
@@ -81,6 +134,66 @@ class Appointment(models.Model):
     def formatted_time(self):
         return self.appointment_time.strftime('%I:%M %p')
 
+class DoctorPatient(models.Model):
+    """
+    A doctor's relationship with a patient they have appointments with.
+
+    Kept up to date from the appointment signals (see patients.py), so a
+    doctor's patients are one indexed lookup instead of a DISTINCT over all
+    their appointments.
+    """
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='patient_links')
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='doctor_links')
+    first_visit = models.DateField()
+    last_visit = models.DateField()
+    # Appointments that weren't cancelled
+    visit_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'patient'], name='unique_doctor_patient'),
+        ]
+        indexes = [
+            models.Index(fields=['doctor', 'last_visit'], name='doctor_patient_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor.full_name} - {self.patient.full_name}"
+
+class AppointmentSeries(models.Model):
+    """A recurring appointment, following a subset of iCalendar RRULE (FREQ, INTERVAL, COUNT, UNTIL)"""
+    FREQUENCY_CHOICES = [
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+    ]
+
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='appointment_series')
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='appointment_series')
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='weekly')
+    interval = models.PositiveSmallIntegerField(default=1)  # every n weeks/months
+    start_date = models.DateField()
+    appointment_time = models.TimeField()
+    count = models.PositiveSmallIntegerField(null=True, blank=True)  # number of occurrences
+    until = models.DateField(null=True, blank=True)  # last possible date (inclusive)
+    reason = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'appointment series'
+
+    def __str__(self):
+        return f"{self.patient.full_name} with {self.doctor.full_name}, {self.rule_display}"
+
+    @property
+    def rule_display(self):
+        unit = 'week' if self.frequency == 'weekly' else 'month'
+        every = f"every {self.interval} {unit}s" if self.interval > 1 else f"every {unit}"
+        return f"{every} from {self.start_date.strftime('%b %d, %Y')}"
+
 class DoctorSchedule(models.Model):
     DAYS_OF_WEEK = [
         ('monday', 'Monday'),
@@ -101,16 +214,55 @@ class DoctorSchedule(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        unique_together = ['doctor', 'day_of_week']
-        ordering = ['day_of_week']
+        ordering = ['day_of_week', 'start_time']
+        constraints = [
+            # A day can have several shifts (e.g. 09:00-12:00 and 14:00-18:00), each
+            # identified by its start time; the weekly editor upserts on this key
+            models.UniqueConstraint(fields=['doctor', 'day_of_week', 'start_time'], name='unique_doctor_shift'),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor.full_name} - {self.get_day_of_week_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+class Medication(models.Model):
+    """Reference entry for a medication, loaded from the bundled dataset (see medications.py)"""
+    name = models.CharField(max_length=200, unique=True)
+    drug_class = models.CharField(max_length=100, blank=True)
+    brand_names = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+class MedicationInteraction(models.Model):
+    """A known interaction between two medications, stored once per pair"""
+    SEVERITY_CHOICES = [
+        ('minor', 'Minor'),
+        ('moderate', 'Moderate'),
+        ('major', 'Major'),
+    ]
+
+    medication = models.ForeignKey(Medication, on_delete=models.CASCADE, related_name='interactions')
+    interacts_with = models.ForeignKey(Medication, on_delete=models.CASCADE, related_name='+')
+    severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES)
+    description = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['medication', 'interacts_with'], name='unique_medication_interaction'),
+        ]
 
     def __str__(self):
-        return f"{self.doctor.full_name} - {self.get_day_of_week_display()}"
+        return f"{self.medication} + {self.interacts_with} ({self.get_severity_display()})"
 
 class Prescription(models.Model):
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='prescriptions')
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='prescriptions')
     medication_name = models.CharField(max_length=200)
+    # Reference entry the name was matched to, if any
+    medication = models.ForeignKey(Medication, on_delete=models.SET_NULL, null=True, blank=True, related_name='prescriptions')
     dosage = models.CharField(max_length=100)
     frequency = models.CharField(max_length=100)
     duration = models.CharField(max_length=100)
@@ -120,10 +272,45 @@ class Prescription(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A patient's prescriptions in date order (the patient timeline)
+            models.Index(fields=['patient', 'created_at'], name='prescription_patient_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.patient.full_name} - {self.medication_name}"
 
+class MedicalHistoryEntry(models.Model):
+    """A dated condition, allergy, medication, procedure or note in a patient's history"""
+    ENTRY_TYPE_CHOICES = [
+        ('condition', 'Condition'),
+        ('allergy', 'Allergy'),
+        ('medication', 'Medication'),
+        ('procedure', 'Procedure'),
+        ('note', 'Note'),
+    ]
+
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='history_entries')
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPE_CHOICES, default='condition')
+    # The condition, allergen, medication or procedure
+    title = models.CharField(max_length=200)
+    details = models.TextField(blank=True)
+    recorded_on = models.DateField()
+    recorded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-recorded_on', '-id']
+        verbose_name_plural = 'medical history entries'
+        indexes = [
+            models.Index(fields=['patient', 'recorded_on'], name='history_patient_date_idx'),
+            # Finding patients by condition
+            models.Index(fields=['entry_type', 'title'], name='history_condition_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.patient.full_name} - {self.get_entry_type_display()}: {self.title}"
+
 class DoctorSettings(models.Model):
     doctor = models.OneToOneField(Doctor, on_delete=models.CASCADE, related_name='settings')
     email_notifications = models.BooleanField(default=True)
@@ -154,6 +341,8 @@ class TimeOffRequest(models.Model):
     reason = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     admin_notes = models.TextField(blank=True)
+    reviewed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    reviewed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -166,3 +355,124 @@ class TimeOffRequest(models.Model):
     @property
     def duration_days(self):
         return (self.end_date - self.start_date).days + 1
+
+class ProfilePictureUpload(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    PROFILE_TYPE_CHOICES = [
+        ('patient', 'Patient'),
+        ('doctor', 'Doctor'),
+        ('admin', 'Admin'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='picture_uploads')
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    profile_type = models.CharField(max_length=10, choices=PROFILE_TYPE_CHOICES)
+    original_name = models.CharField(max_length=255)
+    staged_path = models.CharField(max_length=500)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.original_name} ({self.get_status_display()})"
+
+class Notification(models.Model):
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    ]
+    KIND_CHOICES = [
+        ('appointment_reminder', 'Appointment reminder'),
+        ('appointment_reassigned', 'Appointment reassigned'),
+        ('appointment_cancelled', 'Appointment cancelled'),
+        ('waitlist_offer', 'Waitlist offer'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, null=True, blank=True, related_name='notifications')
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    destination = models.CharField(max_length=255)  # email address or phone number
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+    # Identifies the message so re-running the scheduler never queues it twice
+    dedupe_key = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    send_after = models.DateTimeField()
+    # When a dispatcher claimed the message for sending; claims older than
+    # NOTIFICATION_CLAIM_TIMEOUT_MINUTES are taken to be abandoned
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # The dispatcher's "due now" scan
+            models.Index(fields=['status', 'send_after'], name='notification_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} ({self.get_channel_display()}) to {self.destination}"
+
+class WaitlistEntry(models.Model):
+    """A patient waiting for a slot with a doctor, or with any doctor of a specialization"""
+    PRIORITY_CHOICES = [
+        (0, 'Routine'),
+        (1, 'Soon'),
+        (2, 'Urgent'),
+    ]
+    STATUS_CHOICES = [
+        ('waiting', 'Waiting'),
+        ('offered', 'Offered'),
+        ('booked', 'Booked'),
+        ('expired', 'Expired'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='waitlist_entries')
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, null=True, blank=True, related_name='waitlist_entries')
+    # Used when no doctor is chosen
+    specialization = models.CharField(max_length=100, blank=True)
+    earliest_date = models.DateField()
+    latest_date = models.DateField()
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=0)
+    reason = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
+    # The freed slot currently held for this patient
+    offered_appointment = models.ForeignKey(Appointment, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    offer_expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-priority', 'created_at']
+        verbose_name_plural = 'waitlist entries'
+        indexes = [
+            # Queue order: a freed slot goes to the first matching entry in this index
+            models.Index(fields=['status', '-priority', 'created_at'], name='waitlist_queue_idx'),
+            models.Index(fields=['status', 'offer_expires_at'], name='waitlist_offer_expiry_idx'),
+        ]
+
+    def __str__(self):
+        wanted = self.doctor.full_name if self.doctor_id else (self.specialization or 'any doctor')
+        return f"{self.patient.full_name} waiting for {wanted} ({self.get_status_display()})"
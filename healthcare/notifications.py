@@ -0,0 +1,513 @@
+"""
+Outbox-based notifications.
+
+Messages are first written to the ``Notification`` table and then sent by the
+``send_notifications`` management command (run it from cron every few
+minutes). A run does two things:
+
+1. It queues reminders for appointments that start within the reminder
+   window, following the doctor's ``DoctorSettings`` flags: reminders are sent
+   when ``appointment_reminders`` is on, over the channels enabled by
+   ``email_notifications`` and ``sms_notifications``.
+2. It sends due messages in batches per channel through the backend
+   configured in ``NOTIFICATION_BACKENDS``. Each batch is claimed in a short
+   transaction and sent outside it, throttled to the channel's rate limit;
+   failures are retried with exponential backoff. Messages of a channel with
+   no backend configured stay pending until one is.
+
+Every message has a unique dedupe key. The window slides forward on each run,
+so overlapping runs never queue the same reminder twice.
+
+Other code queues messages the same way, e.g. queue_appointment_changes()
+when approved time off moves or cancels appointments, and
+queue_waitlist_offer() when a freed slot is offered from the waitlist.
+"""
+
+import json
+import logging
+import sys
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import checks
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Appointment, DoctorSettings, Notification
+
+logger = logging.getLogger(__name__)
+
+# First retry after a minute, then 2, 4, 8... minutes
+RETRY_BASE_DELAY = timedelta(minutes=1)
+
+# Reminders go out for appointments that can still happen
+REMINDER_STATUSES = ['pending', 'confirmed']
+
+
+class BaseBackend:
+    """
+    Sends the notifications of a channel.
+
+    Subclasses implement send(), and open()/close() when a batch can share a
+    connection.
+    """
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, notification):
+        raise NotImplementedError('Notification backends must implement send()')
+
+    def send_messages(self, notifications):
+        """
+        Send a batch of notifications.
+
+        Returns:
+            dict: Error message for each notification id that could not be sent
+        """
+        failures = {}
+        self.open()
+        try:
+            for notification in notifications:
+                try:
+                    self.send(notification)
+                except Exception as e:
+                    failures[notification.pk] = str(e) or e.__class__.__name__
+        finally:
+            self.close()
+        return failures
+
+
+class ConsoleBackend(BaseBackend):
+    """Write notifications to stdout (for development)"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send(self, notification):
+        lines = [f'[{notification.channel}] To: {notification.destination}']
+        if notification.subject:
+            lines.append(f'Subject: {notification.subject}')
+        lines.extend([notification.body, '-' * 72])
+        self.stream.write('\n'.join(lines) + '\n')
+
+    def close(self):
+        self.stream.flush()
+
+
+class FileBackend(BaseBackend):
+    """Append notifications as JSON lines to ``NOTIFICATION_FILE_PATH`` (for tests and staging)"""
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path or settings.NOTIFICATION_FILE_PATH
+        self._file = None
+
+    def open(self):
+        self._file = open(self.file_path, 'a', encoding='utf-8')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def send(self, notification):
+        self._file.write(json.dumps({
+            'id': notification.pk,
+            'channel': notification.channel,
+            'kind': notification.kind,
+            'to': notification.destination,
+            'subject': notification.subject,
+            'body': notification.body,
+        }) + '\n')
+
+
+class EmailBackend(BaseBackend):
+    """Send email notifications through Django's configured email backend, one connection per batch"""
+
+    def open(self):
+        self.connection = get_connection()
+        self.connection.open()
+
+    def close(self):
+        self.connection.close()
+
+    def send(self, notification):
+        EmailMessage(
+            notification.subject,
+            notification.body,
+            to=[notification.destination],
+            connection=self.connection,
+        ).send()
+
+
+def get_backend(channel):
+    """Get an instance of the backend configured for a channel"""
+    return import_string(settings.NOTIFICATION_BACKENDS[channel])()
+
+
+def configured_channels():
+    """Get the channels that have a sending backend"""
+    return [channel for channel, backend in settings.NOTIFICATION_BACKENDS.items() if backend]
+
+
+def check_notification_backends(app_configs=None, **kwargs):
+    """System check: every channel needs a backend, or its messages are never sent"""
+    return [
+        checks.Warning(
+            f'No notification backend is configured for {label} messages, so they stay queued.',
+            hint=f"Set NOTIFICATION_BACKENDS['{channel}'] (the {channel.upper()}_NOTIFICATION_BACKEND variable).",
+            id='healthcare.W001',
+        )
+        for channel, label in Notification.CHANNEL_CHOICES
+        if not settings.NOTIFICATION_BACKENDS.get(channel)
+    ]
+
+
+class RateLimiter:
+    """Space out sends so a channel stays under its provider's messages-per-second limit"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        # Largest batch that can go out at once without exceeding the rate
+        self.burst = max(1, int(rate)) if rate else None
+        self._next_send = time.monotonic()
+
+    def wait(self, count=1):
+        """Block until ``count`` more messages can be sent"""
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next_send > now:
+            time.sleep(self._next_send - now)
+            now = self._next_send
+        self._next_send = now + count * self.interval
+
+
+# Columns each appointment notification is built from
+APPOINTMENT_FIELDS = (
+    'id', 'appointment_date', 'appointment_time',
+    'patient__user_id', 'patient__user__email', 'patient__user__first_name', 'patient__phone',
+    'doctor__user__first_name', 'doctor__user__last_name',
+    'doctor__settings__email_notifications', 'doctor__settings__sms_notifications',
+)
+
+
+def reminder_dedupe_key(appointment_id, appointment_date, appointment_time, user_id, channel):
+    # The date, time and patient are part of the key so rescheduled appointments,
+    # and slots booked by another patient from the waitlist, are reminded again
+    return f'appointment_reminder:{appointment_id}:{appointment_date:%Y%m%d}{appointment_time:%H%M}:{user_id}:{channel}'
+
+
+def _appointment_messages(kind, row):
+    """Build the (channel, destination, subject, body) of each message about an appointment row"""
+    (_, appointment_date, appointment_time, _, email, first_name, phone,
+     doctor_first_name, doctor_last_name, email_enabled, sms_enabled) = row
+    when = f"{appointment_date.strftime('%b %d, %Y')} at {appointment_time.strftime('%I:%M %p')}"
+    doctor_name = f'Dr. {doctor_first_name} {doctor_last_name}'
+
+    # Doctors without a DoctorSettings row get the model defaults
+    if email_enabled is None:
+        email_enabled = DoctorSettings._meta.get_field('email_notifications').default
+    if sms_enabled is None:
+        sms_enabled = DoctorSettings._meta.get_field('sms_notifications').default
+
+    if kind == 'appointment_reminder':
+        subject = f'Appointment reminder: {when}'
+        text = f'This is a reminder of your appointment with {doctor_name} on {when}.'
+        sms = f'Reminder: appointment with {doctor_name} on {when}.'
+    elif kind == 'appointment_reassigned':
+        subject = f'Your appointment on {when} has a new doctor'
+        text = f'Your doctor is unavailable on {when}, so your appointment has been moved to {doctor_name} at the same time.'
+        sms = f'Your appointment on {when} is now with {doctor_name}.'
+    elif kind == 'waitlist_offer':
+        hold = settings.WAITLIST_OFFER_TTL_MINUTES
+        subject = f'An appointment is available: {when}'
+        text = (
+            f'A slot with {doctor_name} on {when} has opened up. It is held for you for the next {hold} minutes; '
+            f'accept it from your waitlist page before it is offered to the next patient.'
+        )
+        sms = f'A slot with {doctor_name} on {when} is held for you for {hold} minutes. Accept it from your waitlist page.'
+    else:
+        subject = f'Appointment cancelled: {when}'
+        text = f'Your appointment with {doctor_name} on {when} has been cancelled because the doctor is unavailable.'
+        sms = f'Your appointment with {doctor_name} on {when} has been cancelled.'
+
+    messages = []
+    if email_enabled and email:
+        messages.append((
+            'email',
+            email,
+            subject,
+            f'Hi {first_name or "there"},\n\n{text}\n\n'
+            f'If you need a different time, please book or reschedule from your dashboard.',
+        ))
+    if sms_enabled and phone:
+        messages.append(('sms', phone, '', sms))
+    return messages
+
+
+def _queue_appointment_rows(rows, kind, dedupe_key, now, batch_size):
+    """Write the messages for appointment rows to the outbox in batches"""
+    queued = 0
+    batch = []
+    for row in rows:
+        appointment_id, appointment_date, appointment_time, user_id = row[:4]
+        for channel, destination, subject, body in _appointment_messages(kind, row):
+            batch.append(Notification(
+                recipient_id=user_id,
+                appointment_id=appointment_id,
+                channel=channel,
+                kind=kind,
+                destination=destination,
+                subject=subject,
+                body=body,
+                dedupe_key=dedupe_key(appointment_id, appointment_date, appointment_time, user_id, channel),
+                send_after=now,
+            ))
+        if len(batch) >= batch_size:
+            queued += _queue_batch(batch)
+            batch = []
+    if batch:
+        queued += _queue_batch(batch)
+    return queued
+
+
+def queue_appointment_reminders(now=None, window=None, batch_size=None):
+    """
+    Queue reminders for appointments starting between ``now`` and ``now + window``.
+
+    Appointments are streamed from an indexed date range query and written to
+    the outbox in batches, so memory use stays flat however many are due.
+
+    Returns:
+        int: Number of reminders queued (already queued ones are skipped)
+    """
+    now = timezone.localtime(now or timezone.now())
+    window = window or timedelta(hours=settings.APPOINTMENT_REMINDER_WINDOW_HOURS)
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+    end = now + window
+
+    rows = (
+        Appointment.objects
+        .filter(appointment_date__range=(now.date(), end.date()), status__in=REMINDER_STATUSES)
+        .exclude(appointment_date=now.date(), appointment_time__lt=now.time())
+        .exclude(appointment_date=end.date(), appointment_time__gt=end.time())
+        .filter(Q(doctor__settings__isnull=True) | Q(doctor__settings__appointment_reminders=True))
+        .order_by()
+        .values_list(*APPOINTMENT_FIELDS)
+        .iterator(chunk_size=batch_size)
+    )
+    queued = _queue_appointment_rows(rows, 'appointment_reminder', reminder_dedupe_key, now, batch_size)
+    logger.info(f'Queued {queued} appointment reminders')
+    return queued
+
+
+def queue_appointment_changes(appointment_ids, kind, reference):
+    """
+    Tell patients that their appointments were reassigned or cancelled.
+
+    ``reference`` identifies the change (e.g. the time off request), so the
+    same change is never announced twice.
+
+    Returns:
+        int: Number of messages queued
+    """
+    batch_size = settings.NOTIFICATION_BATCH_SIZE
+    rows = (
+        Appointment.objects
+        .filter(pk__in=appointment_ids)
+        .order_by()
+        .values_list(*APPOINTMENT_FIELDS)
+        .iterator(chunk_size=batch_size)
+    )
+    queued = _queue_appointment_rows(
+        rows, kind, lambda appointment_id, date, time, user_id, channel: f'{kind}:{appointment_id}:{reference}:{channel}',
+        timezone.now(), batch_size,
+    )
+    logger.info(f'Queued {queued} {kind} notifications for {reference}')
+    return queued
+
+
+def queue_waitlist_offer(entry):
+    """
+    Tell a waitlisted patient about the slot held for them.
+
+    Returns:
+        int: Number of messages queued
+    """
+    row = (
+        Appointment.objects
+        .filter(pk=entry.offered_appointment_id)
+        .values_list(*APPOINTMENT_FIELDS)
+        .first()
+    )
+    if row is None:
+        return 0
+    patient = entry.patient
+    # The appointment row is the cancelled booking, so address the waitlisted patient instead
+    row = row[:3] + (patient.user_id, patient.user.email, patient.user.first_name, patient.phone) + row[7:]
+    queued = _queue_appointment_rows(
+        [row], 'waitlist_offer',
+        lambda appointment_id, date, time, user_id, channel: f'waitlist_offer:{entry.pk}:{appointment_id}:{channel}',
+        timezone.now(), settings.NOTIFICATION_BATCH_SIZE,
+    )
+    logger.info(f'Queued {queued} waitlist offer notifications for entry {entry.pk}')
+    return queued
+
+
+def cancel_pending_notifications(appointment_id, reason):
+    """
+    Withdraw the messages about an appointment that haven't been sent yet.
+
+    Messages a dispatcher has already claimed are left alone.
+
+    Returns:
+        int: Number of messages cancelled
+    """
+    now = timezone.now()
+    cancelled = Notification.objects.filter(appointment_id=appointment_id, status='pending').update(
+        status='cancelled', last_error=reason, updated_at=now,
+    )
+    if cancelled:
+        logger.info(f'Cancelled {cancelled} notifications for appointment {appointment_id}: {reason}')
+    return cancelled
+
+
+def _queue_batch(notifications):
+    """Insert the notifications that aren't in the outbox yet"""
+    existing = set(
+        Notification.objects
+        .filter(dedupe_key__in=[n.dedupe_key for n in notifications])
+        .values_list('dedupe_key', flat=True)
+    )
+    new = [n for n in notifications if n.dedupe_key not in existing]
+    # ignore_conflicts covers a concurrent run queueing the same reminder in between
+    Notification.objects.bulk_create(new, ignore_conflicts=True)
+    return len(new)
+
+
+def claim_due_notifications(now, size, channels=None):
+    """
+    Mark up to ``size`` due notifications as being sent by this dispatcher.
+
+    The claim is its own short transaction, so no locks are held while the
+    messages are sent. Claims abandoned by a dispatcher that died are taken
+    over once they are older than ``NOTIFICATION_CLAIM_TIMEOUT_MINUTES``.
+    With ``channels``, only messages of those channels are claimed.
+
+    Returns:
+        list: The claimed notifications
+    """
+    claimed_at = timezone.now()
+    abandoned = claimed_at - timedelta(minutes=settings.NOTIFICATION_CLAIM_TIMEOUT_MINUTES)
+    claimable = (
+        Q(status='pending', send_after__lte=now)
+        | Q(status='sending', claimed_at__lt=abandoned)
+    )
+    if channels is not None:
+        claimable &= Q(channel__in=channels)
+    with transaction.atomic():
+        # skip_locked lets several dispatchers share the outbox on databases that support it
+        ids = list(
+            Notification.objects
+            .select_for_update(skip_locked=True)
+            .filter(claimable)
+            .order_by('send_after', 'id')
+            .values_list('id', flat=True)[:size]
+        )
+        if not ids:
+            return []
+        # The filter is checked again by the UPDATE, so rows another dispatcher claimed in between are left alone
+        Notification.objects.filter(claimable, pk__in=ids).update(
+            status='sending', claimed_at=claimed_at, updated_at=claimed_at,
+        )
+    return list(Notification.objects.filter(pk__in=ids, status='sending', claimed_at=claimed_at).order_by('send_after', 'id'))
+
+
+def dispatch_notifications(now=None, batch_size=None, limit=None):
+    """
+    Send due notifications in batches grouped by channel.
+
+    Each batch is claimed first and then sent outside any transaction, so a
+    slow provider or the rate limit never holds database locks. Failed
+    messages are retried after an exponential backoff and marked failed
+    after ``NOTIFICATION_MAX_ATTEMPTS`` attempts.
+
+    Returns:
+        dict: Number of messages sent, scheduled for retry and failed
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+    limiters = {
+        channel: RateLimiter(rate)
+        for channel, rate in getattr(settings, 'NOTIFICATION_RATE_LIMITS', {}).items()
+    }
+    backends = {}
+    channels = configured_channels()
+    stats = {'sent': 0, 'retrying': 0, 'failed': 0}
+
+    while limit is None or sum(stats.values()) < limit:
+        size = batch_size if limit is None else min(batch_size, limit - sum(stats.values()))
+        due = claim_due_notifications(now, size, channels)
+        if not due:
+            break
+        _send_batch(due, backends, limiters, now, stats)
+
+    logger.info(f"Dispatched notifications: {stats['sent']} sent, {stats['retrying']} retrying, {stats['failed']} failed")
+    return stats
+
+
+def _send_batch(notifications, backends, limiters, now, stats):
+    by_channel = defaultdict(list)
+    for notification in notifications:
+        by_channel[notification.channel].append(notification)
+
+    for channel, messages in by_channel.items():
+        limiter = limiters.get(channel) or RateLimiter(0)
+        step = limiter.burst or len(messages)
+        for start in range(0, len(messages), step):
+            chunk = messages[start:start + step]
+            limiter.wait(len(chunk))
+            try:
+                if channel not in backends:
+                    backends[channel] = get_backend(channel)
+                failures = backends[channel].send_messages(chunk)
+            except Exception as e:
+                logger.error(f'Error sending {channel} notifications: {str(e)}')
+                failures = {n.pk: str(e) or e.__class__.__name__ for n in chunk}
+            if failures:
+                logger.warning(f'{len(failures)} {channel} notifications could not be sent')
+            # Record each chunk as soon as it is sent, so a dispatcher that dies only resends its last chunk
+            _record_results(chunk, failures, now, stats)
+
+
+def _record_results(notifications, failures, now, stats):
+    """Mark sent notifications sent and reschedule or fail the others, each in its own autocommitted UPDATE"""
+    sent_at = timezone.now()
+    sent_ids = [n.pk for n in notifications if n.pk not in failures]
+    Notification.objects.filter(pk__in=sent_ids).update(
+        status='sent', sent_at=sent_at, attempts=F('attempts') + 1, last_error='', updated_at=sent_at,
+    )
+    stats['sent'] += len(sent_ids)
+
+    for notification in notifications:
+        if notification.pk not in failures:
+            continue
+        attempts = notification.attempts + 1
+        update = {'attempts': attempts, 'last_error': failures[notification.pk], 'updated_at': sent_at}
+        if attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+            update['status'] = 'failed'
+            stats['failed'] += 1
+        else:
+            update['status'] = 'pending'
+            update['send_after'] = now + RETRY_BASE_DELAY * 2 ** (attempts - 1)
+            stats['retrying'] += 1
+        Notification.objects.filter(pk=notification.pk).update(**update)
@@ -0,0 +1,188 @@
+"""
+Doctor-patient relationships and the patient picker search.
+
+``DoctorPatient`` holds one row per doctor and patient with appointments
+together: the first and last appointment dates and the number of visits
+that weren't cancelled. The appointment signals refresh the row of each
+pair an appointment belongs to (or used to belong to). Bulk operations
+call refresh_doctor_patients() themselves, as they send no signals.
+"""
+
+import logging
+from functools import reduce
+from operator import or_
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Min, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import Appointment, DoctorPatient, Patient
+
+logger = logging.getLogger(__name__)
+
+PICKER_PAGE_SIZE = 20
+MY_PATIENTS_PAGE_SIZE = 25
+
+# ?sort= keys of the my patients list, and the columns they order by
+PATIENT_LIST_SORTS = {
+    'name': ('user__last_name', 'user__first_name'),
+    'age': ('-date_of_birth',),
+    'last_visit': ('last_visit',),
+    'next_visit': ('next_visit',),
+    'visits': ('visit_count',),
+}
+
+
+def refresh_doctor_patients(pairs):
+    """Recompute the relationship rows of (doctor_id, patient_id) pairs from their appointments"""
+    pairs = {(doctor_id, patient_id) for doctor_id, patient_id in pairs if doctor_id and patient_id}
+    if not pairs:
+        return
+
+    pair_filter = reduce(or_, (Q(doctor_id=doctor_id, patient_id=patient_id) for doctor_id, patient_id in pairs))
+    stats = (
+        Appointment.objects
+        .filter(pair_filter)
+        .order_by()
+        .values('doctor_id', 'patient_id')
+        .annotate(
+            first_visit=Min('appointment_date'),
+            last_visit=Max('appointment_date'),
+            visit_count=Count('id', filter=~Q(status='cancelled')),
+        )
+    )
+    links = [DoctorPatient(**row) for row in stats]
+    gone = pairs - {(link.doctor_id, link.patient_id) for link in links}
+
+    # No savepoint: callers that book in bulk are usually inside a transaction already
+    with transaction.atomic(savepoint=False):
+        if gone:
+            DoctorPatient.objects.filter(
+                reduce(or_, (Q(doctor_id=doctor_id, patient_id=patient_id) for doctor_id, patient_id in gone))
+            ).delete()
+        DoctorPatient.objects.bulk_create(
+            links,
+            update_conflicts=True,
+            unique_fields=['doctor', 'patient'],
+            update_fields=['first_visit', 'last_visit', 'visit_count', 'updated_at'],
+        )
+
+
+def rebuild_doctor_patients():
+    """
+    Recompute every relationship row from the appointments, e.g. after loading appointments in bulk.
+
+    The rows are aggregated and inserted by the database in one
+    INSERT ... SELECT, so no appointment or relationship passes through Python.
+
+    Returns:
+        int: Number of relationships
+    """
+    stats = (
+        Appointment.objects
+        .order_by()
+        .values('doctor_id', 'patient_id')
+        .annotate(
+            first_visit=Min('appointment_date'),
+            last_visit=Max('appointment_date'),
+            visit_count=Count('id', filter=~Q(status='cancelled')),
+        )
+    )
+    select_sql, params = stats.query.sql_with_params()
+    meta = DoctorPatient._meta
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(meta.get_field(name).column) for name in (
+        'doctor', 'patient', 'first_visit', 'last_visit', 'visit_count', 'updated_at',
+    ))
+    updated_at = meta.get_field('updated_at').get_db_prep_save(timezone.now(), connection)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        DoctorPatient.objects.all().delete()
+        cursor.execute(
+            f'INSERT INTO {quote(meta.db_table)} ({columns}) '
+            f'SELECT doctor_id, patient_id, first_visit, last_visit, visit_count, %s FROM ({select_sql}) stats',
+            (updated_at, *params),
+        )
+        return cursor.rowcount
+
+
+def search_doctor_patients(doctor, query='', page=1, page_size=PICKER_PAGE_SIZE):
+    """
+    Find a doctor's patients by name or phone number, most recently seen first.
+
+    Every word of the query has to match the start of the first name, last
+    name or phone number. Pages are fetched with LIMIT/OFFSET plus one extra
+    row, so no COUNT is needed.
+
+    Returns:
+        tuple: (list of DoctorPatient with patient and user loaded, whether there is a next page)
+    """
+    links = DoctorPatient.objects.filter(doctor=doctor)
+    for term in query.split():
+        links = links.filter(
+            Q(patient__user__first_name__istartswith=term)
+            | Q(patient__user__last_name__istartswith=term)
+            | Q(patient__phone__startswith=term)
+        )
+    start = (max(page, 1) - 1) * page_size
+    results = list(
+        links
+        .select_related('patient__user')
+        .defer('patient__medical_history')
+        .order_by('-last_visit', 'pk')[start:start + page_size + 1]
+    )
+    return results[:page_size], len(results) > page_size
+
+
+def doctor_patient_list(doctor, sort='-last_visit', condition=''):
+    """
+    A doctor's patients with their visit data, for the my patients page.
+
+    Each patient is annotated with their last past visit and next upcoming
+    visit with this doctor (cancelled appointments don't count) and their
+    number of visits. The visit dates are correlated subqueries over the
+    ``appointment_patient_date_idx`` index and the count comes from the
+    DoctorPatient row, so a page is one query however many patients there are.
+
+    Args:
+        sort: A key of PATIENT_LIST_SORTS, prefixed with '-' for descending order;
+            unknown keys fall back to the most recently seen first
+
+    Returns:
+        QuerySet: Patients with last_visit, next_visit and visit_count
+    """
+    today = timezone.localdate()
+    visits = (
+        Appointment.objects
+        .filter(doctor=doctor, patient=OuterRef('pk'))
+        .exclude(status='cancelled')
+    )
+    patients = (
+        Patient.objects
+        .filter(doctor_links__doctor=doctor)
+        .select_related('user')
+        .annotate(
+            last_visit=Subquery(
+                visits.filter(appointment_date__lte=today).order_by('-appointment_date').values('appointment_date')[:1]
+            ),
+            next_visit=Subquery(
+                visits.filter(appointment_date__gt=today).order_by('appointment_date').values('appointment_date')[:1]
+            ),
+            # Reuses the join of the doctor_links filter above
+            visit_count=F('doctor_links__visit_count'),
+        )
+    )
+    if condition:
+        patients = patients.with_condition(condition)
+
+    descending = sort.startswith('-')
+    fields = PATIENT_LIST_SORTS.get(sort.lstrip('-'))
+    if fields is None:
+        descending, fields = True, PATIENT_LIST_SORTS['last_visit']
+    ordering = []
+    for field in fields:
+        # A leading '-' on the field flips its direction: ascending age is descending date of birth
+        reverse = descending != field.startswith('-')
+        column = F(field.lstrip('-'))
+        ordering.append(column.desc(nulls_last=True) if reverse else column.asc(nulls_last=True))
+    return patients.order_by(*ordering, 'pk')
@@ -0,0 +1,375 @@
+"""
+Recurring appointments, time off approval and set-based slot conflict checks.
+
+A series is expanded into its occurrence dates in memory. All of them are then
+checked together against existing appointments, the doctor's weekly schedule
+and approved time off, using one query per table regardless of how many
+occurrences there are. The free occurrences are inserted with a single
+bulk_create, which is checked and tried again if a concurrent booking takes
+one of them first.
+
+Approving time off works the same way in bulk. The affected appointments come
+from one range query and are checked against the availability of every
+candidate doctor at once. They are then moved or cancelled with bulk updates.
+"""
+
+import calendar
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .capacity import DEFAULT_LIMITS, invalidate_booked_counts
+from .models import Appointment, Doctor, DoctorSchedule, DoctorSettings, TimeOffRequest
+from .patients import refresh_doctor_patients
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the occurrences of one series, whatever its COUNT/UNTIL
+MAX_SERIES_OCCURRENCES = 104
+# Times a series is checked and inserted again when concurrent bookings take its slots
+SERIES_BOOKING_ATTEMPTS = 3
+
+# DoctorSchedule.day_of_week values in date.weekday() order
+WEEKDAYS = [day for day, _ in DoctorSchedule.DAYS_OF_WEEK]
+
+
+def _add_months(start, months):
+    """Get the same day of the month ``months`` later, or None when that month is too short (as RRULE does)"""
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    if start.day > calendar.monthrange(year, month)[1]:
+        return None
+    return start.replace(year=year, month=month)
+
+
+def expand_series(series):
+    """
+    Get the occurrence dates of a series.
+
+    Returns:
+        list: Dates in order, at most ``MAX_SERIES_OCCURRENCES`` of them
+    """
+    limit = min(series.count or MAX_SERIES_OCCURRENCES, MAX_SERIES_OCCURRENCES)
+    dates = []
+    step = 0
+    while len(dates) < limit:
+        if series.frequency == 'weekly':
+            occurrence = series.start_date + timedelta(weeks=step * series.interval)
+        else:
+            occurrence = _add_months(series.start_date, step * series.interval)
+        step += 1
+        if occurrence is None:
+            # e.g. the 31st in a 30-day month
+            continue
+        if series.until and occurrence > series.until:
+            break
+        dates.append(occurrence)
+    return dates
+
+
+class DoctorAvailability:
+    """
+    Booked slots, working hours, daily limits and approved leave of a set of
+    doctors, loaded for a span of dates with one query per table.
+
+    A doctor without any schedule rows is treated as always available.
+    """
+
+    def __init__(self, doctor_ids, first, last, dates=None, patient=None):
+        doctor_ids = list(doctor_ids)
+        date_filter = {'appointment_date__in': dates} if dates is not None else {'appointment_date__range': (first, last)}
+
+        self.time_off = {}
+        for doctor_id, start, end in (
+            TimeOffRequest.objects
+            .filter(doctor_id__in=doctor_ids, status='approved', start_date__lte=last, end_date__gte=first)
+            .values_list('doctor_id', 'start_date', 'end_date')
+        ):
+            self.time_off.setdefault(doctor_id, []).append((start, end))
+
+        # Working hours per doctor and weekday; a day may have several shifts
+        self.has_schedule = set()
+        self.shifts = {}
+        for doctor_id, day, start, end, is_available in (
+            DoctorSchedule.objects
+            .filter(doctor_id__in=doctor_ids)
+            .values_list('doctor_id', 'day_of_week', 'start_time', 'end_time', 'is_available')
+        ):
+            self.has_schedule.add(doctor_id)
+            if is_available:
+                self.shifts.setdefault((doctor_id, day), []).append((start, end))
+
+        # Daily limit and practice hours (see capacity.py)
+        self.limits = dict.fromkeys(doctor_ids, DEFAULT_LIMITS)
+        for doctor_id, *limits in (
+            DoctorSettings.objects
+            .filter(doctor_id__in=doctor_ids)
+            .values_list('doctor_id', 'max_patients_per_day', 'working_hours_start', 'working_hours_end')
+        ):
+            self.limits[doctor_id] = tuple(limits)
+
+        # Slots of the doctors, and of the patient with any doctor
+        participants = Q(doctor_id__in=doctor_ids)
+        if patient is not None:
+            participants |= Q(patient=patient)
+        self.booked = set()
+        self.patient_booked = set()
+        self.load = dict.fromkeys(doctor_ids, 0)
+        self.daily = Counter()
+        for doctor_id, patient_id, date, time, status in (
+            Appointment.objects
+            .filter(participants, **date_filter)
+            .values_list('doctor_id', 'patient_id', 'appointment_date', 'appointment_time', 'status')
+        ):
+            if doctor_id in self.load:
+                # A cancelled appointment still holds its slot under the unique constraint
+                self.booked.add((doctor_id, date, time))
+                if status != 'cancelled':
+                    self.load[doctor_id] += 1
+                    self.daily[(doctor_id, date)] += 1
+            if patient is not None and patient_id == patient.pk and status != 'cancelled':
+                self.patient_booked.add((date, time))
+
+    def conflict(self, doctor_id, date, time):
+        """
+        Check whether a doctor can take an appointment slot.
+
+        Returns:
+            str: Why the slot can't be booked, or None when it is free
+        """
+        if any(start <= date <= end for start, end in self.time_off.get(doctor_id, ())):
+            return 'The doctor is on leave.'
+        if doctor_id in self.has_schedule and not any(
+            start <= time < end for start, end in self.shifts.get((doctor_id, WEEKDAYS[date.weekday()]), ())
+        ):
+            return 'Outside the doctor\'s working hours.'
+        max_per_day, hours_start, hours_end = self.limits.get(doctor_id, DEFAULT_LIMITS)
+        if hours_start and hours_end and not hours_start <= time < hours_end:
+            return 'Outside the doctor\'s working hours.'
+        if (doctor_id, date, time) in self.booked:
+            return 'The doctor already has an appointment at this time.'
+        if self.daily[(doctor_id, date)] >= max_per_day:
+            return 'The doctor is fully booked on this day.'
+        if (date, time) in self.patient_booked:
+            return 'The patient already has an appointment at this time.'
+        return None
+
+    def book(self, doctor_id, date, time):
+        """Mark a slot as taken so later checks in the same pass see it"""
+        self.booked.add((doctor_id, date, time))
+        self.load[doctor_id] = self.load.get(doctor_id, 0) + 1
+        self.daily[(doctor_id, date)] += 1
+
+
+def find_slot_conflicts(doctor, slots, patient=None):
+    """
+    Check appointment slots against existing appointments, the doctor's
+    schedule and approved time off.
+
+    ``slots`` is an iterable of (date, time) pairs, all checked with one query
+    per table.
+
+    Returns:
+        dict: Reason each conflicting (date, time) slot can't be booked
+    """
+    slots = sorted(set(slots))
+    if not slots:
+        return {}
+    availability = DoctorAvailability(
+        [doctor.pk], slots[0][0], slots[-1][0], dates={date for date, _ in slots}, patient=patient,
+    )
+    conflicts = {}
+    for date, time in slots:
+        reason = availability.conflict(doctor.pk, date, time)
+        if reason:
+            conflicts[(date, time)] = reason
+    return conflicts
+
+
+def book_series(series):
+    """
+    Save a series and book its free occurrences.
+
+    Occurrences that conflict are skipped. If none are free, nothing is saved.
+    When a concurrent booking takes one of the free slots between the check
+    and the insert, the insert fails on the unique constraint and the check
+    is run again.
+
+    Returns:
+        tuple: (list of created Appointments, dict of conflict reasons by date)
+    """
+    from .caching import bump_data_version
+    from .events import publish_appointment_event
+
+    dates = expand_series(series)
+    for attempt in range(1, SERIES_BOOKING_ATTEMPTS + 1):
+        conflicts = find_slot_conflicts(
+            series.doctor, [(date, series.appointment_time) for date in dates], patient=series.patient,
+        )
+        conflicts = {date: reason for (date, _), reason in conflicts.items()}
+        free = [date for date in dates if date not in conflicts]
+        if not free:
+            return [], conflicts
+
+        try:
+            with transaction.atomic():
+                series.save()
+                appointments = Appointment.objects.bulk_create([
+                    Appointment(
+                        patient=series.patient,
+                        doctor=series.doctor,
+                        appointment_date=date,
+                        appointment_time=series.appointment_time,
+                        reason=series.reason,
+                        status='pending',
+                        series=series,
+                    )
+                    for date in free
+                ])
+                # bulk_create doesn't send post_save, so announce them here once they are committed
+                transaction.on_commit(lambda: [
+                    publish_appointment_event(appointment, 'appointment.created') for appointment in appointments
+                ])
+            break
+        except IntegrityError:
+            if attempt == SERIES_BOOKING_ATTEMPTS:
+                raise
+            logger.info(f'Slots of a series were booked concurrently, checking again (attempt {attempt})')
+            # The series row was rolled back with the appointments
+            series.pk = None
+            series._state.adding = True
+
+    # bulk_create doesn't send post_save, so invalidate the cached dashboards and counts here
+    bump_data_version(series.patient.user_id, series.doctor.user_id)
+    invalidate_booked_counts((series.doctor_id, date) for date in free)
+    refresh_doctor_patients([(series.doctor_id, series.patient_id)])
+    logger.info(f'Booked {len(appointments)} appointments for series {series.pk} ({len(conflicts)} conflicts)')
+    return appointments, conflicts
+
+
+def approve_time_off(time_off, reviewed_by=None, resolution='reassign', admin_notes=''):
+    """
+    Approve a time off request and clear the doctor's appointments during it.
+
+    With ``resolution='reassign'``, each appointment moves to the least booked
+    doctor of the same specialization who is free at that slot. Appointments
+    that no doctor can take are cancelled. With ``resolution='cancel'``, they
+    are all cancelled. Patients are notified through the notification outbox.
+
+    Returns:
+        tuple: (list of reassigned Appointments, list of cancelled Appointments),
+        or None when the request is no longer pending
+    """
+    from .caching import bump_data_version
+    from .notifications import queue_appointment_changes
+
+    doctor = time_off.doctor
+    now = timezone.now()
+    reassigned, cancelled = [], []
+    with transaction.atomic():
+        # The conditional UPDATE locks the request, so an admin approving it at
+        # the same time waits here and then finds it already reviewed
+        claimed = TimeOffRequest.objects.filter(pk=time_off.pk, status='pending').update(
+            status='approved', admin_notes=admin_notes, reviewed_by=reviewed_by, reviewed_at=now, updated_at=now,
+        )
+        if not claimed:
+            return None
+        time_off.status = 'approved'
+        time_off.admin_notes = admin_notes
+        time_off.reviewed_by = reviewed_by
+        time_off.reviewed_at = now
+
+        affected = list(
+            Appointment.objects
+            .select_for_update()
+            .filter(doctor=doctor, appointment_date__range=(time_off.start_date, time_off.end_date))
+            .exclude(status__in=['cancelled', 'completed'])
+            .order_by('appointment_date', 'appointment_time')
+        )
+
+        candidates = []
+        if affected and resolution == 'reassign' and doctor.specialization:
+            candidates = list(
+                Doctor.objects
+                .filter(specialization__iexact=doctor.specialization)
+                .exclude(pk=doctor.pk)
+                .values_list('pk', flat=True)
+            )
+        availability = DoctorAvailability(candidates, time_off.start_date, time_off.end_date) if candidates else None
+
+        for appointment in affected:
+            date, time = appointment.appointment_date, appointment.appointment_time
+            replacement = None
+            if availability:
+                replacement = next(
+                    (pk for pk in sorted(candidates, key=availability.load.get) if availability.conflict(pk, date, time) is None),
+                    None,
+                )
+            if replacement:
+                availability.book(replacement, date, time)
+                appointment.doctor_id = replacement
+                appointment.updated_at = now
+                reassigned.append(appointment)
+            else:
+                appointment.status = 'cancelled'
+                cancelled.append(appointment)
+
+        Appointment.objects.bulk_update(reassigned, ['doctor', 'updated_at'], batch_size=500)
+        Appointment.objects.filter(pk__in=[a.pk for a in cancelled]).update(status='cancelled', updated_at=now)
+
+        # Queued in the same transaction, so patients are told exactly when the change commits
+        reference = f'time_off_{time_off.pk}'
+        queue_appointment_changes([a.pk for a in reassigned], 'appointment_reassigned', reference)
+        queue_appointment_changes([a.pk for a in cancelled], 'appointment_cancelled', reference)
+        refresh_doctor_patients(
+            [(doctor.pk, a.patient_id) for a in affected] + [(a.doctor_id, a.patient_id) for a in reassigned]
+        )
+
+    # Bulk updates don't send post_save, and several doctors' dashboards changed
+    bump_data_version()
+    invalidate_booked_counts(
+        [(doctor.pk, a.appointment_date) for a in affected] + [(a.doctor_id, a.appointment_date) for a in reassigned]
+    )
+    logger.info(
+        f'Approved time off {time_off.pk} for doctor {doctor.pk}: '
+        f'{len(reassigned)} appointments reassigned, {len(cancelled)} cancelled'
+    )
+    return reassigned, cancelled
+
+
+def save_weekly_schedule(doctor, shifts):
+    """
+    Replace a doctor's weekly schedule in one transaction.
+
+    ``shifts`` are (day_of_week, start_time, end_time, is_available) tuples.
+    Shifts no longer in the week are deleted with one query. The rest are
+    written with one upsert keyed on (doctor, day_of_week, start_time), so
+    unchanged and edited shifts keep their rows.
+
+    Returns:
+        list: The saved DoctorSchedule rows
+    """
+    rows = [
+        DoctorSchedule(doctor=doctor, day_of_week=day, start_time=start, end_time=end, is_available=is_available)
+        for day, start, end, is_available in shifts
+    ]
+    keep = Q()
+    for row in rows:
+        keep |= Q(day_of_week=row.day_of_week, start_time=row.start_time)
+
+    with transaction.atomic():
+        stale = DoctorSchedule.objects.filter(doctor=doctor)
+        if rows:
+            stale = stale.exclude(keep)
+        stale.delete()
+        DoctorSchedule.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['doctor', 'day_of_week', 'start_time'],
+            update_fields=['end_time', 'is_available', 'updated_at'],
+        )
+    return rows
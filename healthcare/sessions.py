@@ -0,0 +1,85 @@
+"""
+Session storage housekeeping.
+
+The session backend is chosen with ``SESSION_BACKEND`` (see settings.py).
+The db and cached_db backends keep a row per session in the database, and
+Django never deletes expired ones by itself. purge_expired_sessions() does,
+a batch at a time. Each batch is its own short transaction, so logins
+writing new sessions never wait long on the purge. The cache and
+signed_cookies backends expire sessions on their own and have nothing to
+purge.
+
+The cached_db and cache backends must share their cache between workers,
+or a session deleted on logout stays valid in every other worker's copy;
+check_session_cache() reports them on the per-process local-memory cache.
+"""
+
+import logging
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DatabaseSessionStore
+from django.core import checks
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def session_store():
+    """The SessionStore class of the configured session backend"""
+    return import_module(settings.SESSION_ENGINE).SessionStore
+
+
+CACHED_ENGINES = {'django.contrib.sessions.backends.cached_db', 'django.contrib.sessions.backends.cache'}
+
+
+def check_session_cache(app_configs=None, **kwargs):
+    """System check: cache-backed sessions need a cache shared by all workers"""
+    if settings.SESSION_ENGINE not in CACHED_ENGINES:
+        return []
+    backend = settings.CACHES[getattr(settings, 'SESSION_CACHE_ALIAS', 'default')]['BACKEND']
+    if backend != 'django.core.cache.backends.locmem.LocMemCache':
+        return []
+    return [checks.Error(
+        f'{settings.SESSION_ENGINE} sessions are stored in the per-process local-memory cache, '
+        f'so a logged-out session stays valid in other workers.',
+        hint='Set CACHE_BACKEND to a shared cache (e.g. Redis or Memcached), or SESSION_BACKEND=db.',
+        id='healthcare.E001',
+    )]
+
+
+def purge_expired_sessions(batch_size=None, pause=0.0):
+    """
+    Delete the sessions that expired before now from the database.
+
+    Args:
+        batch_size: Rows deleted per transaction (default SESSION_PURGE_BATCH_SIZE)
+        pause: Seconds to sleep between batches, to leave the database room for other work
+
+    Returns:
+        int: Number of sessions deleted, or None if the backend keeps no sessions in the database
+    """
+    store = session_store()
+    if not issubclass(store, DatabaseSessionStore):
+        return None
+    batch_size = batch_size or getattr(settings, 'SESSION_PURGE_BATCH_SIZE', 5000)
+    model = store.get_model_class()
+    now = timezone.now()
+
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            # Session keys of one batch, found through the expire_date index
+            keys = list(model.objects.filter(expire_date__lt=now).values_list('pk', flat=True)[:batch_size])
+            if not keys:
+                break
+            count, _ = model.objects.filter(pk__in=keys).delete()
+        deleted += count
+        if len(keys) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    logger.info(f'Purged {deleted} expired sessions')
+    return deleted
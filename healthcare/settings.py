@@ -53,16 +53,26 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'healthcare.middleware.StaticCacheControlMiddleware',
+    'healthcare.metrics.RequestMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'mywebsite.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django templates, with render times recorded for the request metrics
+        'BACKEND': 'healthcare.metrics.InstrumentedDjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept in memory; in DEBUG the autoreloader
+            # clears them whenever a template file changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -88,6 +98,36 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The local-memory cache is per process; point CACHE_BACKEND at a shared
+# backend (e.g. Redis or Memcached) when running more than one worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'healthcare'),
+    }
+}
+
+# Session storage: db, cached_db, cache or signed_cookies (a backend of django.contrib.sessions).
+# cached_db reads sessions from the cache and only falls back to the database on a miss, so
+# authenticated requests skip the session SELECT. It needs a cache all workers share: logging
+# out only removes the session from the logging-out worker's local-memory cache, so it is the
+# default only when CACHE_BACKEND is set to a shared backend (the healthcare.E001 check refuses
+# cache-backed sessions on the local-memory cache).
+# signed_cookies stores nothing on the server, but sessions can't be revoked before they expire.
+# Expired database sessions are deleted by `manage.py purge_sessions`.
+SHARED_CACHE = CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.getenv('SESSION_BACKEND', 'cached_db' if SHARED_CACHE else 'db')
+SESSION_COOKIE_AGE = int(os.getenv('SESSION_COOKIE_AGE', str(60 * 60 * 24 * 14)))
+SESSION_PURGE_BATCH_SIZE = 5000
+
+# Seconds a rendered dashboard stays cached (0 disables dashboard caching).
+# Cached dashboards are also invalidated as soon as their data changes.
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', '300'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -123,11 +163,89 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+if not DEBUG:
+    # Fingerprinted file names (collectstatic) so assets can be cached for a year
+    STORAGES['staticfiles']['BACKEND'] = 'healthcare.storage.HashedStaticFilesStorage'
+
+# Cache lifetime for fingerprinted static files (see StaticCacheControlMiddleware)
+STATIC_CACHE_MAX_AGE = 60 * 60 * 24 * 365
 
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Threads used to generate profile picture thumbnails in the background
+IMAGE_WORKER_THREADS = int(os.getenv('IMAGE_WORKER_THREADS', '2'))
+
+# Profile pictures wait here (outside MEDIA_ROOT) until they have been validated
+UPLOAD_STAGING_DIR = os.getenv('UPLOAD_STAGING_DIR', '')
+PROFILE_PICTURE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10 MB
+
+# Notifications (see healthcare/notifications.py)
+# Sending backend per channel: ConsoleBackend, FileBackend or EmailBackend (Django's email settings).
+# There is no SMS provider by default: until SMS_NOTIFICATION_BACKEND is set (ConsoleBackend in
+# development), text messages stay queued and the healthcare.W001 check warns about it.
+NOTIFICATION_BACKENDS = {
+    'email': os.getenv('EMAIL_NOTIFICATION_BACKEND', 'healthcare.notifications.EmailBackend'),
+    'sms': os.getenv('SMS_NOTIFICATION_BACKEND', ''),
+}
+# JSON-lines file written by FileBackend
+NOTIFICATION_FILE_PATH = os.getenv('NOTIFICATION_FILE_PATH', str(BASE_DIR / 'notifications.log'))
+# Messages per second each channel's provider accepts (0 for no limit)
+NOTIFICATION_RATE_LIMITS = {
+    'email': float(os.getenv('EMAIL_NOTIFICATIONS_PER_SECOND', '50')),
+    'sms': float(os.getenv('SMS_NOTIFICATIONS_PER_SECOND', '10')),
+}
+NOTIFICATION_BATCH_SIZE = 1000
+NOTIFICATION_MAX_ATTEMPTS = 5
+# Messages claimed by a dispatcher that hasn't finished them after this long are sent again
+NOTIFICATION_CLAIM_TIMEOUT_MINUTES = 30
+# Appointments starting within this many hours get a reminder
+APPOINTMENT_REMINDER_WINDOW_HOURS = int(os.getenv('APPOINTMENT_REMINDER_WINDOW_HOURS', '24'))
+
+# How long a slot freed by a cancellation is held for the waitlisted patient it was offered to
+WAITLIST_OFFER_TTL_MINUTES = int(os.getenv('WAITLIST_OFFER_TTL_MINUTES', '30'))
+
+# Request metrics (see healthcare/metrics.py)
+# Latest samples kept per view for the percentiles
+REQUEST_METRICS_SAMPLES = int(os.getenv('REQUEST_METRICS_SAMPLES', '1000'))
+# Bearer token Prometheus scrapes /healthcare/metrics/ with (without one, only staff users can read it)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Queries slower than this are counted in the health history
+SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', '100'))
+# Seconds between health samples; the system report charts the last 24 hours of them
+HEALTH_SAMPLE_SECONDS = int(os.getenv('HEALTH_SAMPLE_SECONDS', '300'))
+# Most queries a view may run before a warning is logged, by URL name, and by method where
+# its GET and POST cost differ
+DEFAULT_QUERY_BUDGET = 50
+QUERY_BUDGETS = {
+    'healthcare:my_patients': 6,
+    'healthcare:patient_timeline_api': 8,
+    'healthcare:doctor_patients_api': 5,
+    'healthcare:medication_autocomplete_api': 4,
+    'healthcare:doctor_search_api': 2,
+    # A GET runs one more query when the doctor directory is rebuilt; a POST checks the slot and books it
+    'healthcare:book_appointment': {'GET': 4, 'POST': 11},
+}
+
+# Demo accounts (see healthcare/demo.py); create them with `manage.py setup_demo`
+DEMO_ACCOUNTS = os.getenv('DEMO_ACCOUNTS', '1') == '1'
+# Also create them after every migrate
+DEMO_SETUP_ON_MIGRATE = os.getenv('DEMO_SETUP_ON_MIGRATE', '0') == '1'
+# Demo sessions expire after this many seconds
+DEMO_SESSION_SECONDS = int(os.getenv('DEMO_SESSION_SECONDS', '3600'))
+
 # Login settings
 LOGIN_URL = '/healthcare/login/'
 LOGIN_REDIRECT_URL = '/healthcare/dashboard/'
@@ -0,0 +1,170 @@
+"""
+Signal handlers for the healthcare app.
+"""
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .caching import bump_data_version
+from .capacity import invalidate_booked_counts, invalidate_limits
+from .directory import invalidate_doctor_directory
+from .events import publish_appointment_event
+from .images import schedule_thumbnails
+from .medications import invalidate_medication_index
+from .models import (
+    Address, Admin, Appointment, Doctor, DoctorSettings, MedicalHistoryEntry, Medication, MedicationInteraction, Patient,
+    Prescription, user_display_name,
+)
+from .patients import refresh_doctor_patients
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_save, sender=Prescription)
+@receiver(post_delete, sender=Prescription)
+def invalidate_participant_dashboards(sender, instance, **kwargs):
+    """Invalidate the cached dashboards of the patient and doctor involved"""
+    try:
+        bump_data_version(instance.patient.user_id, instance.doctor.user_id)
+    except ObjectDoesNotExist:
+        # Removed as part of deleting the patient or doctor
+        bump_data_version()
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+@receiver(post_save, sender=Admin)
+@receiver(post_delete, sender=Admin)
+@receiver(post_save, sender=Address)
+def invalidate_all_dashboards(sender, instance, **kwargs):
+    """Profile data is shown on other users' dashboards, so invalidate them all"""
+    bump_data_version()
+
+
+@receiver(post_save, sender=User)
+def invalidate_dashboards_on_user_change(sender, instance, update_fields=None, **kwargs):
+    """Invalidate all dashboards when a user's details change"""
+    # Logging in only updates last_login, which no dashboard displays
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    bump_data_version()
+
+
+@receiver(post_save, sender=User)
+def sync_display_names(sender, instance, created, update_fields=None, **kwargs):
+    """Copy a changed user name onto their patient or doctor profile"""
+    if created or update_fields is not None and not {'first_name', 'last_name'} & set(update_fields):
+        return
+    name = user_display_name(instance)
+    for model in (Patient, Doctor):
+        model.objects.filter(user=instance).exclude(display_name=name).update(display_name=name)
+
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def rebuild_doctor_directory(sender, instance, **kwargs):
+    invalidate_doctor_directory()
+
+
+@receiver(post_save, sender=User)
+def rebuild_doctor_directory_on_user_change(sender, instance, update_fields=None, **kwargs):
+    """Rebuild the doctor directory when a user's name may have changed"""
+    # Users rarely change outside of logins, so don't look up whether this one is a doctor
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_doctor_directory()
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_save, sender=Doctor)
+@receiver(post_save, sender=Admin)
+def generate_profile_thumbnails(sender, instance, **kwargs):
+    """Generate avatar thumbnails for a newly uploaded profile picture"""
+    if instance.profile_picture:
+        schedule_thumbnails(instance.profile_picture.name)
+
+
+@receiver(post_save, sender=Patient)
+def record_reported_history(sender, instance, created, **kwargs):
+    """Start a new patient's recorded history with what they reported at signup"""
+    if created and instance.__dict__.get('medical_history'):
+        MedicalHistoryEntry.objects.create(
+            patient=instance,
+            entry_type='note',
+            title='Reported at signup',
+            details=instance.medical_history,
+            recorded_on=timezone.localdate(),
+        )
+
+
+@receiver(post_init, sender=Appointment)
+def remember_appointment_status(sender, instance, **kwargs):
+    """Keep the loaded status and day so saves can tell what changed"""
+    # Read from __dict__ so deferred loads don't trigger a query
+    instance._original_status = instance.__dict__.get('status')
+    instance._original_day = (instance.__dict__.get('doctor_id'), instance.__dict__.get('appointment_date'))
+    instance._original_pair = (instance.__dict__.get('doctor_id'), instance.__dict__.get('patient_id'))
+
+
+# Registered before publish_appointment_update, which moves _original_status on
+@receiver(post_save, sender=Appointment)
+def offer_cancelled_slot(sender, instance, created, **kwargs):
+    """Offer the slot of a cancelled appointment to the waitlist"""
+    if created or instance.status != 'cancelled' or instance._original_status == 'cancelled':
+        return
+    from .waitlist import offer_slot
+    transaction.on_commit(lambda: offer_slot(instance.pk))
+
+
+@receiver(post_save, sender=Appointment)
+def publish_appointment_update(sender, instance, created, **kwargs):
+    """Push new appointments and status changes to the open event streams of the patient and doctor"""
+    if created:
+        event_type = 'appointment.created'
+    elif instance.status != instance._original_status:
+        event_type = 'appointment.status_changed'
+    else:
+        return
+    instance._original_status = instance.status
+    # Only announce changes that were actually committed
+    transaction.on_commit(lambda: publish_appointment_event(instance, event_type))
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_capacity_counts(sender, instance, **kwargs):
+    """Drop the cached booked counts of the days the appointment was and is on"""
+    days = [instance._original_day, (instance.doctor_id, instance.appointment_date)]
+    invalidate_booked_counts(days)
+    # Again after commit, in case a count was cached from before this change committed
+    transaction.on_commit(lambda: invalidate_booked_counts(days))
+    instance._original_day = days[1]
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def refresh_doctor_patient_links(sender, instance, **kwargs):
+    """Keep the doctor-patient relationship of the appointment's old and new pair up to date"""
+    pair = (instance.doctor_id, instance.patient_id)
+    refresh_doctor_patients({instance._original_pair, pair})
+    instance._original_pair = pair
+
+
+@receiver(post_save, sender=DoctorSettings)
+@receiver(post_delete, sender=DoctorSettings)
+def invalidate_capacity_limits(sender, instance, **kwargs):
+    invalidate_limits(instance.doctor_id)
+
+
+@receiver(post_save, sender=Medication)
+@receiver(post_delete, sender=Medication)
+@receiver(post_save, sender=MedicationInteraction)
+@receiver(post_delete, sender=MedicationInteraction)
+def rebuild_medication_index(sender, instance, **kwargs):
+    invalidate_medication_index()
@@ -0,0 +1,296 @@
+// Initialize when DOM is loaded
+document.addEventListener('DOMContentLoaded', function() {
+    initializeUserReports();
+});
+
+function initializeUserReports() {
+    // Initialize tooltips
+    const tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
+    tooltipTriggerList.map(function (tooltipTriggerEl) {
+        return new bootstrap.Tooltip(tooltipTriggerEl);
+    });
+
+    // Add event listeners
+    setupSearch();
+    setupFilters();
+    setupSorting();
+    setupPagination();
+}
+
+// Search functionality
+function setupSearch() {
+    const searchInput = document.getElementById('userSearch');
+    searchInput.addEventListener('input', debounce(filterUsers, 300));
+}
+
+function setupFilters() {
+    const roleFilter = document.getElementById('roleFilter');
+    const statusFilter = document.getElementById('statusFilter');
+    const sortBy = document.getElementById('sortBy');
+
+    roleFilter.addEventListener('change', filterUsers);
+    statusFilter.addEventListener('change', filterUsers);
+    sortBy.addEventListener('change', sortUsers);
+}
+
+// Sorting functionality
+function setupSorting() {
+    const sortableHeaders = document.querySelectorAll('.sortable');
+    sortableHeaders.forEach(header => {
+        header.addEventListener('click', function() {
+            const column = this.getAttribute('data-column');
+            sortUsers(column);
+        });
+    });
+}
+
+// Pagination setup
+function setupPagination() {
+    const paginationLinks = document.querySelectorAll('.page-link');
+    paginationLinks.forEach(link => {
+        link.addEventListener('click', function(e) {
+            e.preventDefault();
+            const page = this.textContent;
+            if (page !== 'Previous' && page !== 'Next') {
+                goToPage(parseInt(page));
+            }
+        });
+    });
+}
+
+// Filter users based on search and filters
+function filterUsers() {
+    const searchTerm = document.getElementById('userSearch').value.toLowerCase();
+    const roleFilter = document.getElementById('roleFilter').value;
+    const statusFilter = document.getElementById('statusFilter').value;
+
+    const userRows = document.querySelectorAll('.user-row');
+
+    userRows.forEach(row => {
+        const username = row.cells[0].textContent.toLowerCase();
+        const name = row.cells[1].textContent.toLowerCase();
+        const email = row.cells[2].textContent.toLowerCase();
+        const role = row.getAttribute('data-role');
+        const status = row.getAttribute('data-status');
+
+        const matchesSearch = username.includes(searchTerm) ||
+                             name.includes(searchTerm) ||
+                             email.includes(searchTerm);
+
+        const matchesRole = !roleFilter || role === roleFilter;
+        const matchesStatus = !statusFilter || status === statusFilter;
+
+        if (matchesSearch && matchesRole && matchesStatus) {
+            row.style.display = '';
+        } else {
+            row.style.display = 'none';
+        }
+    });
+
+    updateEmptyState();
+}
+
+// Sort users
+function sortUsers(sortBy = null) {
+    if (!sortBy) {
+        sortBy = document.getElementById('sortBy').value;
+    }
+
+    const table = document.getElementById('usersTable');
+    const tbody = table.querySelector('tbody');
+    const rows = Array.from(tbody.querySelectorAll('tr'));
+
+    rows.sort((a, b) => {
+        let aValue, bValue;
+
+        switch(sortBy) {
+            case 'username':
+                aValue = a.cells[0].textContent.toLowerCase();
+                bValue = b.cells[0].textContent.toLowerCase();
+                break;
+            case 'first_name':
+                aValue = a.cells[1].textContent.toLowerCase();
+                bValue = b.cells[1].textContent.toLowerCase();
+                break;
+            case 'email':
+                aValue = a.cells[2].textContent.toLowerCase();
+                bValue = b.cells[2].textContent.toLowerCase();
+                break;
+            case 'date_joined':
+            default:
+                // For date sorting, we'd need to parse the date from the cell
+                aValue = new Date(a.cells[5].querySelector('span').textContent);
+                bValue = new Date(b.cells[5].querySelector('span').textContent);
+                break;
+        }
+
+        if (aValue < bValue) return -1;
+        if (aValue > bValue) return 1;
+        return 0;
+    });
+
+    // Re-append sorted rows
+    rows.forEach(row => tbody.appendChild(row));
+}
+
+// Clear all filters
+function clearFilters() {
+    document.getElementById('userSearch').value = '';
+    document.getElementById('roleFilter').value = '';
+    document.getElementById('statusFilter').value = '';
+    document.getElementById('sortBy').value = 'date_joined';
+
+    const userRows = document.querySelectorAll('.user-row');
+    userRows.forEach(row => row.style.display = '');
+
+    updateEmptyState();
+}
+
+// Apply filters
+function applyFilters() {
+    filterUsers();
+}
+
+// Go to specific page (placeholder for pagination)
+function goToPage(page) {
+    // Update active page
+    const pageItems = document.querySelectorAll('.page-item');
+    pageItems.forEach(item => item.classList.remove('active'));
+
+    const targetPage = document.querySelector(`.page-link[href="#"][onclick*="${page}"]`);
+    if (targetPage) {
+        targetPage.closest('.page-item').classList.add('active');
+    }
+
+    // Here you would typically make an AJAX call to load the page data
+    console.log(`Navigating to page ${page}`);
+}
+
+// Update empty state visibility
+function updateEmptyState() {
+    const visibleRows = document.querySelectorAll('.user-row:not([style*="display: none"])');
+    const emptyState = document.querySelector('.empty-state');
+
+    if (visibleRows.length === 0) {
+        if (!emptyState) {
+            const tbody = document.querySelector('#usersTable tbody');
+            const emptyRow = document.createElement('tr');
+            emptyRow.innerHTML = `
+                <td colspan="7" class="text-center py-4">
+                    <div class="empty-state">
+                        <i class="fas fa-users fa-3x text-muted mb-3"></i>
+                        <h5 class="text-muted">No users found</h5>
+                        <p class="text-muted">Try adjusting your search criteria</p>
+                    </div>
+                </td>
+            `;
+            tbody.appendChild(emptyRow);
+        }
+    } else {
+        if (emptyState) {
+            emptyState.closest('tr').remove();
+        }
+    }
+}
+
+// Export functions
+function exportToCSV() {
+    const table = document.getElementById('usersTable');
+    const rows = table.querySelectorAll('tr:not([style*="display: none"])');
+    let csvContent = "data:text/csv;charset=utf-8,";
+
+    // Add headers
+    const headers = [];
+    const headerCells = table.querySelectorAll('thead th:not(:last-child)');
+    headerCells.forEach(cell => {
+        headers.push(cell.textContent.trim().replace(/\s+/g, ' '));
+    });
+    csvContent += headers.join(',') + "\n";
+
+    // Add data rows
+    rows.forEach(row => {
+        if (row.querySelector('td')) {
+            const cells = row.querySelectorAll('td:not(:last-child)');
+            const rowData = [];
+            cells.forEach(cell => {
+                // Remove HTML tags and clean up text
+                const text = cell.textContent.trim().replace(/\s+/g, ' ');
+                rowData.push('"' + text + '"');
+            });
+            csvContent += rowData.join(',') + "\n";
+        }
+    });
+
+    const encodedUri = encodeURI(csvContent);
+    const link = document.createElement("a");
+    link.setAttribute("href", encodedUri);
+    link.setAttribute("download", "user_reports.csv");
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+}
+
+function exportToExcel() {
+    // Placeholder for Excel export - would require additional library
+    alert("Excel export functionality would be implemented with a library like SheetJS or similar");
+}
+
+// Utility functions
+function debounce(func, wait) {
+    let timeout;
+    return function executedFunction(...args) {
+        const later = () => {
+            clearTimeout(timeout);
+            func(...args);
+        };
+        clearTimeout(timeout);
+        timeout = setTimeout(later, wait);
+    };
+}
+
+// User action functions (placeholders)
+function viewUserDetails(userId) {
+    // Placeholder for viewing user details
+    console.log(`Viewing details for user ${userId}`);
+    // You would typically open a modal or navigate to a detail page
+}
+
+function editUser(userId) {
+    // Placeholder for editing user
+    console.log(`Editing user ${userId}`);
+    // You would typically open an edit modal or navigate to an edit page
+}
+
+// Loading state management
+function setLoadingState(isLoading) {
+    const table = document.getElementById('usersTable');
+    if (isLoading) {
+        table.classList.add('loading');
+    } else {
+        table.classList.remove('loading');
+    }
+}
+
+// Responsive adjustments
+function handleResize() {
+    const width = window.innerWidth;
+    const avatarCircles = document.querySelectorAll('.avatar-circle');
+
+    if (width < 576) {
+        avatarCircles.forEach(circle => {
+            circle.style.width = '30px';
+            circle.style.height = '30px';
+            circle.style.fontSize = '0.8rem';
+        });
+    } else {
+        avatarCircles.forEach(circle => {
+            circle.style.width = '35px';
+            circle.style.height = '35px';
+            circle.style.fontSize = '0.9rem';
+        });
+    }
+}
+
+// Initialize responsive handling
+window.addEventListener('resize', debounce(handleResize, 250));
+handleResize(); // Initial call
@@ -0,0 +1,160 @@
+// Chart initialization
+let userGrowthChart, appointmentChart, revenueChart, specialtyChart;
+
+// Sample data
+const userGrowthData = {
+    labels: ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
+    datasets: [{
+        label: 'New Users',
+        data: [65, 78, 90, 81, 95, 110],
+        borderColor: '#3b82f6',
+        backgroundColor: 'rgba(59, 130, 246, 0.1)',
+        tension: 0.4
+    }]
+};
+
+const appointmentData = {
+    labels: ['Cardiology', 'Neurology', 'Pediatrics', 'Orthopedics', 'Dermatology'],
+    datasets: [{
+        data: [30, 25, 20, 15, 10],
+        backgroundColor: [
+            '#3b82f6',
+            '#10b981',
+            '#f59e0b',
+            '#ef4444',
+            '#8b5cf6'
+        ]
+    }]
+};
+
+const revenueData = {
+    labels: ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
+    datasets: [{
+        label: 'Revenue ($)',
+        data: [12000, 15000, 18000, 16000, 20000, 22000],
+        borderColor: '#10b981',
+        backgroundColor: 'rgba(16, 185, 129, 0.1)',
+        tension: 0.4
+    }]
+};
+
+const specialtyData = {
+    labels: ['Cardiology', 'Neurology', 'Pediatrics', 'Orthopedics', 'Dermatology', 'Others'],
+    datasets: [{
+        label: 'Number of Doctors',
+        data: [25, 18, 15, 12, 10, 9],
+        backgroundColor: '#3b82f6'
+    }]
+};
+
+// Initialize charts
+function initCharts() {
+    // User Growth Chart
+    const userCtx = document.getElementById('userGrowthChart').getContext('2d');
+    userGrowthChart = new Chart(userCtx, {
+        type: 'line',
+        data: userGrowthData,
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            plugins: {
+                legend: {
+                    display: false
+                }
+            }
+        }
+    });
+
+    // Appointment Distribution Chart
+    const appointmentCtx = document.getElementById('appointmentChart').getContext('2d');
+    appointmentChart = new Chart(appointmentCtx, {
+        type: 'doughnut',
+        data: appointmentData,
+        options: {
+            responsive: true,
+            maintainAspectRatio: false
+        }
+    });
+
+    // Revenue Chart
+    const revenueCtx = document.getElementById('revenueChart').getContext('2d');
+    revenueChart = new Chart(revenueCtx, {
+        type: 'line',
+        data: revenueData,
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            plugins: {
+                legend: {
+                    display: false
+                }
+            }
+        }
+    });
+
+    // Specialty Chart
+    const specialtyCtx = document.getElementById('specialtyChart').getContext('2d');
+    specialtyChart = new Chart(specialtyCtx, {
+        type: 'bar',
+        data: specialtyData,
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            plugins: {
+                legend: {
+                    display: false
+                }
+            }
+        }
+    });
+}
+
+// Date range functions
+function setDateRange(period) {
+    const today = new Date();
+    const startDate = document.getElementById('startDate');
+    const endDate = document.getElementById('endDate');
+    
+    switch(period) {
+        case 'today':
+            startDate.value = today.toISOString().split('T')[0];
+            endDate.value = today.toISOString().split('T')[0];
+            break;
+        case 'week':
+            const weekAgo = new Date(today.getTime() - 7 * 24 * 60 * 60 * 1000);
+            startDate.value = weekAgo.toISOString().split('T')[0];
+            endDate.value = today.toISOString().split('T')[0];
+            break;
+        case 'month':
+            const monthAgo = new Date(today.getFullYear(), today.getMonth() - 1, today.getDate());
+            startDate.value = monthAgo.toISOString().split('T')[0];
+            endDate.value = today.toISOString().split('T')[0];
+            break;
+        case 'year':
+            const yearAgo = new Date(today.getFullYear() - 1, today.getMonth(), today.getDate());
+            startDate.value = yearAgo.toISOString().split('T')[0];
+            endDate.value = today.toISOString().split('T')[0];
+            break;
+    }
+}
+
+function updateAnalytics() {
+    // Simulate data update
+    alert('Analytics updated for selected date range');
+}
+
+function changeChartPeriod(period) {
+    // Update active button
+    document.querySelectorAll('.chart-controls .btn').forEach(btn => btn.classList.remove('active'));
+    event.target.classList.add('active');
+    
+    // Update chart data based on period
+    alert('Chart period changed to: ' + period);
+}
+
+function generateReport(type) {
+    alert('Generating ' + type + ' report...');
+}
+
+// Initialize on page load
+document.addEventListener('DOMContentLoaded', initCharts);
@@ -0,0 +1,49 @@
+// Live appointment updates over Server-Sent Events
+document.addEventListener('DOMContentLoaded', function() {
+    const notice = document.querySelector('[data-appointment-events]');
+    if (!notice || !window.EventSource) {
+        return;
+    }
+
+    const source = new EventSource(notice.dataset.appointmentEvents);
+
+    source.addEventListener('appointment.created', function(e) {
+        const appointment = JSON.parse(e.data);
+        showNotice(notice, 'New appointment booked for ' + appointment.formatted_date + ' at ' + appointment.formatted_time + '.');
+    });
+
+    source.addEventListener('appointment.status_changed', function(e) {
+        const appointment = JSON.parse(e.data);
+        const cell = document.querySelector('[data-appointment-id="' + appointment.id + '"] [data-appointment-status]');
+        if (cell) {
+            cell.innerHTML = '';
+            cell.appendChild(statusBadge(appointment.status, appointment.status_display));
+        } else {
+            showNotice(notice, 'Appointment on ' + appointment.formatted_date + ' is now ' + appointment.status_display.toLowerCase() + '.');
+        }
+    });
+
+    // Close the stream before navigating away so the server can release it
+    window.addEventListener('pagehide', function() {
+        source.close();
+    });
+});
+
+const STATUS_BADGE_CLASSES = {
+    confirmed: 'bg-success',
+    pending: 'bg-warning text-dark',
+    cancelled: 'bg-danger',
+    completed: 'bg-info'
+};
+
+function statusBadge(status, label) {
+    const badge = document.createElement('span');
+    badge.className = 'badge ' + (STATUS_BADGE_CLASSES[status] || 'bg-secondary');
+    badge.textContent = label;
+    return badge;
+}
+
+function showNotice(notice, text) {
+    notice.querySelector('[data-appointment-events-text]').textContent = text;
+    notice.classList.remove('d-none');
+}
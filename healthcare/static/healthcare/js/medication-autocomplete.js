@@ -0,0 +1,35 @@
+// Medication name suggestions from the reference data
+document.addEventListener('DOMContentLoaded', function() {
+    const options = document.getElementById('medication-options');
+    const input = options && document.querySelector('input[list="medication-options"]');
+    if (!input) {
+        return;
+    }
+
+    let timer = null;
+    let lastQuery = '';
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        timer = setTimeout(function() {
+            const query = input.value.trim();
+            if (!query || query === lastQuery) {
+                return;
+            }
+            lastQuery = query;
+            const url = new URL(options.dataset.autocompleteUrl, window.location.origin);
+            url.searchParams.set('q', query);
+            fetch(url, {credentials: 'same-origin'})
+                .then(function(response) { return response.json(); })
+                .then(function(data) {
+                    options.innerHTML = '';
+                    data.results.forEach(function(medication) {
+                        const option = document.createElement('option');
+                        option.value = medication.name;
+                        option.label = medication.drug_class;
+                        options.appendChild(option);
+                    });
+                });
+        }, 150);
+    });
+});
@@ -0,0 +1,96 @@
+// Patient picker: searches the doctor's patients on the server a page at a time
+document.addEventListener('DOMContentLoaded', function() {
+    const picker = document.querySelector('[data-patient-picker]');
+    if (!picker) {
+        return;
+    }
+
+    const hidden = picker.querySelector('input[type="hidden"]');
+    const search = picker.querySelector('[data-patient-search]');
+    const results = picker.querySelector('[data-patient-results]');
+    let timer = null;
+    let query = '';
+    let page = 1;
+
+    function fetchPage(append) {
+        const url = new URL(picker.dataset.patientPicker, window.location.origin);
+        url.searchParams.set('q', query);
+        url.searchParams.set('page', page);
+        fetch(url, {credentials: 'same-origin'})
+            .then(function(response) { return response.json(); })
+            .then(function(data) {
+                if (!append) {
+                    results.innerHTML = '';
+                }
+                const more = results.querySelector('[data-more]');
+                if (more) {
+                    more.remove();
+                }
+                data.results.forEach(function(patient) {
+                    results.appendChild(patientOption(patient));
+                });
+                if (data.has_next) {
+                    const button = document.createElement('button');
+                    button.type = 'button';
+                    button.className = 'list-group-item list-group-item-action text-center text-primary';
+                    button.dataset.more = '';
+                    button.textContent = 'More results';
+                    results.appendChild(button);
+                }
+                if (!results.children.length) {
+                    const empty = document.createElement('div');
+                    empty.className = 'list-group-item text-muted';
+                    empty.textContent = 'No matching patients.';
+                    results.appendChild(empty);
+                }
+                results.classList.remove('d-none');
+            });
+    }
+
+    function patientOption(patient) {
+        const option = document.createElement('button');
+        option.type = 'button';
+        option.className = 'list-group-item list-group-item-action';
+        option.dataset.patientId = patient.id;
+        option.dataset.patientName = patient.name;
+        const name = document.createElement('strong');
+        name.textContent = patient.name;
+        const meta = document.createElement('small');
+        meta.className = 'text-muted ms-2';
+        meta.textContent = [patient.phone, 'last visit ' + patient.last_visit].filter(Boolean).join(' · ');
+        option.appendChild(name);
+        option.appendChild(meta);
+        return option;
+    }
+
+    search.addEventListener('input', function() {
+        hidden.value = '';
+        clearTimeout(timer);
+        timer = setTimeout(function() {
+            query = search.value.trim();
+            page = 1;
+            fetchPage(false);
+        }, 200);
+    });
+
+    search.addEventListener('focus', function() {
+        if (!hidden.value && !results.children.length) {
+            fetchPage(false);
+        }
+    });
+
+    results.addEventListener('click', function(e) {
+        const item = e.target.closest('button');
+        if (!item) {
+            return;
+        }
+        if (item.dataset.more !== undefined) {
+            page += 1;
+            fetchPage(true);
+            return;
+        }
+        hidden.value = item.dataset.patientId;
+        search.value = item.dataset.patientName;
+        results.classList.add('d-none');
+    });
+});
@@ -0,0 +1,70 @@
+// Patient timeline, loaded a page at a time from the timeline API
+document.addEventListener('DOMContentLoaded', function() {
+    const card = document.querySelector('[data-patient-timeline]');
+    if (!card) {
+        return;
+    }
+
+    const list = card.querySelector('[data-timeline-events]');
+    const empty = card.querySelector('[data-timeline-empty]');
+    const more = card.querySelector('[data-timeline-more]');
+    let cursor = null;
+
+    function loadPage() {
+        const url = new URL(card.dataset.patientTimeline, window.location.origin);
+        if (cursor) {
+            url.searchParams.set('cursor', cursor);
+        }
+        more.disabled = true;
+        fetch(url, {credentials: 'same-origin'})
+            .then(function(response) { return response.json(); })
+            .then(function(page) {
+                page.events.forEach(function(event) {
+                    list.appendChild(timelineItem(event));
+                });
+                cursor = page.next_cursor;
+                more.classList.toggle('d-none', !cursor);
+                empty.classList.toggle('d-none', list.children.length > 0);
+            })
+            .finally(function() {
+                more.disabled = false;
+            });
+    }
+
+    more.addEventListener('click', loadPage);
+    loadPage();
+});
+
+const TIMELINE_ICONS = {
+    appointment: 'fa-calendar-alt text-primary',
+    prescription: 'fa-pills text-success',
+    history: 'fa-notes-medical text-warning'
+};
+
+function timelineItem(event) {
+    const item = document.createElement('li');
+    item.className = 'list-group-item';
+
+    const heading = document.createElement('div');
+    heading.className = 'd-flex justify-content-between';
+    const title = document.createElement('strong');
+    const icon = document.createElement('i');
+    icon.className = 'fas me-2 ' + (TIMELINE_ICONS[event.type] || 'fa-circle');
+    title.appendChild(icon);
+    title.appendChild(document.createTextNode(event.title));
+    const when = document.createElement('small');
+    when.className = 'text-muted';
+    when.textContent = new Date(event.timestamp).toLocaleString();
+    heading.appendChild(title);
+    heading.appendChild(when);
+    item.appendChild(heading);
+
+    const details = [event.status_display, event.doctor, event.detail].filter(Boolean);
+    if (details.length) {
+        const detail = document.createElement('div');
+        detail.className = 'text-muted small';
+        detail.textContent = details.join(' · ');
+        item.appendChild(detail);
+    }
+    return item;
+}
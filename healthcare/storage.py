@@ -0,0 +1,17 @@
+"""
+Static file storage for the healthcare system.
+"""
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+
+class HashedStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Store static files under content-hashed names (e.g. ``style.55e7cbb9ba48.css``)
+    so they can be served with far-future cache headers.
+
+    Files missing from the manifest fall back to their plain name instead of
+    raising, so a template referencing an asset that was not collected does
+    not turn into a server error.
+    """
+    manifest_strict = False
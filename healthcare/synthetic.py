@@ -0,0 +1,343 @@
+"""
+Synthetic data for benchmarks, load tests and the seed_data command.
+
+generate() creates doctors with weekday schedules and time off, patients, a
+staff user, appointments and prescriptions from a seeded random generator,
+so the same arguments always produce the same data. Every user gets the
+password ``PASSWORD``, hashed once for all of them.
+
+Appointments are spread over the past year (longer when there are too many
+to fit) and the next few weeks, on the half-hour slots of each doctor's
+working day. A doctor's slots are drawn without replacement and skip their
+approved time off, so ``unique_together`` holds and no appointment needs
+reassigning. Prescriptions are written at one of the patient's past
+appointments with the doctor.
+
+The data is made for volume, millions of rows in minutes:
+
+- random values are drawn a column at a time with ``random.choices(k=...)``
+  rather than a call per row and field;
+- dates, times and timestamps come from lookup tables converted to their
+  database form once, not once per row;
+- rows are plain tuples inserted with ``executemany`` in batches, skipping
+  model instances and the per-object work of bulk_create;
+- primary keys are assigned up front, so foreign keys never need reading back.
+
+Nothing sends signals, so the doctor-patient relationships and the caches the
+signals maintain are rebuilt at the end. Usernames start with the prefix and
+must not exist yet.
+"""
+
+import logging
+import random
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .caching import bump_data_version
+from .capacity import invalidate_booked_counts
+from .directory import invalidate_doctor_directory
+from .models import Address, Appointment, Doctor, DoctorSchedule, Patient, Prescription, TimeOffRequest
+from .patients import rebuild_doctor_patients
+
+logger = logging.getLogger(__name__)
+
+PASSWORD = 'synthetic-password'
+BATCH_SIZE = 5000
+
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+    'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+    'Priya', 'Arjun', 'Wei', 'Mei', 'Carlos', 'Sofia', 'Ahmed', 'Fatima', 'Kenji', 'Yuki',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+    'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee',
+    'Patel', 'Sharma', 'Chen', 'Wang', 'Nguyen', 'Kim', 'Khan', 'Ali', 'Tanaka', 'Sato',
+]
+CITIES = [('Springfield', 'IL'), ('Riverside', 'CA'), ('Franklin', 'TN'), ('Greenville', 'SC'), ('Madison', 'WI')]
+SPECIALIZATIONS = [
+    'General Practice', 'Cardiology', 'Dermatology', 'Pediatrics', 'Orthopedics', 'Neurology', 'Psychiatry',
+]
+REASONS = ['Annual check-up', 'Follow-up visit', 'Persistent cough', 'Back pain', 'Blood pressure review', 'Rash', '']
+TIME_OFF_REASONS = ['Vacation', 'Conference', 'Training', 'Personal leave']
+MEDICATIONS = [
+    ('Amoxicillin 500mg', '1 capsule', 'Three times daily', '7 days'),
+    ('Lisinopril 10mg', '1 tablet', 'Once daily', 'Ongoing'),
+    ('Metformin 500mg', '1 tablet', 'Twice daily', 'Ongoing'),
+    ('Ibuprofen 400mg', '1 tablet', 'Every 8 hours as needed', '5 days'),
+    ('Atorvastatin 20mg', '1 tablet', 'Once daily at night', 'Ongoing'),
+    ('Cetirizine 10mg', '1 tablet', 'Once daily', '14 days'),
+]
+
+# Half-hour slots of the working day, 9:00 to 16:30
+SLOT_TIMES = [time(9 + minutes // 60, minutes % 60) for minutes in range(0, 8 * 60, 30)]
+WORKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']
+PAST_DAYS = 365
+FUTURE_DAYS = 42
+# Longest time off, in working days
+MAX_TIME_OFF_DAYS = 5
+
+PAST_STATUSES = (['completed', 'cancelled', 'confirmed'], [85, 10, 5])
+FUTURE_STATUSES = (['pending', 'confirmed', 'cancelled'], [40, 50, 10])
+
+
+def _to_db(model, field_name):
+    """Convert values of a field to their database form, each distinct value once"""
+    field = model._meta.get_field(field_name)
+    converted = {}
+
+    def convert(value):
+        try:
+            return converted[value]
+        except KeyError:
+            converted[value] = field.get_db_prep_save(value, connection)
+            return converted[value]
+    return convert
+
+
+def _insert_rows(model, fields, rows, batch_size, **constants):
+    """
+    Insert rows with executemany, without creating model instances.
+
+    Args:
+        fields: Names of the fields the rows give values for, in order
+        rows: Iterable of tuples of database-ready values
+        constants: Values shared by every row for other fields; the
+            remaining fields get their default (auto_now fields the time now)
+            and a primary key not given is left to the database
+
+    Returns:
+        int: Number of rows inserted
+    """
+    now = timezone.now()
+    columns, shared = [], []
+    for field in model._meta.concrete_fields:
+        if field.name in fields or field.primary_key and field.name not in constants:
+            continue
+        if field.name in constants:
+            value = constants[field.name]
+        elif getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            value = now
+        else:
+            value = field.get_default()
+        columns.append(field.column)
+        shared.append(field.get_db_prep_save(value, connection))
+    columns = [model._meta.get_field(name).column for name in fields] + columns
+
+    quote = connection.ops.quote_name
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} ({", ".join(quote(column) for column in columns)}) '
+        f'VALUES ({", ".join(["%s"] * len(columns))})'
+    )
+    shared = tuple(shared)
+    rows = (row + shared for row in rows)
+    inserted = 0
+    with connection.cursor() as cursor:
+        while batch := list(islice(rows, batch_size)):
+            cursor.executemany(sql, batch)
+            inserted += len(batch)
+    return inserted
+
+
+def _first_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def _workdays(start, end):
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            yield day
+        day += timedelta(days=1)
+
+
+class _Progress:
+    def __init__(self, callback):
+        self.callback = callback
+        self.counts = {}
+
+    def __call__(self, label, count):
+        self.counts[label] = count
+        if self.callback:
+            self.callback(label, count)
+
+
+@transaction.atomic
+def generate(doctors=20, patients=500, appointments=5000, prescriptions=2000, time_off=None, seed=0,
+             prefix='synthetic', batch_size=BATCH_SIZE, progress=None):
+    """
+    Create a synthetic dataset.
+
+    Args:
+        time_off: Number of time off requests, by default two per doctor
+        progress: Called with (table label, rows inserted) after each table
+
+    Returns:
+        dict: Number of rows created per table, and the usernames of a doctor,
+        a patient and a staff user to log in as
+    """
+    rng = random.Random(seed)
+    today = timezone.localdate()
+    now = timezone.now()
+    time_off = 2 * doctors if time_off is None else time_off
+    report = _Progress(progress)
+
+    # People: doctors first, then patients, then the staff user
+    people = doctors + patients
+    user_id, address_id = _first_id(User), _first_id(Address)
+    doctor_id, patient_id = _first_id(Doctor), _first_id(Patient)
+    doctor_ids = range(doctor_id, doctor_id + doctors)
+    patient_ids = range(patient_id, patient_id + patients)
+    # Hashing is deliberately slow, so every user shares one hash
+    password = make_password(PASSWORD)
+    usernames = [f'{prefix}_doctor{i}' for i in range(doctors)] + [f'{prefix}_patient{i}' for i in range(patients)]
+    first_names, last_names = rng.choices(FIRST_NAMES, k=people), rng.choices(LAST_NAMES, k=people)
+    # The profiles keep a copy of the name (display_name), which save() would fill in
+    names = [f'{first} {last}' for first, last in zip(first_names, last_names)]
+    report('users', _insert_rows(User, ['id', 'username', 'first_name', 'last_name', 'email'], zip(
+        range(user_id, user_id + people), usernames, first_names, last_names,
+        (f'{username}@example.com' for username in usernames),
+    ), batch_size, password=password, date_joined=now) + _insert_rows(
+        User, ['id', 'username', 'first_name', 'last_name', 'is_staff'],
+        [(user_id + people, f'{prefix}_admin', 'Admin', 'User', True)], batch_size, password=password, date_joined=now,
+    ))
+    cities = rng.choices(CITIES, k=people)
+    report('addresses', _insert_rows(Address, ['id', 'line1', 'city', 'state', 'pincode'], zip(
+        range(address_id, address_id + people),
+        (f'{number} {street} St' for number, street in zip(
+            rng.choices(range(1, 10000), k=people), rng.choices(LAST_NAMES, k=people),
+        )),
+        (city for city, _ in cities), (state for _, state in cities),
+        map(str, rng.choices(range(10000, 100000), k=people)),
+    ), batch_size))
+    phones = [f'555{number:07d}' for number in rng.choices(range(10_000_000), k=people)]
+    report('doctors', _insert_rows(
+        Doctor,
+        ['id', 'user', 'address', 'specialization', 'license_number', 'experience_years', 'phone', 'display_name'],
+        zip(
+            doctor_ids, range(user_id, user_id + doctors), range(address_id, address_id + doctors),
+            rng.choices(SPECIALIZATIONS, k=doctors), (f'LIC{i:06d}' for i in range(doctors)),
+            rng.choices(range(1, 36), k=doctors), phones[:doctors], names[:doctors],
+        ), batch_size,
+    ))
+    birth_date = _to_db(Patient, 'date_of_birth')
+    report('patients', _insert_rows(Patient, ['id', 'user', 'address', 'phone', 'date_of_birth', 'display_name'], zip(
+        patient_ids, range(user_id + doctors, user_id + people), range(address_id + doctors, address_id + people),
+        phones[doctors:], (birth_date(today - timedelta(days=age)) for age in rng.choices(range(365, 90 * 365), k=patients)),
+        names[doctors:],
+    ), batch_size))
+    start_time, end_time = _to_db(DoctorSchedule, 'start_time'), _to_db(DoctorSchedule, 'end_time')
+    report('schedules', _insert_rows(DoctorSchedule, ['doctor', 'day_of_week', 'start_time', 'end_time'], (
+        (doctor, day, start_time(time(9)), end_time(time(17))) for doctor in doctor_ids for day in WORKDAYS
+    ), batch_size))
+
+    # The calendar: enough past working days to hold every doctor's share of the appointments
+    per_doctor, extra = divmod(appointments, doctors) if doctors and patients else (0, 0)
+    needed_days = -(-(per_doctor + 1) // len(SLOT_TIMES)) + MAX_TIME_OFF_DAYS * (time_off // max(doctors, 1) + 1)
+    past_days = max(PAST_DAYS, needed_days * 7 // 5 + 7)
+    days = list(_workdays(today - timedelta(days=past_days), today + timedelta(days=FUTURE_DAYS)))
+    first_future = next((index for index, day in enumerate(days) if day >= today), len(days))
+    day_db = [_to_db(Appointment, 'appointment_date')(day) for day in days]
+    time_db = [_to_db(Appointment, 'appointment_time')(slot) for slot in SLOT_TIMES]
+    written_at = _to_db(Prescription, 'created_at')
+
+    # Time off: a few working days each, approved when in the past
+    off_days = {}
+    time_off_rows = []
+    off_date = _to_db(TimeOffRequest, 'start_date')
+    for position in range(time_off if doctors else 0):
+        doctor = doctor_ids[position % doctors]
+        length = rng.randint(1, MAX_TIME_OFF_DAYS)
+        first = rng.randrange(len(days) - length)
+        past = first + length <= first_future
+        status = 'approved' if past else rng.choice(['approved', 'pending', 'rejected'])
+        if status == 'approved':
+            taken = off_days.setdefault(doctor, set())
+            if taken.intersection(range(first, first + length)):
+                status = 'rejected'
+            else:
+                taken.update(range(first, first + length))
+        time_off_rows.append((
+            doctor, off_date(days[first]), off_date(days[first + length - 1]), rng.choice(TIME_OFF_REASONS), status,
+        ))
+    report('time_off_requests', _insert_rows(
+        TimeOffRequest, ['doctor', 'start_date', 'end_date', 'reason', 'status'], time_off_rows, batch_size,
+    ))
+
+    # Appointments and prescriptions, a doctor at a time
+    booked_days = set()
+    prescriptions_per_doctor, prescriptions_extra = divmod(prescriptions, doctors) if per_doctor else (0, 0)
+    prescription_rows = []
+    next_appointment = _first_id(Appointment)
+
+    def appointment_rows():
+        nonlocal next_appointment
+        for position, doctor in enumerate(doctor_ids):
+            taken = off_days.get(doctor, ())
+            open_days = [index for index in range(len(days)) if index not in taken]
+            capacity = len(open_days) * len(SLOT_TIMES)
+            share = min(per_doctor + (position < extra), capacity)
+            slots = rng.sample(range(capacity), share)
+            seen_by = rng.choices(patient_ids, k=share)
+            reasons = rng.choices(REASONS, k=share)
+            past_statuses = rng.choices(*PAST_STATUSES, k=share)
+            future_statuses = rng.choices(*FUTURE_STATUSES, k=share)
+            past_visits = []
+            for i, slot in enumerate(slots):
+                day, slot_time = open_days[slot // len(SLOT_TIMES)], slot % len(SLOT_TIMES)
+                booked_days.add((doctor, days[day]))
+                past = day < first_future
+                if past:
+                    past_visits.append((seen_by[i], day, slot_time))
+                yield (
+                    next_appointment + i, doctor, seen_by[i], day_db[day], time_db[slot_time], reasons[i],
+                    past_statuses[i] if past else future_statuses[i],
+                )
+            next_appointment += share
+
+            written = prescriptions_per_doctor + (position < prescriptions_extra)
+            if past_visits and written:
+                medications = rng.choices(MEDICATIONS, k=written)
+                for (patient, day, slot_time), (name, dosage, frequency, duration) in zip(
+                    rng.choices(past_visits, k=written), medications,
+                ):
+                    at = written_at(timezone.make_aware(datetime.combine(days[day], SLOT_TIMES[slot_time])))
+                    prescription_rows.append((doctor, patient, name, dosage, frequency, duration, at, at))
+
+    report('appointments', _insert_rows(
+        Appointment, ['id', 'doctor', 'patient', 'appointment_date', 'appointment_time', 'reason', 'status'],
+        appointment_rows(), batch_size,
+    ))
+    report('prescriptions', _insert_rows(
+        Prescription,
+        ['doctor', 'patient', 'medication_name', 'dosage', 'frequency', 'duration', 'created_at', 'updated_at'],
+        prescription_rows, batch_size,
+    ))
+
+    # Explicit ids leave PostgreSQL sequences behind; SQLite needs nothing
+    models = [User, Address, Doctor, Patient, Appointment]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+    # Nothing sent signals
+    report('doctor_patients', rebuild_doctor_patients())
+    invalidate_booked_counts(booked_days)
+    invalidate_doctor_directory()
+    bump_data_version()
+
+    counts = {
+        **report.counts,
+        'doctor_username': usernames[0] if doctors else None,
+        'patient_username': usernames[doctors] if patients else None,
+        'staff_username': f'{prefix}_admin',
+    }
+    logger.info(f'Generated synthetic data: {counts}')
+    return counts
@@ -38,6 +38,12 @@ def has_doctor_profile(user):
     except Doctor.DoesNotExist:
         return False
 
+@register.filter
+def thumbnail(image_field, size='medium'):
+    """Get the URL of a resized thumbnail (small, medium or large) of an image."""
+    from healthcare.images import thumbnail_url
+    return thumbnail_url(image_field, size)
+
 @register.filter
 def mul(value, arg):
     """Multiply value by arg."""
@@ -63,3 +69,10 @@ def add(value, arg):
         return float(value) + float(arg)
     except (ValueError, TypeError):
         return 0
+
+@register.filter
+def toggle_sort(current, key):
+    """Get the sort value of a column header link: the column's key, reversed if it's the current sort."""
+    if current != key:
+        return key
+    return key[1:] if key.startswith('-') else f'-{key}'
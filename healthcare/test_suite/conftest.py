@@ -0,0 +1,60 @@
+"""
+Fixtures shared by the healthcare tests.
+
+``make_doctor`` and ``make_patient`` create a profile together with its user
+and address. User fields (names, email) and profile fields (specialization,
+phone...) are passed as keyword arguments, and every user gets ``PASSWORD``.
+``doctor`` and ``patient`` are one of each, and ``login`` gives a client
+logged in as a user.
+"""
+
+import pytest
+from django.contrib.auth.models import User
+from django.test import Client
+
+from healthcare.models import Address, Doctor, Patient
+
+PASSWORD = 'testpassword123'
+USER_FIELDS = ('first_name', 'last_name', 'email', 'is_staff')
+
+
+def _create_profile(model, username, line1, fields):
+    user_fields = {field: fields.pop(field) for field in USER_FIELDS if field in fields}
+    return model.objects.create(
+        user=User.objects.create_user(username=username, password=PASSWORD, **user_fields),
+        address=Address.objects.create(line1=line1, city='Testville', state='TS', pincode='12345'),
+        **fields,
+    )
+
+
+@pytest.fixture
+def make_doctor(db):
+    def make(username='doctor', **fields):
+        return _create_profile(Doctor, username, '1 Clinic Rd', fields)
+    return make
+
+
+@pytest.fixture
+def make_patient(db):
+    def make(username='patient', **fields):
+        return _create_profile(Patient, username, '2 Home St', fields)
+    return make
+
+
+@pytest.fixture
+def doctor(make_doctor):
+    return make_doctor()
+
+
+@pytest.fixture
+def patient(make_patient):
+    return make_patient()
+
+
+@pytest.fixture
+def login():
+    def login(user):
+        client = Client()
+        client.force_login(user)
+        return client
+    return login
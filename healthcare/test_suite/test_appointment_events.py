@@ -0,0 +1,72 @@
+import asyncio
+import datetime
+
+import pytest
+
+from healthcare.events import broker
+from healthcare.models import Appointment
+
+
+@pytest.fixture
+def event_loop_queue():
+    """Subscribe a queue on a private event loop, as an event stream would"""
+    loop = asyncio.new_event_loop()
+    subscriptions = []
+
+    def subscribe(user_id):
+        async def _subscribe():
+            return broker.subscribe(user_id)
+        queue = loop.run_until_complete(_subscribe())
+        subscriptions.append((user_id, queue))
+        return queue
+
+    def next_event(queue, timeout=1):
+        return loop.run_until_complete(asyncio.wait_for(queue.get(), timeout=timeout))
+
+    yield subscribe, next_event
+    for user_id, queue in subscriptions:
+        broker.unsubscribe(user_id, queue)
+    loop.close()
+
+
+@pytest.mark.django_db
+def test_appointment_events_reach_patient_and_doctor(doctor, patient, event_loop_queue, django_capture_on_commit_callbacks):
+    subscribe, next_event = event_loop_queue
+    doctor_queue = subscribe(doctor.user_id)
+    patient_queue = subscribe(patient.user_id)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        appointment = Appointment.objects.create(
+            patient=patient,
+            doctor=doctor,
+            appointment_date=datetime.date.today(),
+            appointment_time=datetime.time(10, 0),
+        )
+    assert next_event(doctor_queue)['type'] == 'appointment.created'
+    assert next_event(patient_queue)['appointment']['id'] == appointment.id
+
+    with django_capture_on_commit_callbacks(execute=True):
+        appointment = Appointment.objects.get(pk=appointment.pk)
+        appointment.status = 'confirmed'
+        appointment.save()
+    event = next_event(patient_queue)
+    assert event['type'] == 'appointment.status_changed'
+    assert event['appointment']['status'] == 'confirmed'
+
+
+@pytest.mark.django_db
+def test_saves_without_status_change_are_not_published(doctor, patient, event_loop_queue, django_capture_on_commit_callbacks):
+    appointment = Appointment.objects.create(
+        patient=patient,
+        doctor=doctor,
+        appointment_date=datetime.date.today(),
+        appointment_time=datetime.time(10, 0),
+    )
+    subscribe, next_event = event_loop_queue
+    queue = subscribe(doctor.user_id)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        appointment.reason = 'Follow-up'
+        appointment.save()
+    with pytest.raises(asyncio.TimeoutError):
+        next_event(queue, timeout=0.1)
@@ -0,0 +1,56 @@
+import datetime
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+
+from healthcare.models import Appointment, Prescription
+
+
+@pytest.fixture
+def appointment(make_doctor, make_patient):
+    cache.clear()
+    doctor = make_doctor('asyncdoctor', first_name='Ann', last_name='Lee')
+    patient = make_patient('asyncpatient', first_name='Bob', last_name='Ray')
+    Prescription.objects.create(doctor=doctor, patient=patient, medication_name='Ibuprofen', dosage='1', frequency='Daily', duration='5 days')
+    return Appointment.objects.create(
+        patient=patient,
+        doctor=doctor,
+        appointment_date=datetime.date.today(),
+        appointment_time=datetime.time(9, 30),
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url_name', ['doctor_dashboard', 'show_appointments', 'view_reports'])
+def test_async_doctor_views_render(appointment, url_name, login):
+    client = login(appointment.doctor.user)
+    response = client.get(reverse(f'healthcare:{url_name}'))
+    assert response.status_code == 200
+    assert 'Bob Ray' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_appointments_api(appointment, login):
+    client = login(appointment.patient.user)
+    response = client.get(reverse('healthcare:appointments_api'), {'filter': 'today'})
+    assert response.status_code == 200
+    assert response.json()['appointments'] == [{
+        'id': appointment.id,
+        'date': appointment.appointment_date.isoformat(),
+        'time': '09:30',
+        'status': 'pending',
+        'reason': '',
+        'patient': 'Bob Ray',
+        'doctor': 'Dr. Ann Lee',
+    }]
+
+
+@pytest.mark.django_db
+def test_dashboard_stats_api(appointment, login):
+    client = login(appointment.doctor.user)
+    response = client.get(reverse('healthcare:dashboard_stats_api'))
+    assert response.json() == {
+        'appointments': {'total': 1, 'today': 1, 'upcoming': 1, 'pending': 1},
+        'prescriptions': 1,
+    }
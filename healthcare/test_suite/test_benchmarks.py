@@ -0,0 +1,67 @@
+import pytest
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+
+from healthcare.management.commands.run_benchmarks import find_regressions
+from healthcare.models import Appointment, DoctorPatient, Prescription, TimeOffRequest
+from healthcare.synthetic import generate
+
+
+@pytest.mark.django_db
+def test_generator_creates_the_requested_rows_deterministically():
+    counts = generate(doctors=3, patients=10, appointments=200, prescriptions=30, seed=7, prefix='first')
+    first = list(Appointment.objects.order_by('pk').values_list('appointment_date', 'appointment_time', 'status'))
+    Appointment.objects.all().delete()
+
+    generate(doctors=3, patients=10, appointments=200, prescriptions=30, seed=7, prefix='second')
+    second = list(Appointment.objects.order_by('pk').values_list('appointment_date', 'appointment_time', 'status'))
+
+    assert counts['appointments'] == 200
+    assert Prescription.objects.count() == 60
+    assert first == second
+    # The inserts skip the signals, so the relationships are rebuilt afterwards
+    assert DoctorPatient.objects.count() == counts['doctor_patients'] > 0
+
+
+@pytest.mark.django_db
+def test_generated_appointments_avoid_approved_time_off():
+    generate(doctors=2, patients=5, appointments=1000, prescriptions=40, time_off=10, seed=3)
+
+    assert TimeOffRequest.objects.count() == 10
+    for time_off in TimeOffRequest.objects.filter(status='approved'):
+        assert not Appointment.objects.filter(
+            doctor=time_off.doctor, appointment_date__range=(time_off.start_date, time_off.end_date),
+        ).exists()
+    # Prescriptions are written at one of the pair's appointments
+    for prescription in Prescription.objects.all():
+        assert Appointment.objects.filter(
+            doctor=prescription.doctor, patient=prescription.patient,
+            appointment_date=timezone.localtime(prescription.created_at).date(),
+        ).exists()
+
+
+@pytest.mark.django_db
+def test_seed_data_refuses_existing_usernames():
+    call_command('seed_data', doctors=1, patients=2, appointments=10, prescriptions=2, prefix='seeded')
+
+    with pytest.raises(CommandError):
+        call_command('seed_data', doctors=1, patients=2, appointments=10, prescriptions=2, prefix='seeded')
+
+
+def test_regressions_need_both_the_threshold_and_the_minimum_delta():
+    baseline = {
+        'slow': {'p95_ms': 100.0, 'queries': 10},
+        'fast': {'p95_ms': 1.0, 'queries': 3},
+    }
+    results = {
+        'slow': {'p95_ms': 130.0, 'queries': 10},
+        'fast': {'p95_ms': 2.5, 'queries': 4},
+        'new': {'p95_ms': 50.0, 'queries': 1},
+    }
+
+    regressions = find_regressions(results, baseline, threshold=0.25, min_delta_ms=2.0)
+
+    assert regressions == [
+        'slow: p95 130.00 ms against 100.00 ms in the baseline',
+        'fast: 4 queries against 3 in the baseline',
+    ]
@@ -0,0 +1,87 @@
+import datetime
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.urls import reverse
+
+from healthcare.capacity import check_capacity, get_booked_count, utilization_heatmap
+from healthcare.models import Appointment, DoctorSettings
+
+DAY = datetime.date(2031, 1, 6)
+
+
+@pytest.fixture
+def limited_doctor(make_doctor, make_patient):
+    cache.clear()
+    doctor = make_doctor('capdoctor')
+    DoctorSettings.objects.create(
+        doctor=doctor, max_patients_per_day=2, working_hours_start=datetime.time(9), working_hours_end=datetime.time(17),
+    )
+    return doctor, make_patient('cappatient')
+
+
+@pytest.mark.django_db
+def test_capacity_check_uses_cached_counts(limited_doctor, django_assert_num_queries):
+    doctor, patient = limited_doctor
+    Appointment.objects.create(patient=patient, doctor=doctor, appointment_date=DAY, appointment_time=datetime.time(9))
+    assert check_capacity(doctor.pk, DAY, datetime.time(10)) is None
+
+    with django_assert_num_queries(0):
+        assert check_capacity(doctor.pk, DAY, datetime.time(10)) is None
+    assert 'working hours' in check_capacity(doctor.pk, DAY, datetime.time(18))
+
+    second = Appointment.objects.create(patient=patient, doctor=doctor, appointment_date=DAY, appointment_time=datetime.time(10))
+    assert check_capacity(doctor.pk, DAY, datetime.time(11)) == 'The doctor is fully booked on this day.'
+
+    second.status = 'cancelled'
+    second.save()
+    assert get_booked_count(doctor.pk, DAY) == 1
+
+
+
+@pytest.mark.django_db
+def test_a_count_taken_before_a_change_is_not_cached_over_it(limited_doctor):
+    doctor, patient = limited_doctor
+    booked = []
+
+    def book_during_count(execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if 'COUNT' in sql and not booked:
+            booked.append(True)
+            Appointment.objects.create(patient=patient, doctor=doctor, appointment_date=DAY, appointment_time=datetime.time(9))
+        return result
+
+    with connection.execute_wrapper(book_during_count):
+        assert get_booked_count(doctor.pk, DAY) == 0
+    assert get_booked_count(doctor.pk, DAY) == 1
+
+
+@pytest.mark.django_db
+def test_booking_is_refused_when_the_day_is_full(limited_doctor, login):
+    doctor, patient = limited_doctor
+    for hour in (9, 10):
+        Appointment.objects.create(patient=patient, doctor=doctor, appointment_date=DAY, appointment_time=datetime.time(hour))
+    client = login(patient.user)
+
+    client.post(reverse('healthcare:book_appointment'), {
+        'doctor': doctor.pk, 'appointment_date': DAY.isoformat(), 'appointment_time': '11:00',
+    })
+
+    assert Appointment.objects.filter(doctor=doctor).count() == 2
+
+
+@pytest.mark.django_db
+def test_heatmap_counts_booked_places(limited_doctor, django_assert_max_num_queries):
+    doctor, patient = limited_doctor
+    Appointment.objects.create(patient=patient, doctor=doctor, appointment_date=DAY, appointment_time=datetime.time(9))
+    Appointment.objects.create(patient=patient, doctor=doctor, appointment_date=DAY, appointment_time=datetime.time(10), status='cancelled')
+
+    with django_assert_max_num_queries(3):
+        dates, rows = utilization_heatmap(weeks=1, start=DAY)
+
+    assert len(dates) == 7
+    (row_doctor, cells), = rows
+    assert row_doctor == doctor
+    assert cells[0] == {'date': DAY, 'booked': 1, 'limit': 2, 'percent': 50}
+    assert cells[1]['booked'] == 0
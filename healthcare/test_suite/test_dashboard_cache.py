@@ -0,0 +1,73 @@
+import datetime
+import re
+
+import pytest
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+
+from healthcare.caching import get_cache_stats
+from healthcare.models import Appointment
+
+
+@pytest.fixture
+def doctor_client(make_doctor, make_patient, login):
+    cache.clear()
+    doctor = make_doctor('cachedoctor', specialization='Cardiology')
+    patient = make_patient('cachepatient')
+    return login(doctor.user), doctor, patient
+
+
+@pytest.mark.django_db
+def test_doctor_dashboard_served_from_cache_until_data_changes(doctor_client):
+    client, doctor, patient = doctor_client
+    url = reverse('healthcare:doctor_dashboard')
+
+    client.get(url)
+    client.get(url)
+    assert get_cache_stats()['hits'] == 1
+    assert get_cache_stats()['misses'] == 1
+
+    Appointment.objects.create(
+        patient=patient,
+        doctor=doctor,
+        appointment_date=datetime.date.today(),
+        appointment_time=datetime.time(10, 0),
+    )
+    response = client.get(url)
+    assert get_cache_stats()['misses'] == 2
+    assert len(response.context['appointments']) == 1
+
+
+@pytest.mark.django_db
+def test_dashboard_cache_is_keyed_on_filter(doctor_client):
+    client, doctor, patient = doctor_client
+    url = reverse('healthcare:doctor_dashboard')
+
+    client.get(url, {'filter': 'today'})
+    client.get(url, {'filter': 'upcoming'})
+    assert get_cache_stats()['hits'] == 0
+    assert get_cache_stats()['misses'] == 2
+
+
+@pytest.mark.django_db
+def test_cached_dashboard_forms_get_a_working_csrf_token(doctor_client):
+    client, doctor, patient = doctor_client
+    appointment = Appointment.objects.create(
+        patient=patient, doctor=doctor, appointment_date=datetime.date(2031, 1, 6), appointment_time=datetime.time(10, 0),
+    )
+    url = reverse('healthcare:patient_dashboard')
+    first, second = Client(enforce_csrf_checks=True), Client(enforce_csrf_checks=True)
+    first.force_login(patient.user)
+    first.get(url)
+    # The same patient on another device gets the page from the cache
+    second.force_login(patient.user)
+    page = second.get(url).content.decode()
+    assert get_cache_stats()['hits'] == 1
+
+    token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page).group(1)
+    response = second.post(reverse('healthcare:cancel_appointment', args=[appointment.id]), {'csrfmiddlewaretoken': token})
+
+    assert response.status_code == 302
+    appointment.refresh_from_db()
+    assert appointment.status == 'cancelled'
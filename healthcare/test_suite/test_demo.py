@@ -0,0 +1,87 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+
+from healthcare import demo as demo_module
+from healthcare.demo import DEMO_USERNAMES, demo_accounts, provision_demo_data, reset_demo_cache
+from healthcare.metrics import registry
+from healthcare.models import Appointment, DoctorPatient, Prescription
+
+
+@pytest.fixture(autouse=True)
+def demo_cache():
+    reset_demo_cache()
+    registry.reset()
+    yield
+    reset_demo_cache()
+    registry.reset()
+
+
+@pytest.mark.django_db
+def test_setup_demo_creates_the_accounts_once():
+    call_command('setup_demo')
+    appointments = Appointment.objects.count()
+    call_command('setup_demo')
+
+    assert User.objects.filter(username__in=DEMO_USERNAMES).count() == len(DEMO_USERNAMES)
+    assert appointments == Appointment.objects.count() > 0
+    assert Prescription.objects.exists()
+    # bulk_create sends no signals, so the relationships are refreshed explicitly
+    assert DoctorPatient.objects.filter(visit_count__gt=0).count() == len(DEMO_USERNAMES) - 1
+
+
+@pytest.mark.django_db
+def test_demo_login_doesnt_create_accounts():
+    response = Client().get(reverse('healthcare:demo_login', args=['patient']))
+
+    assert response.url == reverse('healthcare:login')
+    assert not User.objects.exists()
+
+
+@pytest.mark.django_db
+def test_recreated_accounts_replace_the_cached_ids(django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        provision_demo_data()
+    old = demo_accounts()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        provision_demo_data(reset=True)
+
+    new = demo_accounts()
+    assert new.users and not new.users & old.users
+    assert new.users == set(User.objects.filter(username__in=DEMO_USERNAMES).values_list('pk', flat=True))
+
+
+@pytest.mark.django_db
+def test_demo_login_looks_again_when_the_cached_id_is_gone():
+    provision_demo_data()
+    # Ids cached before another process recreated the accounts
+    gone = User.objects.order_by('-pk').values_list('pk', flat=True).first() + 1
+    demo_module._accounts = demo_accounts()._replace(logins={'patient': gone, 'doctor': gone})
+
+    response = Client().get(reverse('healthcare:demo_login', args=['patient']))
+
+    assert response.url == reverse('healthcare:patient_dashboard')
+
+
+@pytest.mark.django_db
+def test_demo_sessions_stay_out_of_metrics_and_reports():
+    call_command('setup_demo')
+    User.objects.create_user(username='reportadmin', password='testpassword123', is_staff=True)
+    demo = Client()
+    response = demo.get(reverse('healthcare:demo_login', args=['doctor']))
+    assert response.url == reverse('healthcare:doctor_dashboard')
+    assert demo.session['is_demo_user']
+    demo.get(reverse('healthcare:my_patients'))
+
+    assert registry.totals()['requests'] == 0
+    assert registry.snapshot() == []
+
+    staff = Client()
+    staff.login(username='reportadmin', password='testpassword123')
+    context = staff.get(reverse('healthcare:admin_reports')).context
+    assert context['total_users'] == 1
+    assert context['total_patients'] == context['total_doctors'] == 0
+    assert context['total_appointments'] == context['total_prescriptions'] == 0
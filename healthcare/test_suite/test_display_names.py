@@ -0,0 +1,63 @@
+from datetime import date, time
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+
+from healthcare.models import Appointment, Patient
+
+
+@pytest.fixture
+def patients(make_patient):
+    return [make_patient(f'namepatient{i}', first_name='Ann', last_name=f'Lee{i}') for i in range(3)]
+
+
+@pytest.mark.django_db
+def test_display_name_follows_the_user_name(patients, make_doctor):
+    doctor = make_doctor('namedoctor', first_name='Meredith', last_name='Grey')
+    assert str(doctor) == 'Dr. Meredith Grey'
+
+    user = patients[0].user
+    user.last_name = 'Kim'
+    user.save(update_fields=['last_name'])
+
+    assert Patient.objects.get(pk=patients[0].pk).full_name == 'Ann Kim'
+    # Reloading without the user keeps the copied name
+    patient = Patient.objects.get(pk=patients[1].pk)
+    patient.phone = '555-0100'
+    patient.save()
+    assert Patient.objects.get(pk=patient.pk).display_name == 'Ann Lee1'
+
+
+@pytest.mark.django_db
+def test_appointment_names_render_without_user_queries(patients, make_doctor):
+    doctor = make_doctor('namedoctor', first_name='Meredith', last_name='Grey')
+    for i, patient in enumerate(patients):
+        Appointment.objects.create(
+            doctor=doctor, patient=patient, appointment_date=date(2030, 1, 7), appointment_time=time(9 + i),
+        )
+
+    queries = []
+    with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+        names = [str(appointment) for appointment in Appointment.objects.select_related('patient', 'doctor')]
+
+    assert names[0].startswith('Ann Lee0 with Dr. Meredith Grey')
+    assert len(queries) == 1 and User._meta.db_table not in queries[0]
+
+
+@pytest.mark.django_db
+def test_admin_patient_list_runs_the_same_queries_for_any_number_of_rows(patients, make_patient, login):
+    client = login(User.objects.create_superuser(username='nameadmin'))
+
+    def count_queries():
+        queries = []
+        with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+            response = client.get('/admin/healthcare/patient/')
+        assert response.status_code == 200
+        return len(queries)
+
+    # The first request also loads the session and content types
+    count_queries()
+    few = count_queries()
+    make_patient('namepatient3', first_name='Bo', last_name='Park')
+    assert count_queries() == few
@@ -0,0 +1,80 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.urls import reverse
+
+from healthcare.directory import get_doctor_directory
+from healthcare.forms import AppointmentForm
+from healthcare.metrics import query_budget, registry
+from healthcare.models import Doctor
+
+
+@pytest.fixture
+def doctors(make_doctor):
+    cache.clear()
+    return [
+        make_doctor('dirdoc1', first_name='Gregory', last_name='House', specialization='Diagnostics'),
+        make_doctor('dirdoc2', first_name='Lisa', last_name='Cuddy', specialization='Endocrinology'),
+        make_doctor('dirdoc3', first_name='James', last_name='Wilson', specialization='Oncology'),
+    ]
+
+
+@pytest.mark.django_db
+def test_booking_page_renders_doctors_without_querying_them(doctors, patient, login):
+    client = login(patient.user)
+    get_doctor_directory()
+
+    queries = []
+    with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+        response = client.get(reverse('healthcare:book_appointment'))
+
+    assert response.status_code == 200
+    assert 'Dr. Lisa Cuddy' in response.content.decode()
+    assert not [sql for sql in queries if Doctor._meta.db_table in sql]
+
+
+@pytest.mark.django_db
+def test_booking_stays_within_its_query_budgets(doctors, patient, login):
+    client = login(patient.user)
+    registry.reset()
+
+    client.get(reverse('healthcare:book_appointment'))
+    client.get(reverse('healthcare:book_appointment'))
+    response = client.post(reverse('healthcare:book_appointment'), {
+        'doctor': doctors[0].pk, 'appointment_date': '2031-01-06', 'appointment_time': '10:00',
+    })
+
+    assert response.status_code == 302
+    assert query_budget('healthcare:book_appointment', 'GET') < query_budget('healthcare:book_appointment', 'POST')
+    assert dict(registry.snapshot())['healthcare:book_appointment']['budget_violations'] == 0
+    registry.reset()
+
+
+@pytest.mark.django_db
+def test_directory_is_rebuilt_when_a_doctor_or_their_user_changes(doctors, django_capture_on_commit_callbacks):
+    names = ['Dr. Lisa Cuddy', 'Dr. Gregory House', 'Dr. James Wilson']
+    assert [name for _, name in get_doctor_directory().choices] == names
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user = doctors[0].user
+        user.last_name = 'Adams'
+        user.save()
+        doctors[2].delete()
+        # Other processes keep the old directory until the changes commit
+        assert [name for _, name in get_doctor_directory().choices] == names
+
+    assert [name for _, name in AppointmentForm().fields['doctor'].choices] == [
+        'Select a Doctor', 'Dr. Gregory Adams', 'Dr. Lisa Cuddy',
+    ]
+
+
+@pytest.mark.django_db
+def test_doctor_search_matches_name_and_specialization_prefixes(doctors, login):
+    client = login(User.objects.create_user(username='dirsearcher'))
+
+    by_name = client.get(reverse('healthcare:doctor_search_api'), {'q': 'ja wil'}).json()['results']
+    by_specialization = client.get(reverse('healthcare:doctor_search_api'), {'q': 'endo'}).json()['results']
+
+    assert [doctor['name'] for doctor in by_name] == ['James Wilson']
+    assert by_specialization == [{'id': doctors[1].pk, 'name': 'Lisa Cuddy', 'specialization': 'Endocrinology'}]
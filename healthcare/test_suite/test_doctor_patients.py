@@ -0,0 +1,126 @@
+import datetime
+
+import pytest
+from django.urls import reverse
+
+from healthcare.forms import PrescriptionForm
+from healthcare.models import Appointment, DoctorPatient
+from healthcare.patients import search_doctor_patients
+
+DAY = datetime.date(2031, 1, 6)
+
+
+def book(doctor, patient, days=0, hour=10):
+    return Appointment.objects.create(
+        doctor=doctor, patient=patient, appointment_date=DAY + datetime.timedelta(days=days),
+        appointment_time=datetime.time(hour, 0),
+    )
+
+
+@pytest.mark.django_db
+def test_relationship_follows_appointments(doctor, make_patient):
+    patient = make_patient('linked')
+    first = book(doctor, patient)
+    book(doctor, patient, days=7)
+
+    link = DoctorPatient.objects.get(doctor=doctor, patient=patient)
+    assert (link.first_visit, link.last_visit, link.visit_count) == (DAY, DAY + datetime.timedelta(days=7), 2)
+
+    first.status = 'cancelled'
+    first.save()
+    assert DoctorPatient.objects.get(doctor=doctor, patient=patient).visit_count == 1
+
+    # Moving an appointment to another patient moves the relationship with it
+    other = make_patient('other')
+    first.patient = other
+    first.save()
+    assert DoctorPatient.objects.get(doctor=doctor, patient=patient).first_visit == DAY + datetime.timedelta(days=7)
+    assert DoctorPatient.objects.filter(doctor=doctor, patient=other).exists()
+
+    first.delete()
+    assert not DoctorPatient.objects.filter(doctor=doctor, patient=other).exists()
+
+
+@pytest.mark.django_db
+def test_search_matches_name_and_phone_prefixes_most_recent_first(doctor, make_patient):
+    ada = make_patient('ada', first_name='Ada', last_name='Lovelace', phone='5550100')
+    alan = make_patient('alan', first_name='Alan', last_name='Turing', phone='5550200')
+    grace = make_patient('grace', first_name='Grace', last_name='Hopper', phone='5550300')
+    book(doctor, ada, days=1)
+    book(doctor, alan, days=2)
+    book(doctor, grace, days=3)
+
+    links, has_next = search_doctor_patients(doctor, 'a')
+    assert [link.patient for link in links] == [alan, ada]
+    assert not has_next
+    assert [link.patient for link in search_doctor_patients(doctor, 'ada love')[0]] == [ada]
+    assert [link.patient for link in search_doctor_patients(doctor, '55503')[0]] == [grace]
+
+    first_page, has_next = search_doctor_patients(doctor, page_size=2)
+    second_page, last = search_doctor_patients(doctor, page=2, page_size=2)
+    assert [link.patient for link in first_page + second_page] == [grace, alan, ada]
+    assert has_next and not last
+
+
+@pytest.mark.django_db
+def test_patient_picker_api(doctor, make_patient, login):
+    for i in range(25):
+        book(doctor, make_patient(f'picker{i}', first_name='Pat', last_name=f'Number{i}'), hour=8 + i % 10, days=i)
+    make_patient('stranger', first_name='Pat', last_name='Stranger')
+
+    client = login(doctor.user)
+    url = reverse('healthcare:doctor_patients_api')
+    first = client.get(url, {'q': 'pat'}).json()
+    second = client.get(url, {'q': 'pat', 'page': 2}).json()
+
+    assert len(first['results']) == 20 and first['has_next']
+    assert len(second['results']) == 5 and not second['has_next']
+    assert first['results'][0]['name'] == 'Pat Number24'
+    assert 'Pat Stranger' not in {row['name'] for row in first['results'] + second['results']}
+
+
+@pytest.mark.django_db
+def test_prescription_form_only_accepts_the_doctors_patients(doctor, make_patient):
+    seen = make_patient('seen')
+    book(doctor, seen)
+    stranger = make_patient('stranger')
+    data = {'medication_name': 'Placebo', 'dosage': '1 tablet', 'frequency': 'Daily', 'duration': '7 days'}
+
+    assert PrescriptionForm({**data, 'patient': seen.pk}, doctor=doctor).is_valid()
+    form = PrescriptionForm({**data, 'patient': stranger.pk}, doctor=doctor)
+    assert not form.is_valid()
+    assert 'patient' in form.errors
+
+
+@pytest.mark.django_db
+def test_my_patients_lists_visit_data_in_one_query(doctor, make_patient, django_assert_num_queries, login):
+    from healthcare.patients import doctor_patient_list
+
+    today = datetime.date.today()
+    regular = make_patient('regular', first_name='Reg', last_name='Ular')
+    for days in (-30, -7, 14):
+        Appointment.objects.create(doctor=doctor, patient=regular, appointment_date=today + datetime.timedelta(days=days),
+                                   appointment_time=datetime.time(10, 0))
+    Appointment.objects.create(doctor=doctor, patient=regular, appointment_date=today - datetime.timedelta(days=1),
+                               appointment_time=datetime.time(10, 0), status='cancelled')
+    new = make_patient('new', first_name='New', last_name='Comer')
+    Appointment.objects.create(doctor=doctor, patient=new, appointment_date=today + datetime.timedelta(days=3),
+                               appointment_time=datetime.time(11, 0))
+    for i in range(5):
+        book(doctor, make_patient(f'filler{i}'), days=-i)
+
+    with django_assert_num_queries(1):
+        patients = {patient.pk: patient for patient in doctor_patient_list(doctor)}
+        [patient.full_name for patient in patients.values()]
+
+    assert patients[regular.pk].last_visit == today - datetime.timedelta(days=7)
+    assert patients[regular.pk].next_visit == today + datetime.timedelta(days=14)
+    assert patients[regular.pk].visit_count == 3
+    assert patients[new.pk].last_visit is None
+    assert [patient.pk for patient in doctor_patient_list(doctor, sort='-visits')][0] == regular.pk
+    assert [patient.pk for patient in doctor_patient_list(doctor, sort='next_visit')][:2] == [new.pk, regular.pk]
+
+    client = login(doctor.user)
+    response = client.get(reverse('healthcare:my_patients'), {'sort': 'name', 'page': 1})
+    assert response.status_code == 200
+    assert response.context['patients'].paginator.count == 7
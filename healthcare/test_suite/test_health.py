@@ -0,0 +1,46 @@
+import pytest
+from django.contrib.auth.models import User
+from django.test import Client
+from django.urls import reverse
+
+from healthcare.health import HEALTH_FIELDS, TimeSeries, current_health, recent_history, take_sample
+
+
+def test_time_series_keeps_the_latest_samples_in_order():
+    series = TimeSeries(('value',), size=3)
+    for second in range(5):
+        series.append(second, {'value': second * 10} if second != 3 else {})
+
+    history = series.since(0)
+    assert history['times'] == [2, 3, 4]
+    assert history['value'] == [20, None, 40]
+    assert series.since(4)['times'] == [4]
+
+
+@pytest.mark.django_db
+def test_health_reads_the_database_and_process():
+    health = current_health()
+
+    assert health['database']['ok']
+    assert health['database']['size_bytes'] > 0
+    assert health['uptime_seconds'] >= 0
+    assert health['rss_bytes'] > 0
+
+    take_sample()
+    history = recent_history()
+    assert set(HEALTH_FIELDS) <= set(history)
+    assert history['db_size_mb'][-1] > 0
+
+
+@pytest.mark.django_db
+def test_system_report_shows_real_uptime():
+    User.objects.create_user(username='healthadmin', password='testpassword123', is_staff=True)
+    client = Client()
+    client.login(username='healthadmin', password='testpassword123')
+
+    response = client.get(reverse('healthcare:system_reports'))
+
+    assert response.status_code == 200
+    assert response.context['system_uptime'] != '99.9%'
+    assert b'id="health-history"' in response.content
+    assert client.get(reverse('healthcare:download_pdf', args=['system'])).status_code == 200
@@ -0,0 +1,103 @@
+from io import BytesIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image
+
+from healthcare.images import (
+    MAX_PICTURE_SIZE,
+    THUMBNAIL_SIZES,
+    generate_thumbnails,
+    process_profile_picture,
+    stage_profile_picture,
+    thumbnail_name,
+)
+
+
+def test_generate_thumbnails(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    buffer = BytesIO()
+    Image.new('RGB', (1200, 800), 'red').save(buffer, 'JPEG')
+    name = default_storage.save('profile_pics/photo.jpg', ContentFile(buffer.getvalue()))
+
+    created = generate_thumbnails(name)
+
+    assert sorted(created) == sorted(thumbnail_name(name, size) for size in THUMBNAIL_SIZES)
+    with default_storage.open(thumbnail_name(name, 'small')) as f:
+        thumb = Image.open(f)
+        assert thumb.format == 'WEBP'
+        assert max(thumb.size) == THUMBNAIL_SIZES['small']
+    # Existing thumbnails are not generated again
+    assert generate_thumbnails(name) == []
+
+
+@pytest.mark.django_db
+def test_process_profile_picture_strips_exif_and_downscales(settings, tmp_path, patient):
+    settings.MEDIA_ROOT = tmp_path / 'media'
+    settings.UPLOAD_STAGING_DIR = str(tmp_path / 'staging')
+    exif = Image.Exif()
+    exif[0x010f] = 'PhoneMaker'
+    buffer = BytesIO()
+    Image.new('RGB', (4000, 3000), 'blue').save(buffer, 'JPEG', exif=exif)
+
+    upload = stage_profile_picture(SimpleUploadedFile('phone.jpg', buffer.getvalue()), patient.user, 'patient')
+    name = process_profile_picture(upload)
+
+    patient.refresh_from_db()
+    assert patient.profile_picture.name == name
+    with default_storage.open(name) as f:
+        picture = Image.open(f)
+        assert max(picture.size) == MAX_PICTURE_SIZE
+        assert not picture.getexif()
+
+
+def _stored_picture(name):
+    buffer = BytesIO()
+    Image.new('RGB', (600, 400), 'green').save(buffer, 'JPEG')
+    name = default_storage.save(name, ContentFile(buffer.getvalue()))
+    generate_thumbnails(name)
+    return name
+
+
+def _picture_files(name):
+    return [path for path in [name, *(thumbnail_name(name, size) for size in THUMBNAIL_SIZES)] if default_storage.exists(path)]
+
+
+@pytest.mark.django_db
+def test_replaced_picture_and_thumbnails_are_deleted(settings, tmp_path, make_patient):
+    settings.MEDIA_ROOT = tmp_path / 'media'
+    settings.UPLOAD_STAGING_DIR = str(tmp_path / 'staging')
+    old = _stored_picture('profile_pics/old.jpg')
+    user = make_patient('replacepatient', profile_picture=old).user
+    buffer = BytesIO()
+    Image.new('RGB', (300, 300), 'blue').save(buffer, 'PNG')
+
+    name = process_profile_picture(stage_profile_picture(SimpleUploadedFile('new.png', buffer.getvalue()), user, 'patient'))
+
+    assert _picture_files(old) == []
+    assert default_storage.exists(name)
+
+
+@pytest.mark.django_db
+def test_doctor_can_clear_their_picture(settings, tmp_path, django_capture_on_commit_callbacks, make_doctor, login):
+    settings.MEDIA_ROOT = tmp_path / 'media'
+    picture = _stored_picture('profile_pics/doctor.jpg')
+    doctor = make_doctor('cleardoctor', first_name='Ann', last_name='Lee', profile_picture=picture)
+    client = login(doctor.user)
+    url = reverse('healthcare:doctor_update_profile')
+
+    assert 'name="profile_picture-clear"' in client.get(url).content.decode()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(url, {
+            'first_name': 'Ann', 'last_name': 'Lee', 'email': 'ann@example.com', 'experience_years': 3,
+            'profile_picture-clear': 'on',
+        })
+
+    assert response.status_code == 302
+    doctor.refresh_from_db()
+    assert not doctor.profile_picture
+    assert _picture_files(picture) == []
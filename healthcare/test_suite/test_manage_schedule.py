@@ -0,0 +1,80 @@
+import datetime
+
+import pytest
+from django.urls import reverse
+
+from healthcare.models import DoctorSchedule
+
+
+@pytest.fixture
+def doctor_client(doctor, login):
+    return login(doctor.user), doctor
+
+
+def week_data(shifts):
+    """POST data for the weekly formset from (day, start, end) shifts"""
+    data = {
+        'shifts-TOTAL_FORMS': len(shifts),
+        'shifts-INITIAL_FORMS': 0,
+        'shifts-MIN_NUM_FORMS': 0,
+        'shifts-MAX_NUM_FORMS': 1000,
+    }
+    for i, (day, start, end) in enumerate(shifts):
+        data.update({
+            f'shifts-{i}-day_of_week': day,
+            f'shifts-{i}-start_time': start,
+            f'shifts-{i}-end_time': end,
+            f'shifts-{i}-is_available': 'on',
+        })
+    return data
+
+
+@pytest.mark.django_db
+def test_week_is_shown_with_one_form_per_free_day(doctor_client):
+    client, doctor = doctor_client
+    DoctorSchedule.objects.create(doctor=doctor, day_of_week='monday', start_time=datetime.time(9), end_time=datetime.time(12))
+    DoctorSchedule.objects.create(doctor=doctor, day_of_week='monday', start_time=datetime.time(14), end_time=datetime.time(18))
+
+    response = client.get(reverse('healthcare:manage_schedule'))
+
+    assert response.status_code == 200
+    week = {day: forms for day, _, forms in response.context['week']}
+    assert len(week['monday']) == 2
+    assert all(len(week[day]) == 1 for day in week if day != 'monday')
+
+
+@pytest.mark.django_db
+def test_whole_week_is_saved_with_split_shifts(doctor_client):
+    client, doctor = doctor_client
+    kept = DoctorSchedule.objects.create(doctor=doctor, day_of_week='monday', start_time=datetime.time(9), end_time=datetime.time(12))
+    DoctorSchedule.objects.create(doctor=doctor, day_of_week='friday', start_time=datetime.time(9), end_time=datetime.time(17))
+
+    response = client.post(reverse('healthcare:manage_schedule'), week_data([
+        ('monday', '09:00', '13:00'),
+        ('monday', '14:00', '18:00'),
+        ('tuesday', '', ''),
+        ('wednesday', '10:00', '16:00'),
+    ]))
+
+    assert response.status_code == 302
+    assert list(DoctorSchedule.objects.filter(doctor=doctor).values_list('day_of_week', 'start_time', 'end_time')) == [
+        ('monday', datetime.time(9), datetime.time(13)),
+        ('monday', datetime.time(14), datetime.time(18)),
+        ('wednesday', datetime.time(10), datetime.time(16)),
+    ]
+    # Edited in place by the upsert
+    assert DoctorSchedule.objects.get(day_of_week='monday', start_time=datetime.time(9)).pk == kept.pk
+
+
+@pytest.mark.django_db
+def test_overlapping_shifts_are_rejected(doctor_client):
+    client, doctor = doctor_client
+
+    response = client.post(reverse('healthcare:manage_schedule'), week_data([
+        ('monday', '09:00', '13:00'),
+        ('monday', '12:00', '18:00'),
+    ]))
+
+    assert response.status_code == 200
+    assert 'Shifts on Monday overlap.' in response.context['formset'].non_form_errors()
+    assert not DoctorSchedule.objects.exists()
@@ -0,0 +1,61 @@
+import datetime
+
+import pytest
+from django.urls import reverse
+
+from healthcare.models import MedicalHistoryEntry, Patient
+
+
+@pytest.fixture
+def doctor_and_patient(doctor, make_patient):
+    return doctor, make_patient(medical_history='Seasonal allergies since childhood')
+
+
+@pytest.mark.django_db
+def test_free_text_history_is_deferred_on_patient_queries(doctor_and_patient, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        patient = Patient.objects.get()
+    assert 'medical_history' in patient.get_deferred_fields()
+
+    with django_assert_num_queries(1):
+        patient = Patient.objects.with_history().get()
+        assert patient.medical_history == 'Seasonal allergies since childhood'
+
+
+@pytest.mark.django_db
+def test_reported_history_becomes_the_first_entry(doctor_and_patient):
+    _, patient = doctor_and_patient
+    entry = patient.history_entries.get()
+    assert entry.entry_type == 'note'
+    assert entry.details == 'Seasonal allergies since childhood'
+
+
+@pytest.mark.django_db
+def test_patients_are_queryable_by_condition(doctor_and_patient):
+    _, patient = doctor_and_patient
+    MedicalHistoryEntry.objects.create(patient=patient, title='Asthma', recorded_on=datetime.date(2024, 3, 1))
+    MedicalHistoryEntry.objects.create(patient=patient, title='Hypertension', recorded_on=datetime.date(2024, 4, 1))
+
+    assert list(Patient.objects.with_condition('asthma')) == [patient]
+    assert not Patient.objects.with_condition('Diabetes').exists()
+
+
+@pytest.mark.django_db
+def test_doctor_adds_entry_and_detail_view_pages_history(doctor_and_patient, login):
+    doctor, patient = doctor_and_patient
+    MedicalHistoryEntry.objects.bulk_create([
+        MedicalHistoryEntry(patient=patient, title=f'Condition {i}', recorded_on=datetime.date(2020, 1, 1) + datetime.timedelta(days=i))
+        for i in range(15)
+    ])
+    client = login(doctor.user)
+
+    response = client.post(reverse('healthcare:add_history_entry', args=[patient.id]), {
+        'entry_type': 'allergy', 'title': 'Penicillin', 'recorded_on': '2024-05-01',
+    })
+    assert response.status_code == 302
+    assert patient.history_entries.filter(entry_type='allergy', title='Penicillin').exists()
+
+    response = client.get(reverse('healthcare:view_patient', args=[patient.id]), {'history_page': 2})
+    history = response.context['history']
+    assert history.paginator.count == 17
+    assert len(history.object_list) == 7
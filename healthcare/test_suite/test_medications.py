@@ -0,0 +1,101 @@
+import datetime
+
+import pytest
+from django.urls import reverse
+
+from healthcare.forms import PrescriptionForm
+from healthcare.medications import (
+    UNCHECKED_WARNING, MedicationIndex, active_days, check_prescription, load_medications, normalize_name,
+)
+from healthcare.models import Appointment, Medication, MedicationInteraction, Prescription
+
+
+@pytest.fixture
+def doctor_and_patient(doctor, patient):
+    load_medications()
+    Appointment.objects.create(patient=patient, doctor=doctor, appointment_date=datetime.date(2031, 1, 6), appointment_time=datetime.time(10))
+    return doctor, patient
+
+
+def prescription_data(patient, medication_name, **extra):
+    return {
+        'patient': patient.pk, 'medication_name': medication_name,
+        'dosage': '1 tablet', 'frequency': 'Daily', 'duration': '30 days', **extra,
+    }
+
+
+def test_names_are_normalized_and_completed_by_prefix():
+    assert normalize_name('Amoxicillin 500mg Capsules') == 'amoxicillin'
+    assert normalize_name('Hydrocortisone 0.5 % cream') == 'hydrocortisone'
+    assert normalize_name('Hydrocortisone 1%') == 'hydrocortisone'
+    index = MedicationIndex(
+        [(1, 'Warfarin', 'Anticoagulant', ['Coumadin']), (2, 'Aspirin', 'NSAID', []), (3, 'Atenolol', 'Beta blocker', [])],
+        [(1, 2, 'major', 'Bleeding risk.')],
+    )
+
+    assert index.resolve('Coumadin 5 mg tablets') == 1
+    assert index.resolve('Metoprolol') is None
+    assert index.interaction(2, 1) == ('major', 'Bleeding risk.')
+    assert index.autocomplete('A') == [('Aspirin', 'NSAID'), ('Atenolol', 'Beta blocker')]
+    assert index.autocomplete('cou') == [('Warfarin', 'Anticoagulant')]
+
+
+def test_prescription_durations():
+    assert active_days('10 days') == 10
+    assert active_days('2 weeks') == 14
+    assert active_days('Ongoing') is None
+
+
+def test_missing_reference_data_is_a_warning():
+    assert check_prescription(None, [], MedicationIndex([], [])) == [UNCHECKED_WARNING]
+
+
+@pytest.mark.django_db
+def test_loading_the_dataset_twice_updates_in_place():
+    # The migrations already loaded it
+    assert Medication.objects.exists()
+    medications, interactions = load_medications()
+    assert Medication.objects.count() == medications
+    load_medications()
+    assert Medication.objects.count() == medications
+    assert MedicationInteraction.objects.count() == interactions
+
+
+@pytest.mark.django_db
+def test_interaction_blocks_until_acknowledged(doctor_and_patient):
+    doctor, patient = doctor_and_patient
+    Prescription.objects.create(doctor=doctor, patient=patient, medication_name='Warfarin 5mg', dosage='1', frequency='Daily', duration='Ongoing')
+
+    form = PrescriptionForm(prescription_data(patient, 'Aspirin 81mg'), doctor=doctor)
+    assert not form.is_valid()
+    assert form.warnings[0][0] == 'major'
+    assert 'interaction with Warfarin' in form.non_field_errors()[0]
+
+    form = PrescriptionForm(prescription_data(patient, 'Aspirin 81mg', acknowledge_warnings='on'), doctor=doctor)
+    assert form.is_valid()
+    prescription = form.save(commit=False)
+    assert prescription.medication.name == 'Aspirin'
+
+
+@pytest.mark.django_db
+def test_duplicates_and_finished_prescriptions(doctor_and_patient):
+    doctor, patient = doctor_and_patient
+    finished = Prescription.objects.create(doctor=doctor, patient=patient, medication_name='Ibuprofen', dosage='1', frequency='Daily', duration='5 days')
+    Prescription.objects.filter(pk=finished.pk).update(created_at=finished.created_at - datetime.timedelta(days=30))
+    Prescription.objects.create(doctor=doctor, patient=patient, medication_name='Motrin 400 mg', dosage='1', frequency='Daily', duration='7 days')
+
+    form = PrescriptionForm(prescription_data(patient, 'Ibuprofen'), doctor=doctor)
+    assert not form.is_valid()
+    assert [severity for severity, _ in form.warnings] == ['major']
+    assert form.warnings[0][1].startswith('Duplicate: Ibuprofen')
+
+    assert PrescriptionForm(prescription_data(patient, 'Acetaminophen'), doctor=doctor).is_valid()
+
+
+@pytest.mark.django_db
+def test_autocomplete_endpoint(doctor_and_patient, login):
+    client = login(doctor_and_patient[0].user)
+
+    response = client.get(reverse('healthcare:medication_autocomplete_api'), {'q': 'warf'})
+
+    assert response.json() == {'results': [{'name': 'Warfarin', 'drug_class': 'Anticoagulant'}]}
@@ -0,0 +1,164 @@
+import datetime
+import json
+
+import pytest
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+
+from healthcare.models import Appointment, DoctorSettings, Notification
+from healthcare.notifications import (
+    BaseBackend, check_notification_backends, dispatch_notifications, queue_appointment_reminders,
+)
+
+NOW = timezone.make_aware(datetime.datetime(2025, 3, 10, 9, 0))
+
+
+class TransactionCheckingBackend(BaseBackend):
+    """Records whether each message was sent inside a transaction, and what the outbox said about it"""
+
+    sends = []
+
+    def send(self, notification):
+        status = Notification.objects.values_list('status', flat=True).get(pk=notification.pk)
+        self.sends.append((connection.in_atomic_block, status))
+
+
+@pytest.fixture
+def file_backend(tmp_path):
+    path = tmp_path / 'notifications.log'
+    with override_settings(
+        NOTIFICATION_BACKENDS={
+            'email': 'healthcare.notifications.FileBackend',
+            'sms': 'healthcare.notifications.FileBackend',
+        },
+        NOTIFICATION_FILE_PATH=str(path),
+        NOTIFICATION_RATE_LIMITS={},
+    ):
+        yield path
+
+
+@pytest.fixture
+def doctor_with_patient(make_doctor, make_patient):
+    doctor = make_doctor('reminddoctor', first_name='Ann', last_name='Lee')
+    patient = make_patient('remindpatient', first_name='Bob', email='bob@example.com', phone='555-0100')
+    return doctor, patient
+
+
+def book(doctor, patient, when, status='confirmed'):
+    local = timezone.localtime(when)
+    return Appointment.objects.create(
+        patient=patient, doctor=doctor, appointment_date=local.date(), appointment_time=local.time(), status=status,
+    )
+
+
+@pytest.mark.django_db
+def test_reminders_are_queued_for_the_window_once(doctor_with_patient):
+    doctor, patient = doctor_with_patient
+    due = book(doctor, patient, NOW + datetime.timedelta(hours=3))
+    book(doctor, patient, NOW + datetime.timedelta(hours=30))
+    book(doctor, patient, NOW + datetime.timedelta(hours=4), status='cancelled')
+    book(doctor, patient, NOW - datetime.timedelta(hours=1))
+
+    assert queue_appointment_reminders(now=NOW, batch_size=2) == 1
+    # Overlapping runs don't queue the reminder again
+    assert queue_appointment_reminders(now=NOW + datetime.timedelta(minutes=5)) == 0
+
+    reminder = Notification.objects.get()
+    assert reminder.appointment == due
+    assert reminder.channel == 'email'
+    assert reminder.destination == 'bob@example.com'
+
+
+@pytest.mark.django_db
+def test_reminders_follow_doctor_settings(doctor_with_patient):
+    doctor, patient = doctor_with_patient
+    settings = DoctorSettings.objects.create(doctor=doctor, email_notifications=False, sms_notifications=True)
+    book(doctor, patient, NOW + datetime.timedelta(hours=3))
+
+    queue_appointment_reminders(now=NOW)
+    assert list(Notification.objects.values_list('channel', 'destination')) == [('sms', '555-0100')]
+
+    settings.appointment_reminders = False
+    settings.save()
+    Notification.objects.all().delete()
+    assert queue_appointment_reminders(now=NOW) == 0
+
+
+@pytest.mark.django_db
+def test_dispatch_sends_due_notifications(doctor_with_patient, file_backend):
+    doctor, patient = doctor_with_patient
+    DoctorSettings.objects.create(doctor=doctor, sms_notifications=True)
+    book(doctor, patient, NOW + datetime.timedelta(hours=3))
+    queue_appointment_reminders(now=NOW)
+
+    stats = dispatch_notifications(now=NOW)
+
+    assert stats == {'sent': 2, 'retrying': 0, 'failed': 0}
+    lines = [json.loads(line) for line in file_backend.read_text().splitlines()]
+    assert sorted(line['channel'] for line in lines) == ['email', 'sms']
+    assert not Notification.objects.exclude(status='sent').exists()
+
+
+@pytest.mark.django_db
+def test_failed_sends_are_retried_with_backoff(doctor_with_patient, file_backend):
+    doctor, patient = doctor_with_patient
+    book(doctor, patient, NOW + datetime.timedelta(hours=3))
+    queue_appointment_reminders(now=NOW)
+
+    # The log file's directory doesn't exist, so every send fails
+    with override_settings(NOTIFICATION_FILE_PATH=str(file_backend.parent / 'missing' / 'log'), NOTIFICATION_MAX_ATTEMPTS=2):
+        assert dispatch_notifications(now=NOW) == {'sent': 0, 'retrying': 1, 'failed': 0}
+        reminder = Notification.objects.get()
+        assert reminder.status == 'pending'
+        assert reminder.send_after == NOW + datetime.timedelta(minutes=1)
+
+        # Not due again until the backoff has passed
+        assert dispatch_notifications(now=NOW)['retrying'] == 0
+        assert dispatch_notifications(now=NOW + datetime.timedelta(minutes=1))['failed'] == 1
+    assert Notification.objects.get().status == 'failed'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_messages_are_claimed_and_then_sent_outside_a_transaction(doctor_with_patient):
+    doctor, patient = doctor_with_patient
+    DoctorSettings.objects.create(doctor=doctor, sms_notifications=True)
+    book(doctor, patient, NOW + datetime.timedelta(hours=3))
+    queue_appointment_reminders(now=NOW)
+    TransactionCheckingBackend.sends = []
+
+    backend = 'healthcare.test_suite.test_notifications.TransactionCheckingBackend'
+    with override_settings(NOTIFICATION_BACKENDS={'email': backend, 'sms': backend}, NOTIFICATION_RATE_LIMITS={'sms': 1000}):
+        assert dispatch_notifications(now=NOW)['sent'] == 2
+
+    assert TransactionCheckingBackend.sends == [(False, 'sending'), (False, 'sending')]
+    assert set(Notification.objects.values_list('status', flat=True)) == {'sent'}
+
+
+@pytest.mark.django_db
+def test_abandoned_claims_are_sent_again(doctor_with_patient, file_backend):
+    doctor, patient = doctor_with_patient
+    book(doctor, patient, NOW + datetime.timedelta(hours=3))
+    queue_appointment_reminders(now=NOW)
+    Notification.objects.update(status='sending', claimed_at=timezone.now() - datetime.timedelta(minutes=5))
+
+    # Still held by the dispatcher that claimed it
+    assert dispatch_notifications(now=NOW)['sent'] == 0
+    with override_settings(NOTIFICATION_CLAIM_TIMEOUT_MINUTES=1):
+        assert dispatch_notifications(now=NOW)['sent'] == 1
+    assert Notification.objects.get().status == 'sent'
+
+
+@pytest.mark.django_db
+def test_messages_of_a_channel_without_a_backend_stay_queued(doctor_with_patient, file_backend, settings):
+    doctor, patient = doctor_with_patient
+    DoctorSettings.objects.create(doctor=doctor, sms_notifications=True)
+    book(doctor, patient, NOW + datetime.timedelta(hours=3))
+    queue_appointment_reminders(now=NOW)
+    assert check_notification_backends() == []
+
+    settings.NOTIFICATION_BACKENDS = {'email': 'healthcare.notifications.FileBackend', 'sms': ''}
+    assert [warning.id for warning in check_notification_backends()] == ['healthcare.W001']
+
+    assert dispatch_notifications(now=NOW)['sent'] == 1
+    assert dict(Notification.objects.values_list('channel', 'status')) == {'email': 'sent', 'sms': 'pending'}
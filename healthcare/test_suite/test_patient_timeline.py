@@ -0,0 +1,75 @@
+import datetime
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from healthcare.models import Appointment, Doctor, MedicalHistoryEntry, Patient, Prescription
+from healthcare.timeline import patient_timeline
+
+
+@pytest.fixture
+def patient_with_history(make_doctor, patient):
+    doctor = make_doctor('timelinedoctor', first_name='Ann', last_name='Lee')
+    MedicalHistoryEntry.objects.create(patient=patient, title='Asthma', recorded_on=datetime.date(2020, 1, 1))
+    # Recorded on the day of the first appointment, so it sorts just below it
+    MedicalHistoryEntry.objects.create(patient=patient, entry_type='allergy', title='Penicillin', recorded_on=datetime.date(2024, 1, 1))
+
+    start = datetime.date(2024, 1, 1)
+    for day in range(12):
+        Appointment.objects.create(
+            patient=patient, doctor=doctor, appointment_date=start + datetime.timedelta(days=day), appointment_time=datetime.time(9),
+        )
+    for day in range(8):
+        prescription = Prescription.objects.create(
+            patient=patient, doctor=doctor, medication_name=f'Medication {day}', dosage='10mg', frequency='Daily', duration='7 days',
+        )
+        # Two prescriptions share each appointment's timestamp, so pages have to break ties
+        Prescription.objects.filter(pk=prescription.pk).update(
+            created_at=timezone.make_aware(datetime.datetime.combine(start + datetime.timedelta(days=day // 2), datetime.time(9))),
+        )
+    return Patient.objects.select_related('user').get(pk=patient.pk)
+
+
+@pytest.mark.django_db
+def test_pages_merge_every_event_once_newest_first(patient_with_history, django_assert_num_queries):
+    patient = patient_with_history
+    seen = []
+    cursor = None
+    while True:
+        # One query per source, whichever page it is
+        with django_assert_num_queries(3):
+            events, cursor = patient_timeline(patient, cursor, limit=5)
+        seen.extend(events)
+        if cursor is None:
+            break
+
+    assert len(seen) == 12 + 8 + 2
+    assert len({(event['type'], event['id']) for event in seen}) == len(seen)
+    timestamps = [datetime.datetime.fromisoformat(event['timestamp']) for event in seen]
+    assert timestamps == sorted(timestamps, reverse=True)
+    assert seen[-1]['title'] == 'Condition: Asthma'
+    assert seen[0]['title'] == 'Appointment with Dr. Ann Lee'
+
+
+@pytest.mark.django_db
+def test_timeline_api_pages_with_cursor(patient_with_history, login):
+    client = login(Doctor.objects.get().user)
+    url = reverse('healthcare:patient_timeline_api', args=[patient_with_history.id])
+
+    first = client.get(url, {'limit': 15}).json()
+    second = client.get(url, {'limit': 15, 'cursor': first['next_cursor']}).json()
+
+    assert len(first['events']) == 15
+    assert len(second['events']) == 7
+    assert second['next_cursor'] is None
+    assert client.get(url, {'cursor': 'not-a-cursor'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_other_patients_cannot_read_the_timeline(patient_with_history, make_patient, login):
+    client = login(make_patient('otherpatient').user)
+
+    response = client.get(reverse('healthcare:patient_timeline_api', args=[patient_with_history.id]))
+
+    assert response.status_code == 403
@@ -0,0 +1,106 @@
+import datetime
+
+import pytest
+from django.urls import reverse
+
+from healthcare.models import Appointment, AppointmentSeries, DoctorSchedule, TimeOffRequest
+from healthcare import scheduling
+from healthcare.scheduling import book_series, expand_series
+
+MONDAY = datetime.date(2031, 1, 6)
+TEN = datetime.time(10, 0)
+
+
+def test_monthly_series_skips_short_months():
+    series = AppointmentSeries(
+        frequency='monthly', interval=1, start_date=datetime.date(2031, 1, 31), appointment_time=TEN, count=3,
+    )
+    assert expand_series(series) == [datetime.date(2031, 1, 31), datetime.date(2031, 3, 31), datetime.date(2031, 5, 31)]
+
+
+def test_weekly_series_stops_at_until():
+    series = AppointmentSeries(
+        frequency='weekly', interval=2, start_date=MONDAY, appointment_time=TEN, until=MONDAY + datetime.timedelta(weeks=5),
+    )
+    assert expand_series(series) == [MONDAY, MONDAY + datetime.timedelta(weeks=2), MONDAY + datetime.timedelta(weeks=4)]
+
+
+@pytest.mark.django_db
+def test_book_series_skips_and_reports_conflicts(doctor, patient, make_patient, django_assert_max_num_queries):
+    DoctorSchedule.objects.create(doctor=doctor, day_of_week='monday', start_time=datetime.time(9), end_time=datetime.time(17))
+    TimeOffRequest.objects.create(
+        doctor=doctor, start_date=MONDAY + datetime.timedelta(weeks=2), end_date=MONDAY + datetime.timedelta(weeks=2, days=4), status='approved',
+    )
+    other = make_patient('otherpatient')
+    Appointment.objects.create(patient=other, doctor=doctor, appointment_date=MONDAY + datetime.timedelta(weeks=1), appointment_time=TEN)
+
+    series = AppointmentSeries(patient=patient, doctor=doctor, frequency='weekly', start_date=MONDAY, appointment_time=TEN, count=20)
+    # Four conflict queries, the series insert, the bulk insert and the
+    # doctor-patient refresh, whatever the count
+    with django_assert_max_num_queries(10):
+        appointments, conflicts = book_series(series)
+
+    assert len(appointments) == 18
+    assert set(conflicts) == {MONDAY + datetime.timedelta(weeks=1), MONDAY + datetime.timedelta(weeks=2)}
+    assert series.appointments.count() == 18
+
+
+@pytest.mark.django_db
+def test_slots_booked_concurrently_are_reported_as_conflicts(
+    doctor, patient, make_patient, monkeypatch, django_capture_on_commit_callbacks,
+):
+    other = make_patient('racingpatient')
+    find_slot_conflicts = scheduling.find_slot_conflicts
+
+    def find_then_race(*args, **kwargs):
+        conflicts = find_slot_conflicts(*args, **kwargs)
+        # Another booking takes the second week after the first check
+        if not Appointment.objects.filter(patient=other).exists():
+            Appointment.objects.create(
+                patient=other, doctor=doctor, appointment_date=MONDAY + datetime.timedelta(weeks=1), appointment_time=TEN,
+            )
+        return conflicts
+
+    published = []
+    monkeypatch.setattr(scheduling, 'find_slot_conflicts', find_then_race)
+    monkeypatch.setattr('healthcare.events.publish_appointment_event', lambda appointment, event_type: published.append(
+        (appointment.appointment_date, event_type)
+    ))
+
+    series = AppointmentSeries(patient=patient, doctor=doctor, frequency='weekly', start_date=MONDAY, appointment_time=TEN, count=3)
+    with django_capture_on_commit_callbacks(execute=True):
+        appointments, conflicts = book_series(series)
+
+    assert list(conflicts) == [MONDAY + datetime.timedelta(weeks=1)]
+    assert [appointment.appointment_date for appointment in appointments] == [MONDAY, MONDAY + datetime.timedelta(weeks=2)]
+    assert AppointmentSeries.objects.get().appointments.count() == 2
+    assert published == [(MONDAY, 'appointment.created'), (MONDAY + datetime.timedelta(weeks=2), 'appointment.created')]
+
+
+@pytest.mark.django_db
+def test_series_outside_working_hours_is_not_saved(doctor, patient):
+    DoctorSchedule.objects.create(doctor=doctor, day_of_week='tuesday', start_time=datetime.time(9), end_time=datetime.time(17))
+
+    series = AppointmentSeries(patient=patient, doctor=doctor, frequency='weekly', start_date=MONDAY, appointment_time=TEN, count=4)
+    appointments, conflicts = book_series(series)
+
+    assert appointments == []
+    assert len(conflicts) == 4
+    assert not AppointmentSeries.objects.exists()
+
+
+@pytest.mark.django_db
+def test_patient_books_recurring_appointments(doctor, patient, login):
+    client = login(patient.user)
+
+    response = client.post(reverse('healthcare:book_recurring_appointment'), {
+        'doctor': doctor.pk,
+        'frequency': 'monthly',
+        'interval': 1,
+        'start_date': MONDAY.isoformat(),
+        'appointment_time': '10:00',
+        'count': 6,
+    })
+
+    assert response.status_code == 302
+    assert Appointment.objects.filter(patient=patient, doctor=doctor, series__isnull=False).count() == 6
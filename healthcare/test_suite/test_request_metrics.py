@@ -0,0 +1,78 @@
+import logging
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib.auth.models import User
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from healthcare.metrics import RequestMetricsMiddleware, prometheus_text, registry
+
+
+@pytest.fixture
+def staff_client():
+    registry.reset()
+    User.objects.create_user(username='metricsadmin', password='testpassword123', is_staff=True)
+    client = Client()
+    client.login(username='metricsadmin', password='testpassword123')
+    yield client
+    registry.reset()
+
+
+@pytest.mark.django_db
+def test_requests_are_recorded_per_url_name(staff_client):
+    staff_client.get(reverse('healthcare:admin_capacity'))
+    staff_client.get(reverse('healthcare:admin_capacity'))
+
+    summary = dict(registry.snapshot())['healthcare:admin_capacity']
+    assert summary['count'] == 2
+    assert summary['queries']['p50'] > 0
+    assert summary['template_ms']['max'] > 0
+    assert summary['total_ms']['p99'] >= summary['db_ms']['p99']
+
+    text = prometheus_text()
+    assert 'healthcare_request_latency_seconds_count{view="healthcare:admin_capacity"} 2' in text
+    assert 'healthcare_request_queries{view="healthcare:admin_capacity",quantile="0.95"}' in text
+
+
+@pytest.mark.django_db
+def test_query_budget_violations_are_logged(staff_client, settings, caplog):
+    settings.QUERY_BUDGETS = {'healthcare:admin_capacity': 1}
+    with caplog.at_level(logging.WARNING, logger='healthcare.metrics'):
+        staff_client.get(reverse('healthcare:admin_capacity'))
+
+    assert 'over its budget of 1' in caplog.text
+    assert dict(registry.snapshot())['healthcare:admin_capacity']['budget_violations'] == 1
+
+
+@pytest.mark.django_db
+def test_prometheus_endpoint_needs_the_token_or_staff(staff_client, settings):
+    url = reverse('healthcare:prometheus_metrics')
+    assert staff_client.get(url).status_code == 200
+    assert Client().get(url).status_code == 403
+
+    settings.METRICS_TOKEN = 'scrape-me'
+    assert Client().get(url, headers={'Authorization': 'Bearer scrape-me'}).status_code == 200
+    assert Client().get(url, headers={'Authorization': 'Bearer wrong'}).status_code == 403
+
+
+@pytest.mark.django_db
+def test_async_requests_are_recorded_without_leaving_the_async_path(staff_client):
+    async def get_response(request):
+        pass
+
+    assert iscoroutinefunction(RequestMetricsMiddleware(get_response))
+    assert not iscoroutinefunction(RequestMetricsMiddleware(lambda request: None))
+
+    user = User.objects.get(username='metricsadmin')
+
+    async def get_stats():
+        client = AsyncClient()
+        await client.aforce_login(user)
+        return await client.get(reverse('healthcare:dashboard_stats_api'))
+
+    # The staff user is neither a doctor nor a patient, which the view looks up
+    assert async_to_sync(get_stats)().status_code == 404
+    summary = dict(registry.snapshot())['healthcare:dashboard_stats_api']
+    assert summary['count'] == 1
+    assert summary['queries']['max'] > 0
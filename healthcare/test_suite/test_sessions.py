@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from healthcare.sessions import check_session_cache, purge_expired_sessions
+
+
+def _store_session(expires_in):
+    store = SessionStore()
+    store['data'] = 'x'
+    store.set_expiry(expires_in)
+    store.create()
+    return store.session_key
+
+
+@pytest.mark.django_db
+def test_purge_deletes_expired_sessions_in_batches(settings):
+    settings.SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+    for _ in range(5):
+        _store_session(60)
+    live = _store_session(3600)
+    Session.objects.exclude(pk=live).update(expire_date=timezone.now() - timedelta(minutes=1))
+
+    assert purge_expired_sessions(batch_size=2) == 5
+    assert list(Session.objects.values_list('pk', flat=True)) == [live]
+
+
+@pytest.mark.django_db
+def test_purge_has_nothing_to_do_for_cookie_sessions(settings):
+    settings.SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+
+    assert purge_expired_sessions() is None
+    call_command('purge_sessions')
+
+
+@pytest.mark.django_db
+def test_cached_sessions_skip_the_session_table_on_page_views(settings):
+    settings.SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    user = User.objects.create_user(username='sessionadmin', is_staff=True)
+    client = Client()
+    client.force_login(user)
+
+    queries = []
+    with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+        response = client.get(reverse('healthcare:dashboard'))
+
+    assert response.status_code == 302
+    assert queries and not [sql for sql in queries if Session._meta.db_table in sql]
+
+
+def test_cached_sessions_need_a_shared_cache(settings):
+    settings.SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    assert [error.id for error in check_session_cache()] == ['healthcare.E001']
+
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+    assert check_session_cache() == []
+    settings.SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    assert check_session_cache() == []
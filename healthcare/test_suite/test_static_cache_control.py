@@ -0,0 +1,23 @@
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from healthcare.middleware import StaticCacheControlMiddleware
+
+
+def test_hashed_static_files_are_cached_on_both_request_paths(settings):
+    settings.STATIC_URL = '/static/'
+
+    async def aget_response(request):
+        return HttpResponse()
+
+    sync_middleware = StaticCacheControlMiddleware(lambda request: HttpResponse())
+    async_middleware = StaticCacheControlMiddleware(aget_response)
+    assert not iscoroutinefunction(sync_middleware)
+    assert iscoroutinefunction(async_middleware)
+
+    factory = RequestFactory()
+    for call in (sync_middleware, async_to_sync(async_middleware)):
+        hashed = call(factory.get('/static/css/user-reports.55e7cbb9ba48.css'))
+        assert hashed['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert not call(factory.get('/static/css/user-reports.css')).has_header('Cache-Control')
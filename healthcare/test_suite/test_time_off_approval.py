@@ -0,0 +1,91 @@
+import datetime
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from healthcare.models import Appointment, DoctorSchedule, Notification, TimeOffRequest
+from healthcare.scheduling import approve_time_off
+
+MONDAY = datetime.date(2031, 1, 6)
+
+
+@pytest.fixture
+def leave(make_doctor, make_patient):
+    doctor = make_doctor('leaving', specialization='Cardiology')
+    patient = make_patient('leavepatient', email='leavepatient@example.com')
+    for day in range(3):
+        for hour in (9, 10):
+            Appointment.objects.create(
+                patient=patient, doctor=doctor, appointment_date=MONDAY + datetime.timedelta(days=day),
+                appointment_time=datetime.time(hour), status='confirmed',
+            )
+    time_off = TimeOffRequest.objects.create(doctor=doctor, start_date=MONDAY, end_date=MONDAY + datetime.timedelta(days=2))
+    return doctor, patient, time_off
+
+
+@pytest.mark.django_db
+def test_approval_reassigns_to_free_doctors_and_cancels_the_rest(leave, make_doctor, make_patient):
+    doctor, patient, time_off = leave
+    busy = make_doctor('busy', specialization='Cardiology')
+    free = make_doctor('free', specialization='Cardiology')
+    make_doctor('dermatologist', specialization='Dermatology')
+    # "free" only works Mondays and Tuesdays; "busy" is booked at 9:00 on the Monday
+    DoctorSchedule.objects.create(doctor=free, day_of_week='monday', start_time=datetime.time(8), end_time=datetime.time(17))
+    DoctorSchedule.objects.create(doctor=free, day_of_week='tuesday', start_time=datetime.time(8), end_time=datetime.time(17))
+    DoctorSchedule.objects.create(doctor=busy, day_of_week='monday', start_time=datetime.time(8), end_time=datetime.time(17))
+    other = make_patient('other', email='other@example.com')
+    Appointment.objects.create(patient=other, doctor=busy, appointment_date=MONDAY, appointment_time=datetime.time(9))
+
+    reassigned, cancelled = approve_time_off(time_off)
+
+    assert len(reassigned) == 4
+    assert len(cancelled) == 2
+    assert not Appointment.objects.filter(doctor=doctor).exclude(status='cancelled').exists()
+    assert Appointment.objects.filter(doctor=free).count() == 3
+    assert Appointment.objects.filter(doctor=busy).count() == 2
+    assert set(Appointment.objects.filter(status='cancelled').values_list('appointment_date', flat=True)) == {MONDAY + datetime.timedelta(days=2)}
+    time_off.refresh_from_db()
+    assert time_off.status == 'approved'
+    assert Notification.objects.filter(kind='appointment_reassigned').count() == 4
+    assert Notification.objects.filter(kind='appointment_cancelled').count() == 2
+
+
+@pytest.mark.django_db
+def test_approval_query_count_does_not_grow_with_appointments(leave, make_doctor, django_assert_max_num_queries):
+    doctor, patient, time_off = leave
+    make_doctor('colleague', specialization='Cardiology')
+
+    with django_assert_max_num_queries(15):
+        reassigned, cancelled = approve_time_off(time_off, resolution='cancel')
+    assert reassigned == []
+    assert len(cancelled) == 6
+
+
+@pytest.mark.django_db
+def test_a_request_is_only_approved_once(leave):
+    doctor, patient, time_off = leave
+    # Two admins opened the same pending request
+    second_view = TimeOffRequest.objects.get(pk=time_off.pk)
+
+    assert approve_time_off(time_off, resolution='cancel') is not None
+    assert approve_time_off(second_view, resolution='cancel') is None
+    assert Notification.objects.filter(kind='appointment_cancelled').count() == 6
+
+
+@pytest.mark.django_db
+def test_admin_reviews_time_off(leave, login):
+    doctor, patient, time_off = leave
+    client = login(User.objects.create_user(username='staff', is_staff=True))
+
+    response = client.get(reverse('healthcare:admin_time_off_requests'))
+    assert response.status_code == 200
+    assert response.context['time_off_requests'][0].affected_count == 6
+
+    response = client.post(
+        reverse('healthcare:admin_review_time_off', args=[time_off.id]),
+        {'action': 'approve', 'resolution': 'reassign'},
+    )
+    assert response.status_code == 302
+    # No other cardiologist, so everything is cancelled
+    assert Appointment.objects.filter(status='cancelled').count() == 6
@@ -0,0 +1,176 @@
+import datetime
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from healthcare.caching import get_data_versions
+from healthcare.models import Appointment, Notification, WaitlistEntry
+from healthcare.notifications import queue_appointment_reminders
+from healthcare.waitlist import accept_offer, expire_offers
+
+DAY = datetime.date(2031, 1, 6)
+TEN = datetime.time(10, 0)
+
+
+@pytest.fixture
+def cancellable_appointment(make_doctor, make_patient):
+    doctor = make_doctor('waitdoctor', specialization='Cardiology')
+    appointment = Appointment.objects.create(
+        patient=make_patient('booked', email='booked@example.com'), doctor=doctor, appointment_date=DAY, appointment_time=TEN,
+    )
+    return doctor, appointment
+
+
+def waitlist(patient, doctor=None, specialization='', priority=0, earliest=DAY, latest=DAY):
+    return WaitlistEntry.objects.create(
+        patient=patient, doctor=doctor, specialization=specialization, priority=priority,
+        earliest_date=earliest, latest_date=latest,
+    )
+
+
+def cancel(appointment, capture):
+    with capture(execute=True):
+        appointment.status = 'cancelled'
+        appointment.save()
+
+
+@pytest.mark.django_db
+def test_cancelled_slot_goes_to_highest_priority_then_earliest(
+    cancellable_appointment, django_capture_on_commit_callbacks, make_doctor, make_patient,
+):
+    doctor, appointment = cancellable_appointment
+    waitlist(make_patient('other_doctor'), doctor=make_doctor('otherdoctor'), priority=2)
+    waitlist(make_patient('wrong_dates'), doctor=doctor, priority=2, earliest=DAY + datetime.timedelta(days=1), latest=DAY + datetime.timedelta(days=5))
+    waitlist(make_patient('routine'), doctor=doctor)
+    first_soon = waitlist(make_patient('soon', email='soon@example.com'), specialization='cardiology', priority=1)
+    waitlist(make_patient('later_soon'), priority=1)
+
+    cancel(appointment, django_capture_on_commit_callbacks)
+
+    first_soon.refresh_from_db()
+    assert first_soon.status == 'offered'
+    assert first_soon.offered_appointment == appointment
+    assert WaitlistEntry.objects.filter(status='offered').count() == 1
+    notification = Notification.objects.get(kind='waitlist_offer')
+    assert notification.recipient == first_soon.patient.user
+    assert notification.destination == 'soon@example.com'
+
+
+@pytest.mark.django_db
+def test_accepting_an_offer_books_the_slot(cancellable_appointment, django_capture_on_commit_callbacks, make_patient, login):
+    doctor, appointment = cancellable_appointment
+    patient = make_patient('waiting')
+    entry = waitlist(patient, doctor=doctor)
+    cancel(appointment, django_capture_on_commit_callbacks)
+
+    client = login(patient.user)
+    response = client.post(reverse('healthcare:waitlist_respond', args=[entry.id]), {'action': 'accept'})
+
+    assert response.status_code == 302
+    appointment.refresh_from_db()
+    assert appointment.patient == patient
+    assert appointment.status == 'pending'
+    entry.refresh_from_db()
+    assert entry.status == 'booked'
+
+
+@pytest.mark.django_db
+def test_lapsed_offer_passes_to_next_patient(cancellable_appointment, django_capture_on_commit_callbacks, make_patient):
+    doctor, appointment = cancellable_appointment
+    first = waitlist(make_patient('first'), doctor=doctor)
+    second = waitlist(make_patient('second'), doctor=doctor)
+    cancel(appointment, django_capture_on_commit_callbacks)
+
+    later = timezone.now() + datetime.timedelta(hours=1)
+    assert expire_offers(now=later)['lapsed'] == 1
+
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert first.status == 'waiting'
+    assert second.status == 'offered'
+    # The lapsed offer can't be accepted any more
+    assert accept_offer(first) is None
+
+
+@pytest.mark.django_db
+def test_joining_is_offered_an_open_slot(cancellable_appointment, make_patient, login):
+    doctor, appointment = cancellable_appointment
+    appointment.status = 'cancelled'
+    appointment.save()
+    client = login(make_patient('joining').user)
+
+    response = client.post(reverse('healthcare:waitlist'), {
+        'doctor': doctor.pk,
+        'earliest_date': DAY.isoformat(),
+        'latest_date': (DAY + datetime.timedelta(days=7)).isoformat(),
+    })
+
+    assert response.status_code == 302
+    entry = WaitlistEntry.objects.get(patient__user__username='joining')
+    assert entry.status == 'offered'
+    assert entry.offered_appointment == appointment
+
+
+@pytest.mark.django_db
+def test_cancelling_from_the_dashboard_offers_the_slot(
+    cancellable_appointment, django_capture_on_commit_callbacks, make_patient, login,
+):
+    doctor, appointment = cancellable_appointment
+    entry = waitlist(make_patient('waiting'), doctor=doctor)
+    client = login(appointment.patient.user)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(reverse('healthcare:cancel_appointment', args=[appointment.id]))
+
+    assert response.url == reverse('healthcare:patient_dashboard')
+    entry.refresh_from_db()
+    assert entry.status == 'offered'
+    assert entry.offered_appointment == appointment
+
+
+@pytest.mark.django_db
+def test_only_the_patient_or_doctor_can_cancel(cancellable_appointment, make_patient, login):
+    doctor, appointment = cancellable_appointment
+    client = login(make_patient('stranger').user)
+
+    client.post(reverse('healthcare:cancel_appointment', args=[appointment.id]))
+
+    appointment.refresh_from_db()
+    assert appointment.status == 'pending'
+
+
+@pytest.mark.django_db
+def test_accepting_refreshes_both_patients_dashboards(cancellable_appointment, django_capture_on_commit_callbacks, make_patient):
+    doctor, appointment = cancellable_appointment
+    entry = waitlist(make_patient('waiting'), doctor=doctor)
+    cancel(appointment, django_capture_on_commit_callbacks)
+    users = (appointment.patient.user_id, entry.patient.user_id)
+    before = [get_data_versions(user_id)[1] for user_id in users]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert accept_offer(entry) == appointment
+
+    after = [get_data_versions(user_id)[1] for user_id in users]
+    assert all(old != new for old, new in zip(before, after))
+
+
+@pytest.mark.django_db
+def test_accepting_withdraws_stale_messages_and_reminds_the_new_patient(
+    cancellable_appointment, django_capture_on_commit_callbacks, make_patient,
+):
+    doctor, appointment = cancellable_appointment
+    morning = timezone.make_aware(datetime.datetime.combine(DAY, datetime.time(8, 0)))
+    assert queue_appointment_reminders(now=morning) == 1
+    entry = waitlist(make_patient('waiting', email='waiting@example.com'), doctor=doctor)
+    cancel(appointment, django_capture_on_commit_callbacks)
+
+    accept_offer(entry)
+
+    assert set(Notification.objects.values_list('destination', 'status')) == {
+        ('booked@example.com', 'cancelled'), ('waiting@example.com', 'cancelled'),
+    }
+    # The reminder for the new patient isn't taken for a duplicate of the old one
+    assert queue_appointment_reminders(now=morning) == 1
+    reminder = Notification.objects.get(kind='appointment_reminder', status='pending')
+    assert reminder.recipient == entry.patient.user
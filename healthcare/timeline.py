@@ -0,0 +1,176 @@
+"""
+Patient timeline: appointments, prescriptions and medical history entries in one feed.
+
+The feed is newest first and paginated with a keyset cursor. Every event
+has the sort key (timestamp, type, id), and the cursor is the key of the last
+event on the previous page. Each source runs one query for rows before the
+cursor, in key order and limited to a page, over the patient's indexes. The
+sources are then merged with a heap. A page therefore costs the same however
+many years of history the patient has, unlike OFFSET pagination.
+"""
+
+import base64
+import heapq
+from datetime import datetime, time
+from itertools import islice
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Appointment, MedicalHistoryEntry, Prescription
+
+# Events per page, unless the client asks for fewer
+TIMELINE_PAGE_SIZE = 20
+TIMELINE_MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(key):
+    timestamp, event_type, pk = key
+    raw = f'{timestamp.isoformat()}|{event_type}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Turn a cursor back into the sort key it was made from.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        timestamp, event_type, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        timestamp = datetime.fromisoformat(timestamp)
+        pk = int(pk)
+    except (UnicodeError, TypeError, ValueError) as e:
+        raise ValueError(f'Invalid timeline cursor: {cursor!r}') from e
+    if timezone.is_naive(timestamp):
+        raise ValueError(f'Invalid timeline cursor: {cursor!r}')
+    return timestamp, event_type, pk
+
+
+def _tie_break(event_type, cursor):
+    """
+    Match rows of a source with the same timestamp as the cursor that sort before it.
+
+    Returns:
+        Q: Condition on the row id, or None when no such row can come after the cursor
+    """
+    _, cursor_type, cursor_pk = cursor
+    if event_type < cursor_type:
+        return Q()
+    if event_type == cursor_type:
+        return Q(pk__lt=cursor_pk)
+    return None
+
+
+def _appointment_events(patient, cursor, limit):
+    appointments = Appointment.objects.filter(patient=patient)
+    if cursor:
+        local = timezone.localtime(cursor[0])
+        date, clock = local.date(), local.time()
+        before = Q(appointment_date__lt=date) | Q(appointment_date=date, appointment_time__lt=clock)
+        tie = _tie_break('appointment', cursor)
+        if tie is not None:
+            before |= Q(tie, appointment_date=date, appointment_time=clock)
+        appointments = appointments.filter(before)
+    rows = (
+        appointments
+        .order_by('-appointment_date', '-appointment_time', '-pk')
+        .values(
+            'pk', 'appointment_date', 'appointment_time', 'status', 'reason',
+            'doctor__user__first_name', 'doctor__user__last_name',
+        )[:limit]
+    )
+    statuses = dict(Appointment.STATUS_CHOICES)
+    for row in rows:
+        timestamp = timezone.make_aware(datetime.combine(row['appointment_date'], row['appointment_time']))
+        yield (timestamp, 'appointment', row['pk']), {
+            'title': f"Appointment with Dr. {row['doctor__user__first_name']} {row['doctor__user__last_name']}",
+            'detail': row['reason'],
+            'status': row['status'],
+            'status_display': statuses.get(row['status'], row['status']),
+        }
+
+
+def _prescription_events(patient, cursor, limit):
+    prescriptions = Prescription.objects.filter(patient=patient)
+    if cursor:
+        before = Q(created_at__lt=cursor[0])
+        tie = _tie_break('prescription', cursor)
+        if tie is not None:
+            before |= Q(tie, created_at=cursor[0])
+        prescriptions = prescriptions.filter(before)
+    rows = (
+        prescriptions
+        .order_by('-created_at', '-pk')
+        .values(
+            'pk', 'created_at', 'medication_name', 'dosage', 'frequency', 'duration',
+            'doctor__user__first_name', 'doctor__user__last_name',
+        )[:limit]
+    )
+    for row in rows:
+        yield (row['created_at'], 'prescription', row['pk']), {
+            'title': row['medication_name'],
+            'detail': ', '.join(part for part in (row['dosage'], row['frequency'], row['duration']) if part),
+            'doctor': f"Dr. {row['doctor__user__first_name']} {row['doctor__user__last_name']}",
+        }
+
+
+def _history_events(patient, cursor, limit):
+    entries = MedicalHistoryEntry.objects.filter(patient=patient)
+    if cursor:
+        # Entries are dated, so they sit at midnight on the timeline
+        local = timezone.localtime(cursor[0])
+        if local.time() != time.min:
+            entries = entries.filter(recorded_on__lte=local.date())
+        else:
+            before = Q(recorded_on__lt=local.date())
+            tie = _tie_break('history', cursor)
+            if tie is not None:
+                before |= Q(tie, recorded_on=local.date())
+            entries = entries.filter(before)
+    rows = (
+        entries
+        .order_by('-recorded_on', '-pk')
+        .values('pk', 'recorded_on', 'entry_type', 'title', 'details')[:limit]
+    )
+    entry_types = dict(MedicalHistoryEntry.ENTRY_TYPE_CHOICES)
+    for row in rows:
+        timestamp = timezone.make_aware(datetime.combine(row['recorded_on'], time.min))
+        yield (timestamp, 'history', row['pk']), {
+            'title': f"{entry_types.get(row['entry_type'], row['entry_type'])}: {row['title']}",
+            'detail': row['details'],
+        }
+
+
+TIMELINE_SOURCES = [_appointment_events, _prescription_events, _history_events]
+
+
+def patient_timeline(patient, cursor=None, limit=TIMELINE_PAGE_SIZE):
+    """
+    Get a page of a patient's timeline, newest first.
+
+    Args:
+        patient: The patient
+        cursor: The next_cursor of the previous page, or None for the first page
+        limit: Number of events per page
+
+    Returns:
+        tuple: (list of event dicts, cursor of the next page or None on the last page)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    limit = max(1, min(limit, TIMELINE_MAX_PAGE_SIZE))
+    position = decode_cursor(cursor) if cursor else None
+
+    # Each source yields at most limit + 1 rows, enough to fill the page and see if there's more
+    streams = [source(patient, position, limit + 1) for source in TIMELINE_SOURCES]
+    merged = list(islice(heapq.merge(*streams, key=lambda event: event[0], reverse=True), limit + 1))
+
+    events = [
+        {'type': event_type, 'id': pk, 'timestamp': timestamp.isoformat(), **fields}
+        for (timestamp, event_type, pk), fields in merged[:limit]
+    ]
+    next_cursor = encode_cursor(merged[limit - 1][0]) if len(merged) > limit else None
+    return events, next_cursor
@@ -18,6 +18,10 @@ urlpatterns = [
     path('admin/manage-users/', views.admin_manage_users, name='admin_manage_users'),
     path('admin/view-analytics/', views.admin_view_analytics, name='admin_view_analytics'),
     path('admin/appointments/', views.admin_appointments, name='appointments'),
+    path('admin/capacity/', views.admin_capacity, name='admin_capacity'),
+    path('admin/metrics/', views.admin_metrics, name='admin_metrics'),
+    path('admin/time-off/', views.admin_time_off_requests, name='admin_time_off_requests'),
+    path('admin/time-off/<int:id>/review/', views.admin_review_time_off, name='admin_review_time_off'),
     path('admin/reports/', views.admin_reports, name='admin_reports'),
     path('admin/reports/user/', views.user_reports, name='user_reports'),
     path('admin/reports/appointment/', views.appointment_reports, name='appointment_reports'),
@@ -34,6 +38,7 @@ urlpatterns = [
     path('doctor/add-patient/', views.add_patient, name='add_patient'),
     path('doctor/add-doctor/', views.add_doctor, name='add_doctor'),
     path('doctor/book-appointment/', views.book_appointment, name='book_appointment'),
+    path('doctor/book-recurring-appointment/', views.book_recurring_appointment, name='book_recurring_appointment'),
     path('doctor/view-reports/', views.view_reports, name='view_reports'),
     path('doctor/start-consultation/', views.start_consultation, name='start_consultation'),
     path('doctor/show-appointments/', views.show_appointments, name='show_appointments'),
@@ -51,10 +56,29 @@ urlpatterns = [
     
     # Patient Details
     path('patient/<int:id>/', views.view_patient, name='view_patient'),
+    path('patient/<int:id>/history/add/', views.add_history_entry, name='add_history_entry'),
+    path('patient/waitlist/', views.waitlist, name='waitlist'),
+    path('patient/waitlist/<int:id>/respond/', views.waitlist_respond, name='waitlist_respond'),
+    path('appointment/<int:id>/cancel/', views.cancel_appointment, name='cancel_appointment'),
     
     # Doctor Details
     path('doctor/<int:id>/', views.view_doctor, name='view_doctor'),
     
+    # JSON API
+    path('api/appointments/', views.appointments_api, name='appointments_api'),
+    path('api/dashboard-stats/', views.dashboard_stats_api, name='dashboard_stats_api'),
+    path('api/patients/<int:id>/timeline/', views.patient_timeline_api, name='patient_timeline_api'),
+    path('api/medications/autocomplete/', views.medication_autocomplete_api, name='medication_autocomplete_api'),
+    path('api/doctors/', views.doctor_search_api, name='doctor_search_api'),
+    path('api/doctor/patients/', views.doctor_patients_api, name='doctor_patients_api'),
+    path('metrics/', views.prometheus_metrics, name='prometheus_metrics'),
+    
+    # Live appointment updates (Server-Sent Events)
+    path('events/appointments/', views.appointment_events, name='appointment_events'),
+    
+    # Profile picture uploads
+    path('uploads/<int:id>/status/', views.upload_status, name='upload_status'),
+    
     # CSRF Test
     path('test-csrf/', views.test_csrf, name='test_csrf'),
 ]
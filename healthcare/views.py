@@ -4,10 +4,17 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_protect
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.db import transaction
 from .forms import UserForm, AddressForm, PatientForm, DoctorForm
 from .models import Patient, Doctor, Address, Admin, Appointment, Prescription
+from .caching import cache_dashboard, get_cache_stats
+from .demo import reportable
+from .events import broker
+from .images import delete_picture_files, stage_profile_picture
+import asyncio
+import json
 import logging
 
 from reportlab.lib.pagesizes import letter
@@ -16,78 +23,13 @@ from io import BytesIO
 
 logger = logging.getLogger(__name__)
 
-def create_demo_users():
-    """Create demo users if they don't exist"""
-    try:
-        # Create demo patient user
-        demo_patient_user, created = User.objects.get_or_create(
-            username='demo_patient',
-            defaults={
-                'first_name': 'John',
-                'last_name': 'Doe',
-                'email': 'demo.patient@example.com',
-                'is_staff': False,
-                'is_superuser': False
-            }
-        )
-        if created:
-            demo_patient_user.set_password('demo123')
-            demo_patient_user.save()
-            
-            # Create address for demo patient
-            demo_address = Address.objects.create(
-                line1='123 Demo Street',
-                city='Demo City',
-                state='Demo State',
-                pincode='12345'
-            )
-            
-            # Create patient profile
-            Patient.objects.create(
-                user=demo_patient_user,
-                address=demo_address,
-                date_of_birth='1990-01-01',
-                phone='555-1234',
-                medical_history='Demo medical history for testing purposes'
-            )
-            logger.info('Demo patient user created successfully')
-        
-        # Create demo doctor user
-        demo_doctor_user, created = User.objects.get_or_create(
-            username='demo_doctor',
-            defaults={
-                'first_name': 'Jane',
-                'last_name': 'Smith',
-                'email': 'demo.doctor@example.com',
-                'is_staff': False,
-                'is_superuser': False
-            }
-        )
-        if created:
-            demo_doctor_user.set_password('demo123')
-            demo_doctor_user.save()
-            
-            # Create address for demo doctor
-            demo_doc_address = Address.objects.create(
-                line1='456 Doctor Lane',
-                city='Med City',
-                state='Health State',
-                pincode='67890'
-            )
-            
-            # Create doctor profile
-            Doctor.objects.create(
-                user=demo_doctor_user,
-                address=demo_doc_address,
-                specialization='General Medicine',
-                license_number='DOC12345',
-                experience_years=5,
-                phone='555-DOC1'
-            )
-            logger.info('Demo doctor user created successfully')
-            
-    except Exception as e:
-        logger.error(f'Error creating demo users: {str(e)}')
+def _stage_profile_picture(request, form, user, profile_type):
+    """Hand an uploaded profile picture over to the background image worker"""
+    picture = form.cleaned_data.get('profile_picture')
+    if picture:
+        uploaded_by = request.user if request.user.is_authenticated else user
+        stage_profile_picture(picture, user, profile_type, uploaded_by=uploaded_by)
+        messages.info(request, 'The profile picture is being processed and will appear shortly.')
 
 def signup(request):
     if request.method == 'POST':
@@ -131,11 +73,11 @@ def signup(request):
                     patient = Patient.objects.create(
                         user=user,
                         address=address,
-                        profile_picture=patient_form.cleaned_data.get('profile_picture'),
                         date_of_birth=patient_form.cleaned_data.get('date_of_birth'),
                         phone=patient_form.cleaned_data.get('phone', ''),
                         medical_history=patient_form.cleaned_data.get('medical_history', '')
                     )
+                    _stage_profile_picture(request, patient_form, user, 'patient')
                     messages.success(request, 'Patient account created successfully!')
                     # Log in the user and redirect to patient dashboard
                     login(request, user)
@@ -145,12 +87,12 @@ def signup(request):
                     doctor = Doctor.objects.create(
                         user=user,
                         address=address,
-                        profile_picture=doctor_form.cleaned_data.get('profile_picture'),
                         specialization=doctor_form.cleaned_data.get('specialization'),
                         license_number=doctor_form.cleaned_data.get('license_number'),
                         experience_years=doctor_form.cleaned_data.get('experience_years', 0),
                         phone=doctor_form.cleaned_data.get('phone', '')
                     )
+                    _stage_profile_picture(request, doctor_form, user, 'doctor')
                     messages.success(request, 'Doctor account created successfully!')
                     # Log in the user and redirect to doctor dashboard
                     login(request, user)
@@ -276,46 +218,42 @@ def admin_login_view(request):
     return render(request, 'healthcare/admin_login.html')
 
 def demo_login_view(request, user_type):
-    """Demo login view that simulates login without actual authentication"""
-    create_demo_users()  # Ensure demo users exist
-    
+    """Log in as a demo account; the accounts are created by the setup_demo command, not here"""
+    from django.conf import settings
+    from .demo import DEMO_LOGINS, demo_accounts
+
     if user_type == 'patient':
-        username = 'demo_patient'
         redirect_url = 'healthcare:patient_dashboard'
         user_type_name = 'Patient'
     elif user_type == 'doctor':
-        username = 'demo_doctor'
         redirect_url = 'healthcare:doctor_dashboard'
         user_type_name = 'Doctor'
     else:
         messages.error(request, 'Invalid demo user type.')
         return redirect('healthcare:login')
-    
-    try:
-        # Get the demo user
-        user = User.objects.get(username=username)
-        
-        # Use Django's login function to authenticate the user
-        login(request, user)
-        
-        # Set demo session flag
-        request.session['is_demo_user'] = True
-        request.session['demo_user_type'] = user_type
-        
-        logger.info(f'Demo {user_type} login successful for user: {username}')
-        messages.success(request, f'Demo {user_type_name} mode activated! This is a demonstration account.')
-        
-        return redirect(redirect_url)
-        
-    except User.DoesNotExist:
-        logger.error(f'Demo user {username} not found')
-        messages.error(request, 'Demo user not found. Please contact administrator.')
-        return redirect('healthcare:login')
-    except Exception as e:
-        logger.error(f'Error in demo login: {str(e)}')
-        messages.error(request, 'Demo login failed. Please try again.')
+
+    user_id = demo_accounts().logins.get(user_type)
+    user = User.objects.filter(pk=user_id).first() if user_id else None
+    if user is None:
+        # The cached ids may predate the accounts being set up or recreated
+        user_id = demo_accounts(refresh=True).logins.get(user_type)
+        user = User.objects.filter(pk=user_id).first() if user_id else None
+    if user is None:
+        logger.error(f'Demo user {DEMO_LOGINS[user_type]} not found; run manage.py setup_demo')
+        messages.error(request, 'Demo accounts are not available. Please contact administrator.')
         return redirect('healthcare:login')
 
+    login(request, user)
+
+    # Demo sessions are flagged, so they stay out of the request metrics, and short-lived
+    request.session['is_demo_user'] = True
+    request.session['demo_user_type'] = user_type
+    request.session.set_expiry(getattr(settings, 'DEMO_SESSION_SECONDS', 3600))
+
+    logger.info(f'Demo {user_type} login successful for user: {user.username}')
+    messages.success(request, f'Demo {user_type_name} mode activated! This is a demonstration account.')
+    return redirect(redirect_url)
+
 def logout_view(request):
     # Check if it was a demo session
     is_demo = request.session.get('is_demo_user', False)
@@ -362,9 +300,10 @@ def admin_dashboard(request):
         messages.error(request, 'Admin access required.')
         return redirect('healthcare:dashboard')
     
-    # Get all patients and doctors for admin dashboard
+    # Get all patients, and the doctors from the cached directory
+    from .directory import get_doctor_directory
     patients = Patient.objects.all()
-    doctors = Doctor.objects.all()
+    doctors = get_doctor_directory()
     
     # Get today's appointments count
     from django.utils import timezone
@@ -380,65 +319,84 @@ def admin_dashboard(request):
         'todays_appointments_count': todays_appointments_count
     })
 
+async def _auser(request):
+    """
+    Resolve the logged-in user in an async view.
+
+    request.user is a lazy object that would query the database synchronously
+    (which Django forbids in async code), so it is replaced by the user loaded
+    with request.auser() before templates and context processors see it.
+    """
+    request.user = await request.auser()
+    return request.user
+
+async def _alist(queryset):
+    """Evaluate a queryset asynchronously"""
+    return [obj async for obj in queryset]
+
+def _doctor_appointments(doctor, filter_type, today):
+    """Get a doctor's appointments for the dashboard filter, with patients loaded for display"""
+    appointments = Appointment.objects.filter(doctor=doctor).select_related('patient__user')
+    if filter_type == 'all':
+        # Show all appointments (past and future)
+        return appointments.order_by('-appointment_date', 'appointment_time'), "All Appointments"
+    elif filter_type == 'today':
+        # Show only today's appointments
+        return appointments.filter(appointment_date=today).order_by('appointment_time'), "Today's Appointments"
+    # Show upcoming appointments (future dates)
+    return appointments.filter(appointment_date__gte=today).order_by('appointment_date', 'appointment_time'), "Upcoming Appointments"
+
 @login_required
-def patient_dashboard(request):
+@cache_dashboard
+async def patient_dashboard(request):
+    user = await _auser(request)
     try:
-        patient = Patient.objects.get(user=request.user)
-        # Get upcoming appointments for this patient
-        from .models import Appointment
-        upcoming_appointments = Appointment.objects.filter(
-            patient=patient,
-            appointment_date__gte=timezone.now().date()
-        ).order_by('appointment_date', 'appointment_time')[:10]
-        
-        return render(request, 'healthcare/patient_dashboard.html', {
-            'user': request.user,
-            'user_type': 'Patient',
-            'patient': patient,
-            'upcoming_appointments': upcoming_appointments
-        })
+        patient = await Patient.objects.with_history().select_related('user', 'address').aget(user=user)
     except Patient.DoesNotExist:
         messages.error(request, 'Patient profile not found.')
         return redirect('healthcare:signup')
 
+    # Get upcoming appointments for this patient
+    upcoming_appointments = await _alist(
+        Appointment.objects.filter(
+            patient=patient,
+            appointment_date__gte=timezone.now().date()
+        ).select_related('doctor__user').order_by('appointment_date', 'appointment_time')[:10]
+    )
+
+    return render(request, 'healthcare/patient_dashboard.html', {
+        'user': user,
+        'user_type': 'Patient',
+        'patient': patient,
+        'upcoming_appointments': upcoming_appointments
+    })
+
 @login_required
-def doctor_dashboard(request):
+@cache_dashboard
+async def doctor_dashboard(request):
+    user = await _auser(request)
     try:
-        doctor = Doctor.objects.get(user=request.user)
-        from .models import Appointment
-        
-        # Get filter type from request parameter
-        filter_type = request.GET.get('filter', 'all')  # Changed default from 'upcoming' to 'all'
-        
-        today = timezone.now().date()  # Initialize today variable
-
-        # Get appointments based on filter type
-        if filter_type == 'all':
-            # Show all appointments (past and future)
-            appointments = Appointment.objects.filter(doctor=doctor).order_by('-appointment_date', 'appointment_time')
-            filter_name = "All Appointments"
-        elif filter_type == 'today':
-            # Show only today's appointments
-            appointments = Appointment.objects.filter(doctor=doctor, appointment_date=today).order_by('appointment_time')
-            filter_name = "Today's Appointments"
-        else:
-            # Show upcoming appointments (future dates)
-            appointments = Appointment.objects.filter(doctor=doctor, appointment_date__gte=today).order_by('appointment_date', 'appointment_time')
-            filter_name = "Upcoming Appointments"
-        
-        return render(request, 'healthcare/doctor_dashboard.html', {
-            'user': request.user,
-            'user_type': 'Doctor',
-            'doctor': doctor,
-            'appointments': appointments,
-            'current_filter': filter_type,
-            'filter_name': filter_name,
-            'current_date': timezone.now().date()
-        })
+        doctor = await Doctor.objects.select_related('user', 'address').aget(user=user)
     except Doctor.DoesNotExist:
         messages.error(request, 'Doctor profile not found.')
         return redirect('healthcare:signup')
 
+    # Get filter type from request parameter
+    filter_type = request.GET.get('filter', 'all')  # Changed default from 'upcoming' to 'all'
+    today = timezone.now().date()
+
+    appointments, filter_name = _doctor_appointments(doctor, filter_type, today)
+
+    return render(request, 'healthcare/doctor_dashboard.html', {
+        'user': user,
+        'user_type': 'Doctor',
+        'doctor': doctor,
+        'appointments': await _alist(appointments),
+        'current_filter': filter_type,
+        'filter_name': filter_name,
+        'current_date': today
+    })
+
 @login_required
 def admin_manage_users(request):
     if not request.user.is_staff:
@@ -483,39 +441,180 @@ def admin_appointments(request):
         'current_date': today
     })
 
+@login_required
+def admin_time_off_requests(request):
+    """View for admin to review doctors' time off requests"""
+    if not request.user.is_staff:
+        messages.error(request, 'Admin access required.')
+        return redirect('healthcare:dashboard')
+
+    from django.db.models import Count, IntegerField, OuterRef, Subquery
+    from django.db.models.functions import Coalesce
+    from .models import TimeOffRequest
+
+    status = request.GET.get('status', 'pending')
+    # Appointments each request would affect, counted in the same query
+    affected = (
+        Appointment.objects
+        .filter(
+            doctor=OuterRef('doctor'),
+            appointment_date__gte=OuterRef('start_date'),
+            appointment_date__lte=OuterRef('end_date'),
+        )
+        .exclude(status__in=['cancelled', 'completed'])
+        .order_by()
+        .values('doctor')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    time_off_requests = (
+        TimeOffRequest.objects
+        .select_related('doctor__user', 'reviewed_by')
+        .annotate(affected_count=Coalesce(Subquery(affected, output_field=IntegerField()), 0))
+    )
+    if status != 'all':
+        time_off_requests = time_off_requests.filter(status=status)
+
+    return render(request, 'healthcare/admin/time_off_requests.html', {
+        'time_off_requests': time_off_requests.order_by('start_date'),
+        'current_status': status,
+        'status_choices': TimeOffRequest.STATUS_CHOICES,
+    })
+
+@login_required
+def admin_review_time_off(request, id):
+    """Approve or reject a time off request, resolving the appointments it affects"""
+    if not request.user.is_staff:
+        messages.error(request, 'Admin access required.')
+        return redirect('healthcare:dashboard')
+    if request.method != 'POST':
+        return redirect('healthcare:admin_time_off_requests')
+
+    from .models import TimeOffRequest
+    from .scheduling import approve_time_off
+
+    try:
+        time_off = TimeOffRequest.objects.select_related('doctor__user').get(id=id, status='pending')
+    except TimeOffRequest.DoesNotExist:
+        messages.error(request, 'Time off request not found or already reviewed.')
+        return redirect('healthcare:admin_time_off_requests')
+
+    admin_notes = request.POST.get('admin_notes', '').strip()
+    if request.POST.get('action') == 'approve':
+        resolution = 'cancel' if request.POST.get('resolution') == 'cancel' else 'reassign'
+        try:
+            result = approve_time_off(time_off, request.user, resolution, admin_notes)
+            if result is None:
+                messages.error(request, 'Time off request not found or already reviewed.')
+            else:
+                reassigned, cancelled = result
+                messages.success(
+                    request,
+                    f'Approved time off for {time_off.doctor.full_name}: '
+                    f'{len(reassigned)} appointments reassigned, {len(cancelled)} cancelled. Patients will be notified.'
+                )
+        except Exception as e:
+            logger.error(f'Error approving time off {id}: {str(e)}')
+            messages.error(request, f'Error approving time off: {str(e)}')
+    else:
+        now = timezone.now()
+        # Only if still pending, in case another admin reviewed it meanwhile
+        rejected = TimeOffRequest.objects.filter(pk=time_off.pk, status='pending').update(
+            status='rejected', admin_notes=admin_notes, reviewed_by=request.user, reviewed_at=now, updated_at=now,
+        )
+        if rejected:
+            messages.success(request, f'Rejected time off for {time_off.doctor.full_name}.')
+        else:
+            messages.error(request, 'Time off request not found or already reviewed.')
+    return redirect('healthcare:admin_time_off_requests')
+
+@login_required
+def admin_capacity(request):
+    """Heatmap of each doctor's booked places against their daily limit for the next weeks"""
+    if not request.user.is_staff:
+        messages.error(request, 'Admin access required.')
+        return redirect('healthcare:dashboard')
+
+    from .capacity import utilization_heatmap
+
+    try:
+        weeks = min(max(int(request.GET.get('weeks', 4)), 1), 12)
+    except ValueError:
+        weeks = 4
+    dates, rows = utilization_heatmap(weeks=weeks)
+
+    return render(request, 'healthcare/admin/capacity.html', {
+        'dates': dates,
+        'rows': rows,
+        'weeks': weeks,
+        'week_options': [1, 2, 4, 8, 12],
+    })
+
+@login_required
+def admin_metrics(request):
+    """Per-view query counts and latency percentiles recorded by this worker process"""
+    if not request.user.is_staff:
+        messages.error(request, 'Admin access required.')
+        return redirect('healthcare:dashboard')
+
+    from .metrics import query_budget, registry
+
+    rows = [
+        {'view': view_name, 'budget': query_budget(view_name), **summary}
+        for view_name, summary in registry.snapshot()
+    ]
+    rows.sort(key=lambda row: row['total_ms']['p95'], reverse=True)
+    return render(request, 'healthcare/admin/metrics.html', {'rows': rows})
+
+def prometheus_metrics(request):
+    """Request metrics in the Prometheus text format, for a scraper with METRICS_TOKEN or a staff user"""
+    from django.conf import settings
+    from django.utils.crypto import constant_time_compare
+    from .metrics import prometheus_text
+
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if token:
+        allowed = constant_time_compare(authorization, f'Bearer {token}')
+    else:
+        allowed = request.user.is_authenticated and request.user.is_staff
+    if not allowed:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @login_required
 def admin_reports(request):
     if not request.user.is_staff:
         messages.error(request, 'Admin access required.')
         return redirect('healthcare:dashboard')
 
-    # Gather context data for all report tabs
+    # Gather context data for all report tabs; reportable() leaves out the demo accounts
 
     # User reports data
-    total_users = User.objects.count()
-    total_patients = Patient.objects.count()
-    total_doctors = Doctor.objects.count()
-    total_admins = User.objects.filter(is_staff=True).count()
+    total_users = reportable(User).count()
+    total_patients = reportable(Patient).count()
+    total_doctors = reportable(Doctor).count()
+    total_admins = reportable(User).filter(is_staff=True).count()
 
     # Get recent user registrations (last 30 days)
     thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
-    recent_users = User.objects.filter(date_joined__gte=thirty_days_ago).order_by('-date_joined')
+    recent_users = reportable(User).filter(date_joined__gte=thirty_days_ago).order_by('-date_joined')
 
     # Appointment reports data
-    total_appointments = Appointment.objects.count()
-    pending_appointments = Appointment.objects.filter(status='pending').count()
-    confirmed_appointments = Appointment.objects.filter(status='confirmed').count()
-    completed_appointments = Appointment.objects.filter(status='completed').count()
-    cancelled_appointments = Appointment.objects.filter(status='cancelled').count()
+    total_appointments = reportable(Appointment).count()
+    pending_appointments = reportable(Appointment).filter(status='pending').count()
+    confirmed_appointments = reportable(Appointment).filter(status='confirmed').count()
+    completed_appointments = reportable(Appointment).filter(status='completed').count()
+    cancelled_appointments = reportable(Appointment).filter(status='cancelled').count()
 
     # Get appointments by doctor
     from django.db.models import Count
-    appointments_by_doctor = Appointment.objects.values('doctor__user__first_name', 'doctor__user__last_name').annotate(
+    appointments_by_doctor = reportable(Appointment).values('doctor__user__first_name', 'doctor__user__last_name').annotate(
         total=Count('id')
     ).order_by('-total')
 
     # Recent appointments
-    recent_appointments = Appointment.objects.all().order_by('-created_at')[:50]
+    recent_appointments = reportable(Appointment).order_by('-created_at')[:50]
 
     # Financial reports data
     # Mock revenue calculation (e.g., $100 per completed appointment)
@@ -525,7 +624,7 @@ def admin_reports(request):
     # Monthly revenue (mock)
     current_month = timezone.now().month
     current_year = timezone.now().year
-    monthly_appointments = Appointment.objects.filter(
+    monthly_appointments = reportable(Appointment).filter(
         appointment_date__year=current_year,
         appointment_date__month=current_month,
         status='completed'
@@ -533,10 +632,10 @@ def admin_reports(request):
     monthly_revenue = monthly_appointments * avg_revenue_per_appointment
 
     # System reports data
-    total_prescriptions = Prescription.objects.count()
+    total_prescriptions = reportable(Prescription).count()
 
     # Active users (users who logged in recently)
-    active_users = User.objects.filter(last_login__gte=thirty_days_ago).count()
+    active_users = reportable(User).filter(last_login__gte=thirty_days_ago).count()
 
     # System uptime (mock - in real system would get from server)
     system_uptime = "99.9%"  # Mock value
@@ -578,15 +677,15 @@ def user_reports(request):
         return redirect('healthcare:dashboard')
 
     # Get user statistics
-    total_users = User.objects.count()
-    total_patients = Patient.objects.count()
-    total_doctors = Doctor.objects.count()
-    total_admins = User.objects.filter(is_staff=True).count()
+    total_users = reportable(User).count()
+    total_patients = reportable(Patient).count()
+    total_doctors = reportable(Doctor).count()
+    total_admins = reportable(User).filter(is_staff=True).count()
 
     # Get recent user registrations (last 30 days)
     from django.utils import timezone
     thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
-    recent_users = User.objects.filter(date_joined__gte=thirty_days_ago).order_by('-date_joined')
+    recent_users = reportable(User).filter(date_joined__gte=thirty_days_ago).order_by('-date_joined')
 
     context = {
         'total_users': total_users,
@@ -604,20 +703,20 @@ def appointment_reports(request):
         return redirect('healthcare:dashboard')
 
     # Get appointment statistics
-    total_appointments = Appointment.objects.count()
-    pending_appointments = Appointment.objects.filter(status='pending').count()
-    confirmed_appointments = Appointment.objects.filter(status='confirmed').count()
-    completed_appointments = Appointment.objects.filter(status='completed').count()
-    cancelled_appointments = Appointment.objects.filter(status='cancelled').count()
+    total_appointments = reportable(Appointment).count()
+    pending_appointments = reportable(Appointment).filter(status='pending').count()
+    confirmed_appointments = reportable(Appointment).filter(status='confirmed').count()
+    completed_appointments = reportable(Appointment).filter(status='completed').count()
+    cancelled_appointments = reportable(Appointment).filter(status='cancelled').count()
 
     # Get appointments by doctor
     from django.db.models import Count
-    appointments_by_doctor = Appointment.objects.values('doctor__user__first_name', 'doctor__user__last_name').annotate(
+    appointments_by_doctor = reportable(Appointment).values('doctor__user__first_name', 'doctor__user__last_name').annotate(
         total=Count('id')
     ).order_by('-total')
 
     # Recent appointments
-    recent_appointments = Appointment.objects.all().order_by('-created_at')[:50]
+    recent_appointments = reportable(Appointment).order_by('-created_at')[:50]
 
     context = {
         'total_appointments': total_appointments,
@@ -638,8 +737,8 @@ def financial_reports(request):
 
     # Since there are no financial models, we'll use appointment data as proxy
     # Assuming each appointment generates revenue
-    total_appointments = Appointment.objects.count()
-    completed_appointments = Appointment.objects.filter(status='completed').count()
+    total_appointments = reportable(Appointment).count()
+    completed_appointments = reportable(Appointment).filter(status='completed').count()
 
     # Mock revenue calculation (e.g., $100 per completed appointment)
     avg_revenue_per_appointment = 100
@@ -649,7 +748,7 @@ def financial_reports(request):
     from django.utils import timezone
     current_month = timezone.now().month
     current_year = timezone.now().year
-    monthly_appointments = Appointment.objects.filter(
+    monthly_appointments = reportable(Appointment).filter(
         appointment_date__year=current_year,
         appointment_date__month=current_month,
         status='completed'
@@ -672,19 +771,20 @@ def system_reports(request):
         return redirect('healthcare:dashboard')
 
     # System health metrics
-    total_users = User.objects.count()
-    total_patients = Patient.objects.count()
-    total_doctors = Doctor.objects.count()
-    total_appointments = Appointment.objects.count()
-    total_prescriptions = Prescription.objects.count()
+    total_users = reportable(User).count()
+    total_patients = reportable(Patient).count()
+    total_doctors = reportable(Doctor).count()
+    total_appointments = reportable(Appointment).count()
+    total_prescriptions = reportable(Prescription).count()
 
     # Active users (users who logged in recently)
     from django.utils import timezone
     thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
-    active_users = User.objects.filter(last_login__gte=thirty_days_ago).count()
+    active_users = reportable(User).filter(last_login__gte=thirty_days_ago).count()
 
-    # System uptime (mock - in real system would get from server)
-    system_uptime = "99.9%"  # Mock value
+    # Process, database and cache health, and its history over the last 24 hours
+    from .health import current_health, recent_history
+    health = current_health()
 
     context = {
         'total_users': total_users,
@@ -693,7 +793,10 @@ def system_reports(request):
         'total_appointments': total_appointments,
         'total_prescriptions': total_prescriptions,
         'active_users': active_users,
-        'system_uptime': system_uptime,
+        'system_uptime': health['uptime'],
+        'health': health,
+        'health_history': recent_history(),
+        'cache_stats': health['cache'],
     }
     return render(request, 'healthcare/admin/system_reports.html', context)
 
@@ -714,10 +817,10 @@ def download_pdf(request, report_type):
     line_height = 14
 
     if report_type == 'user':
-        total_users = User.objects.count()
-        total_patients = Patient.objects.count()
-        total_doctors = Doctor.objects.count()
-        total_admins = User.objects.filter(is_staff=True).count()
+        total_users = reportable(User).count()
+        total_patients = reportable(Patient).count()
+        total_doctors = reportable(Doctor).count()
+        total_admins = reportable(User).filter(is_staff=True).count()
 
         p.setFont("Helvetica", 12)
         p.drawString(72, y, f"Total Users: {total_users}")
@@ -730,11 +833,11 @@ def download_pdf(request, report_type):
         y -= line_height
 
     elif report_type == 'appointment':
-        total_appointments = Appointment.objects.count()
-        pending_appointments = Appointment.objects.filter(status='pending').count()
-        confirmed_appointments = Appointment.objects.filter(status='confirmed').count()
-        completed_appointments = Appointment.objects.filter(status='completed').count()
-        cancelled_appointments = Appointment.objects.filter(status='cancelled').count()
+        total_appointments = reportable(Appointment).count()
+        pending_appointments = reportable(Appointment).filter(status='pending').count()
+        confirmed_appointments = reportable(Appointment).filter(status='confirmed').count()
+        completed_appointments = reportable(Appointment).filter(status='completed').count()
+        cancelled_appointments = reportable(Appointment).filter(status='cancelled').count()
 
         p.setFont("Helvetica", 12)
         p.drawString(72, y, f"Total Appointments: {total_appointments}")
@@ -749,15 +852,15 @@ def download_pdf(request, report_type):
         y -= line_height
 
     elif report_type == 'financial':
-        total_appointments = Appointment.objects.count()
-        completed_appointments = Appointment.objects.filter(status='completed').count()
+        total_appointments = reportable(Appointment).count()
+        completed_appointments = reportable(Appointment).filter(status='completed').count()
         avg_revenue_per_appointment = 100
         total_revenue = completed_appointments * avg_revenue_per_appointment
 
         from django.utils import timezone
         current_month = timezone.now().month
         current_year = timezone.now().year
-        monthly_appointments = Appointment.objects.filter(
+        monthly_appointments = reportable(Appointment).filter(
             appointment_date__year=current_year,
             appointment_date__month=current_month,
             status='completed'
@@ -777,16 +880,17 @@ def download_pdf(request, report_type):
         y -= line_height
 
     elif report_type == 'system':
-        total_users = User.objects.count()
-        total_patients = Patient.objects.count()
-        total_doctors = Doctor.objects.count()
-        total_appointments = Appointment.objects.count()
-        total_prescriptions = Prescription.objects.count()
+        total_users = reportable(User).count()
+        total_patients = reportable(Patient).count()
+        total_doctors = reportable(Doctor).count()
+        total_appointments = reportable(Appointment).count()
+        total_prescriptions = reportable(Prescription).count()
 
         from django.utils import timezone
         thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
-        active_users = User.objects.filter(last_login__gte=thirty_days_ago).count()
-        system_uptime = "99.9%"
+        active_users = reportable(User).filter(last_login__gte=thirty_days_ago).count()
+        from .health import current_health
+        health = current_health()
 
         p.setFont("Helvetica", 12)
         p.drawString(72, y, f"Total Users: {total_users}")
@@ -801,7 +905,20 @@ def download_pdf(request, report_type):
         y -= line_height
         p.drawString(72, y, f"Active Users (last 30 days): {active_users}")
         y -= line_height
-        p.drawString(72, y, f"System Uptime: {system_uptime}")
+        p.drawString(72, y, f"Process Uptime: {health['uptime']}")
+        y -= line_height
+        if health['rss_bytes'] is not None:
+            p.drawString(72, y, f"Memory (RSS): {health['rss_bytes'] / 2**20:.1f} MB")
+            y -= line_height
+        p.drawString(72, y, f"Requests Served: {health['requests']} ({health['error_rate']}% errors)")
+        y -= line_height
+        p.drawString(72, y, f"Slow Queries: {health['slow_queries']}")
+        y -= line_height
+        database = health['database']
+        if 'size_bytes' in database:
+            p.drawString(72, y, f"Database Size: {database['size_bytes'] / 2**20:.1f} MB ({database['vendor']})")
+            y -= line_height
+        p.drawString(72, y, f"Dashboard Cache Hit Ratio: {health['cache']['hit_ratio']}%")
         y -= line_height
 
     else:
@@ -884,12 +1001,12 @@ def add_patient(request):
                 patient = Patient.objects.create(
                     user=user,
                     address=address,
-                    profile_picture=patient_form.cleaned_data.get('profile_picture'),
                     date_of_birth=patient_form.cleaned_data.get('date_of_birth'),
                     phone=patient_form.cleaned_data.get('phone', ''),
                     medical_history=patient_form.cleaned_data.get('medical_history', '')
                 )
                 
+                _stage_profile_picture(request, patient_form, user, 'patient')
                 messages.success(request, 'Patient added successfully!')
                 return redirect('healthcare:admin_dashboard')
                 
@@ -955,13 +1072,13 @@ def add_doctor(request):
                 doctor = Doctor.objects.create(
                     user=user,
                     address=address,
-                    profile_picture=doctor_form.cleaned_data.get('profile_picture'),
                     specialization=doctor_form.cleaned_data.get('specialization'),
                     license_number=doctor_form.cleaned_data.get('license_number'),
                     experience_years=doctor_form.cleaned_data.get('experience_years', 0),
                     phone=doctor_form.cleaned_data.get('phone', '')
                 )
 
+                _stage_profile_picture(request, doctor_form, user, 'doctor')
                 messages.success(request, 'Doctor added successfully!')
                 return redirect('healthcare:admin_dashboard')
 
@@ -1058,17 +1175,164 @@ def book_appointment(request):
     return render(request, 'healthcare/book_appointment.html', context)
 
 @login_required
-def view_reports(request):
-    """View for viewing medical reports"""
+def book_recurring_appointment(request):
+    """Book a weekly or monthly series of appointments in one go"""
+    from .forms import AppointmentSeriesForm
+    from .scheduling import book_series
+
     user = request.user
+    patient = Patient.objects.filter(user=user).first()
+    doctor = None if patient else Doctor.objects.filter(user=user).first()
+    if not patient and not doctor:
+        messages.error(request, 'User profile not found.')
+        return redirect('healthcare:dashboard')
+
+    form = AppointmentSeriesForm(request.POST or None)
+    # Patients book for themselves; doctors book their own patients
+    del form.fields['patient' if patient else 'doctor']
+    if doctor:
+        form.fields['patient'].queryset = Patient.objects.select_related('user')
+
+    conflicts = []
+    if request.method == 'POST' and form.is_valid():
+        series = form.save(commit=False)
+        series.patient = patient or series.patient
+        series.doctor = doctor or series.doctor
+        series.created_by = user
+        appointments, conflicts = book_series(series)
+        conflicts = sorted(conflicts.items())
+        if appointments:
+            messages.success(request, f'Booked {len(appointments)} appointments ({series.rule_display}). They are pending confirmation.')
+            if conflicts:
+                messages.warning(request, f'{len(conflicts)} dates could not be booked: ' + '; '.join(
+                    f"{date.strftime('%b %d, %Y')} ({reason})" for date, reason in conflicts
+                ))
+            return redirect('healthcare:patient_dashboard' if patient else 'healthcare:doctor_dashboard')
+        messages.error(request, 'None of the dates in this series are available.')
+
+    return render(request, 'healthcare/book_recurring_appointment.html', {
+        'form': form,
+        'conflicts': conflicts,
+        'patient': patient,
+        'doctor': doctor,
+        'user_type': 'Patient' if patient else 'Doctor',
+    })
+
+@login_required
+def waitlist(request):
+    """Join the waitlist for freed slots and answer the offers made from it"""
+    from .forms import WaitlistEntryForm
+    from .models import WaitlistEntry
+    from .waitlist import offer_open_slot
 
-    # Check if user is a doctor
     try:
-        doctor = Doctor.objects.get(user=user)
+        patient = Patient.objects.get(user=request.user)
+    except Patient.DoesNotExist:
+        messages.error(request, 'Patient profile not found.')
+        return redirect('healthcare:dashboard')
+
+    form = WaitlistEntryForm(request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        entry = form.save(commit=False)
+        entry.patient = patient
+        entry.save()
+        if offer_open_slot(entry):
+            messages.success(request, 'A slot is already available for you. Accept it below before the offer expires.')
+        else:
+            messages.success(request, "You're on the waitlist. We'll let you know as soon as a slot opens up.")
+        return redirect('healthcare:waitlist')
+
+    entries = (
+        WaitlistEntry.objects
+        .filter(patient=patient, status__in=['waiting', 'offered'])
+        .select_related('doctor__user', 'offered_appointment__doctor__user')
+    )
+    return render(request, 'healthcare/waitlist.html', {
+        'form': form,
+        'entries': entries,
+        'patient': patient,
+        'user_type': 'Patient',
+        'now': timezone.now(),
+    })
+
+@login_required
+def waitlist_respond(request, id):
+    """Accept or decline a waitlist offer, or leave the waitlist"""
+    if request.method != 'POST':
+        return redirect('healthcare:waitlist')
+
+    from .models import WaitlistEntry
+    from .waitlist import accept_offer, release_offer
+
+    try:
+        entry = WaitlistEntry.objects.get(id=id, patient__user=request.user, status__in=['waiting', 'offered'])
+    except WaitlistEntry.DoesNotExist:
+        messages.error(request, 'Waitlist entry not found.')
+        return redirect('healthcare:waitlist')
+
+    action = request.POST.get('action')
+    if action == 'accept':
+        appointment = accept_offer(entry)
+        if appointment:
+            messages.success(request, f"Your appointment on {appointment.appointment_date.strftime('%b %d, %Y')} at {appointment.appointment_time.strftime('%I:%M %p')} is booked and pending confirmation.")
+            return redirect('healthcare:patient_dashboard')
+        messages.error(request, 'This offer has expired. You are still on the waitlist.')
+        if entry.status == 'offered':
+            release_offer(entry, lapsed_by=timezone.now())
+    elif action == 'decline':
+        release_offer(entry)
+        messages.info(request, "Offer declined. You're still on the waitlist.")
+    elif action == 'leave':
+        release_offer(entry, status='cancelled')
+        messages.info(request, 'You have left the waitlist.')
+    else:
+        messages.error(request, 'Unknown action.')
+    return redirect('healthcare:waitlist')
+
+@login_required
+def cancel_appointment(request, id):
+    """Cancel one of the patient's or doctor's upcoming appointments, freeing the slot for the waitlist"""
+    from django.db.models import Q
+
+    is_patient = Patient.objects.filter(user=request.user).exists()
+    dashboard = 'healthcare:patient_dashboard' if is_patient else 'healthcare:doctor_dashboard'
+    if request.method != 'POST':
+        return redirect(dashboard)
+
+    appointment = (
+        Appointment.objects
+        .filter(Q(patient__user=request.user) | Q(doctor__user=request.user), id=id, status__in=['pending', 'confirmed'])
+        .first()
+    )
+    if appointment is None:
+        messages.error(request, 'Appointment not found or can no longer be cancelled.')
+        return redirect(dashboard)
+
+    # save(), not update(): the post_save signals offer the slot to the waitlist
+    appointment.status = 'cancelled'
+    appointment.save()
+    messages.success(request, f"Your appointment on {appointment.appointment_date.strftime('%b %d, %Y')} at {appointment.appointment_time.strftime('%I:%M %p')} has been cancelled.")
+    return redirect(dashboard)
+
+@login_required
+@cache_dashboard
+async def view_reports(request):
+    """View for viewing medical reports"""
+    user = await _auser(request)
+
+    doctor, patient = await asyncio.gather(
+        Doctor.objects.select_related('user').filter(user=user).afirst(),
+        Patient.objects.with_history().select_related('user').filter(user=user).afirst(),
+    )
+
+    # Check if user is a doctor
+    if doctor:
         # Doctor's reports: appointments, prescriptions, patients
-        appointments = Appointment.objects.filter(doctor=doctor).order_by('-appointment_date')[:20]
-        prescriptions = Prescription.objects.filter(doctor=doctor).order_by('-created_at')[:20]
-        patients_count = Appointment.objects.filter(doctor=doctor).values('patient').distinct().count()
+        appointments, prescriptions, patients_count = await asyncio.gather(
+            _alist(Appointment.objects.filter(doctor=doctor).select_related('patient__user').order_by('-appointment_date')[:20]),
+            _alist(Prescription.objects.filter(doctor=doctor).select_related('patient__user').order_by('-created_at')[:20]),
+            Appointment.objects.filter(doctor=doctor).values('patient').distinct().acount(),
+        )
 
         return render(request, 'healthcare/view_reports.html', {
             'user_type': 'Doctor',
@@ -1077,24 +1341,21 @@ def view_reports(request):
             'prescriptions': prescriptions,
             'patients_count': patients_count,
         })
-    except Doctor.DoesNotExist:
-        pass
 
     # Check if user is a patient
-    try:
-        patient = Patient.objects.get(user=user)
-        # Patient's reports: appointments, prescriptions, medical history
-        appointments = Appointment.objects.filter(patient=patient).order_by('-appointment_date')[:20]
-        prescriptions = Prescription.objects.filter(patient=patient).order_by('-created_at')[:20]
+    if patient:
+        # Patient's reports: totals and medical history; the timeline pages in from patient_timeline_api
+        appointments_count, prescriptions_count = await asyncio.gather(
+            Appointment.objects.filter(patient=patient).acount(),
+            Prescription.objects.filter(patient=patient).acount(),
+        )
 
         return render(request, 'healthcare/view_reports.html', {
             'user_type': 'Patient',
             'patient': patient,
-            'appointments': appointments,
-            'prescriptions': prescriptions,
+            'appointments_count': appointments_count,
+            'prescriptions_count': prescriptions_count,
         })
-    except Patient.DoesNotExist:
-        pass
 
     # If neither doctor nor patient, redirect
     messages.error(request, 'User profile not found.')
@@ -1114,59 +1375,54 @@ def start_consultation(request):
         return redirect('healthcare:dashboard')
 
 @login_required
-def show_appointments(request):
+async def show_appointments(request):
     """View for showing appointments with filtering options"""
+    user = await _auser(request)
     try:
-        doctor = Doctor.objects.get(user=request.user)
-        from .models import Appointment
-        
-        # Get filter type from request parameter
-        filter_type = request.GET.get('filter', 'all')  # Changed default from 'upcoming' to 'all'
-        today = timezone.now().date()
-
-        # Get appointments based on filter type
-        if filter_type == 'all':
-            appointments = Appointment.objects.filter(doctor=doctor).order_by('-appointment_date', 'appointment_time')
-            filter_name = "All Appointments"
-        elif filter_type == 'today':
-            appointments = Appointment.objects.filter(doctor=doctor, appointment_date=today).order_by('appointment_time')
-            filter_name = "Today's Appointments"
-        else:
-            appointments = Appointment.objects.filter(doctor=doctor, appointment_date__gte=today).order_by('appointment_date', 'appointment_time')
-            filter_name = "Upcoming Appointments"
-        
-        return render(request, 'healthcare/show_appointments.html', {
-            'doctor': doctor,
-            'user_type': 'Doctor',
-            'appointments': appointments,
-            'current_filter': filter_type,
-            'filter_name': filter_name,
-            'current_date': today
-        })
+        doctor = await Doctor.objects.aget(user=user)
     except Doctor.DoesNotExist:
         messages.error(request, 'Doctor profile not found.')
         return redirect('healthcare:dashboard')
 
+    # Get filter type from request parameter
+    filter_type = request.GET.get('filter', 'all')  # Changed default from 'upcoming' to 'all'
+    today = timezone.now().date()
+
+    appointments, filter_name = _doctor_appointments(doctor, filter_type, today)
+
+    return render(request, 'healthcare/show_appointments.html', {
+        'doctor': doctor,
+        'user_type': 'Doctor',
+        'appointments': await _alist(appointments),
+        'current_filter': filter_type,
+        'filter_name': filter_name,
+        'current_date': today
+    })
+
 @login_required
+@cache_dashboard
 def my_patients(request):
-    """View for showing doctor's patients"""
+    """View for showing doctor's patients, paginated and sortable (?sort=, ?page=)"""
+    from django.core.paginator import Paginator
+    from .patients import MY_PATIENTS_PAGE_SIZE, doctor_patient_list
     try:
         doctor = Doctor.objects.get(user=request.user)
-        from .models import Appointment, Patient
-        
-        # Get unique patients who have appointments with this doctor
-        patient_ids = Appointment.objects.filter(doctor=doctor).values_list('patient', flat=True).distinct()
-        patients = Patient.objects.filter(id__in=patient_ids)
-        
-        return render(request, 'healthcare/my_patients.html', {
-            'doctor': doctor,
-            'user_type': 'Doctor',
-            'patients': patients
-        })
     except Doctor.DoesNotExist:
         messages.error(request, 'Doctor profile not found.')
         return redirect('healthcare:dashboard')
 
+    condition = request.GET.get('condition', '').strip()
+    sort = request.GET.get('sort', '-last_visit')
+    patients = Paginator(doctor_patient_list(doctor, sort, condition), MY_PATIENTS_PAGE_SIZE).get_page(request.GET.get('page'))
+
+    return render(request, 'healthcare/my_patients.html', {
+        'doctor': doctor,
+        'user_type': 'Doctor',
+        'patients': patients,
+        'condition': condition,
+        'sort': sort,
+    })
+
 @login_required
 def schedule(request):
     """View for doctor's schedule management"""
@@ -1182,9 +1438,10 @@ def schedule(request):
 
 @login_required
 def manage_schedule(request):
-    """View to manage doctor's weekly schedule"""
-    from .forms import DoctorScheduleForm
+    """View to manage doctor's weekly schedule; all seven days are edited and saved together"""
+    from .forms import WeeklyScheduleFormSet
     from .models import DoctorSchedule
+    from .scheduling import WEEKDAYS, save_weekly_schedule
     try:
         doctor = Doctor.objects.get(user=request.user)
     except Doctor.DoesNotExist:
@@ -1192,45 +1449,40 @@ def manage_schedule(request):
         return redirect('healthcare:dashboard')
 
     if request.method == 'POST':
-        form = DoctorScheduleForm(request.POST)
-        if form.is_valid():
-            day_of_week = form.cleaned_data['day_of_week']
-            start_time = form.cleaned_data['start_time']
-            end_time = form.cleaned_data['end_time']
-            is_available = form.cleaned_data['is_available']
-
-            # Update or create schedule for the day
-            schedule_obj, created = DoctorSchedule.objects.update_or_create(
-                doctor=doctor,
-                day_of_week=day_of_week,
-                defaults={
-                    'start_time': start_time,
-                    'end_time': end_time,
-                    'is_available': is_available
-                }
-            )
-            messages.success(request, f'Schedule for {day_of_week.capitalize()} saved successfully.')
+        formset = WeeklyScheduleFormSet(request.POST, prefix='shifts')
+        if formset.is_valid():
+            save_weekly_schedule(doctor, formset.shifts)
+            messages.success(request, 'Weekly schedule saved successfully.')
             return redirect('healthcare:manage_schedule')
-        else:
-            messages.error(request, 'Please correct the errors below.')
+        messages.error(request, 'Please correct the errors below.')
     else:
-        # Prepare initial data for the form for each day
-        schedules = DoctorSchedule.objects.filter(doctor=doctor)
-        schedule_forms = []
-        days = [choice[0] for choice in DoctorSchedule.DAYS_OF_WEEK]
-        for day in days:
-            schedule = schedules.filter(day_of_week=day).first()
-            if schedule:
-                form = DoctorScheduleForm(instance=schedule, prefix=day)
-            else:
-                form = DoctorScheduleForm(prefix=day, initial={'day_of_week': day, 'is_available': True})
-            schedule_forms.append(form)
-
-        return render(request, 'healthcare/manage_schedule.html', {
-            'doctor': doctor,
-            'schedule_forms': schedule_forms,
-            'user_type': 'Doctor'
-        })
+        # The whole week in one query, in weekday order
+        shifts = sorted(
+            DoctorSchedule.objects.filter(doctor=doctor).values('day_of_week', 'start_time', 'end_time', 'is_available'),
+            key=lambda shift: (WEEKDAYS.index(shift['day_of_week']), shift['start_time']),
+        )
+        scheduled_days = {shift['day_of_week'] for shift in shifts}
+        # An empty shift for days without one, to fill in
+        initial = shifts + [
+            {'day_of_week': day, 'is_available': True} for day in WEEKDAYS if day not in scheduled_days
+        ]
+        initial.sort(key=lambda shift: WEEKDAYS.index(shift['day_of_week']))
+        formset = WeeklyScheduleFormSet(initial=initial, prefix='shifts')
+
+    # Group the shift forms by day for display
+    week = [(day, label, []) for day, label in DoctorSchedule.DAYS_OF_WEEK]
+    forms_by_day = {day: day_forms for day, _, day_forms in week}
+    for form in formset.forms:
+        day = form['day_of_week'].value()
+        if day in forms_by_day:
+            forms_by_day[day].append(form)
+
+    return render(request, 'healthcare/manage_schedule.html', {
+        'doctor': doctor,
+        'formset': formset,
+        'week': week,
+        'user_type': 'Doctor'
+    })
 
 @login_required
 def request_time_off(request):
@@ -1367,7 +1619,15 @@ def doctor_update_profile(request):
             user.last_name = form.cleaned_data['last_name']
             user.email = form.cleaned_data['email']
             user.save()
+            cleared = None
+            if form.cleaned_data.get('profile_picture') is False:
+                # "Clear" was ticked
+                cleared = doctor.profile_picture.name
+                doctor.profile_picture = None
             doctor.save()
+            if cleared:
+                transaction.on_commit(lambda: delete_picture_files(cleared))
+            _stage_profile_picture(request, form, user, 'doctor')
             messages.success(request, 'Profile updated successfully.')
             return redirect('healthcare:doctor_settings')
         else:
@@ -1379,6 +1639,7 @@ def doctor_update_profile(request):
     return render(request, 'healthcare/doctor_update_profile.html', {
         'form': form,
         'doctor': doctor,
+        'picture_upload': user.picture_uploads.first(),
         'user_type': 'Doctor'
     })
 
@@ -1473,6 +1734,9 @@ def doctor_practice_settings(request):
 @login_required
 def view_patient(request, id):
     """View for displaying individual patient details"""
+    from django.core.paginator import Paginator
+    from .forms import MedicalHistoryEntryForm
+
     # Check if user is admin or doctor
     try:
         Doctor.objects.get(user=request.user)
@@ -1484,16 +1748,50 @@ def view_patient(request, id):
         messages.error(request, 'Access denied.')
         return redirect('healthcare:dashboard')
 
+    try:
+        patient = Patient.objects.with_history().select_related('user', 'address').get(id=id)
+    except Patient.DoesNotExist:
+        messages.error(request, 'Patient not found.')
+        return redirect('healthcare:dashboard')
+
+    # Only the requested page of history entries is loaded
+    history = Paginator(patient.history_entries.select_related('recorded_by'), 10).get_page(request.GET.get('history_page'))
+    return render(request, 'healthcare/patient_detail.html', {
+        'patient': patient,
+        'history': history,
+        'history_form': MedicalHistoryEntryForm() if is_doctor else None,
+        'user_type': 'Admin' if request.user.is_staff else 'Doctor'
+    })
+
+@login_required
+def add_history_entry(request, id):
+    """Record a condition, allergy, medication, procedure or note in a patient's history"""
+    from .forms import MedicalHistoryEntryForm
+
+    if request.method != 'POST':
+        return redirect('healthcare:view_patient', id=id)
+    if not Doctor.objects.filter(user=request.user).exists():
+        messages.error(request, 'Only doctors can add medical history.')
+        return redirect('healthcare:dashboard')
     try:
         patient = Patient.objects.get(id=id)
-        return render(request, 'healthcare/patient_detail.html', {
-            'patient': patient,
-            'user_type': 'Admin' if request.user.is_staff else 'Doctor'
-        })
     except Patient.DoesNotExist:
         messages.error(request, 'Patient not found.')
         return redirect('healthcare:dashboard')
 
+    form = MedicalHistoryEntryForm(request.POST)
+    if form.is_valid():
+        entry = form.save(commit=False)
+        entry.patient = patient
+        entry.recorded_by = request.user
+        entry.save()
+        messages.success(request, f'{entry.get_entry_type_display()} "{entry.title}" added to the medical history.')
+    else:
+        messages.error(request, 'Please correct the errors in the history entry: ' + '; '.join(
+            error for errors in form.errors.values() for error in errors
+        ))
+    return redirect('healthcare:view_patient', id=id)
+
 @login_required
 def view_doctor(request, id):
     """View for displaying individual doctor details"""
@@ -1557,6 +1855,211 @@ def debug_user_info(request):
     
     return render(request, 'healthcare/debug_user_info.html', context)
 
+@login_required
+def upload_status(request, id):
+    """Report the processing status of a profile picture upload as JSON"""
+    from .models import ProfilePictureUpload
+    try:
+        upload = ProfilePictureUpload.objects.get(id=id)
+    except ProfilePictureUpload.DoesNotExist:
+        return JsonResponse({'error': 'Upload not found.'}, status=404)
+
+    if request.user.id not in (upload.user_id, upload.uploaded_by_id) and not request.user.is_staff:
+        return JsonResponse({'error': 'Access denied.'}, status=403)
+
+    return JsonResponse({
+        'id': upload.id,
+        'name': upload.original_name,
+        'status': upload.status,
+        'status_display': upload.get_status_display(),
+        'error': upload.error,
+    })
+
+# JSON API
+def _appointment_json(appointment):
+    return {
+        'id': appointment.id,
+        'date': appointment.appointment_date.isoformat(),
+        'time': appointment.appointment_time.strftime('%H:%M'),
+        'status': appointment.status,
+        'reason': appointment.reason,
+        'patient': appointment.patient.full_name,
+        'doctor': appointment.doctor.full_name,
+    }
+
+@login_required
+async def appointments_api(request):
+    """JSON list of the logged-in doctor's or patient's appointments (?filter=all|today|upcoming)"""
+    user = await _auser(request)
+    doctor, patient = await asyncio.gather(
+        Doctor.objects.filter(user=user).afirst(),
+        Patient.objects.filter(user=user).afirst(),
+    )
+    if doctor:
+        appointments = Appointment.objects.filter(doctor=doctor)
+    elif patient:
+        appointments = Appointment.objects.filter(patient=patient)
+    else:
+        return JsonResponse({'error': 'User profile not found.'}, status=404)
+
+    filter_type = request.GET.get('filter', 'all')
+    today = timezone.now().date()
+    if filter_type == 'today':
+        appointments = appointments.filter(appointment_date=today)
+    elif filter_type == 'upcoming':
+        appointments = appointments.filter(appointment_date__gte=today)
+
+    appointments = appointments.select_related('patient__user', 'doctor__user').order_by('appointment_date', 'appointment_time')
+    return JsonResponse({
+        'filter': filter_type,
+        'appointments': [_appointment_json(appointment) async for appointment in appointments],
+    })
+
+@login_required
+async def dashboard_stats_api(request):
+    """JSON appointment and prescription counts for the logged-in doctor or patient"""
+    user = await _auser(request)
+    doctor, patient = await asyncio.gather(
+        Doctor.objects.filter(user=user).afirst(),
+        Patient.objects.filter(user=user).afirst(),
+    )
+    if doctor:
+        appointments = Appointment.objects.filter(doctor=doctor)
+        prescriptions = Prescription.objects.filter(doctor=doctor)
+    elif patient:
+        appointments = Appointment.objects.filter(patient=patient)
+        prescriptions = Prescription.objects.filter(patient=patient)
+    else:
+        return JsonResponse({'error': 'User profile not found.'}, status=404)
+
+    today = timezone.now().date()
+    total, today_count, upcoming, pending, prescriptions_count = await asyncio.gather(
+        appointments.acount(),
+        appointments.filter(appointment_date=today).acount(),
+        appointments.filter(appointment_date__gte=today).acount(),
+        appointments.filter(status='pending').acount(),
+        prescriptions.acount(),
+    )
+    return JsonResponse({
+        'appointments': {
+            'total': total,
+            'today': today_count,
+            'upcoming': upcoming,
+            'pending': pending,
+        },
+        'prescriptions': prescriptions_count,
+    })
+
+@login_required
+def patient_timeline_api(request, id):
+    """JSON page of a patient's timeline (?cursor=<next_cursor>&limit=<n>), for the patient, doctors and staff"""
+    from .timeline import TIMELINE_PAGE_SIZE, patient_timeline
+
+    try:
+        patient = Patient.objects.select_related('user').get(id=id)
+    except Patient.DoesNotExist:
+        return JsonResponse({'error': 'Patient not found.'}, status=404)
+    if patient.user_id != request.user.id and not request.user.is_staff and not Doctor.objects.filter(user=request.user).exists():
+        return JsonResponse({'error': 'Access denied.'}, status=403)
+
+    try:
+        limit = int(request.GET.get('limit', TIMELINE_PAGE_SIZE))
+        events, next_cursor = patient_timeline(patient, request.GET.get('cursor') or None, limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'events': events,
+        'next_cursor': next_cursor,
+    })
+
+@login_required
+def medication_autocomplete_api(request):
+    """JSON medication names starting with ?q=, from the reference data"""
+    from .medications import get_medication_index
+
+    results = get_medication_index().autocomplete(request.GET.get('q', ''))
+    return JsonResponse({
+        'results': [{'name': name, 'drug_class': drug_class} for name, drug_class in results],
+    })
+
+@login_required
+def doctor_search_api(request):
+    """JSON doctors whose name or specialization matches ?q=, optionally of one ?specialization="""
+    from .directory import get_doctor_directory
+
+    results = get_doctor_directory().search(request.GET.get('q', ''), request.GET.get('specialization', ''))
+    return JsonResponse({
+        'results': [
+            {'id': entry.id, 'name': entry.name, 'specialization': entry.specialization} for entry in results
+        ],
+    })
+
+@login_required
+def doctor_patients_api(request):
+    """JSON page of the logged-in doctor's patients matching ?q=, for the patient picker (?page=)"""
+    from .patients import search_doctor_patients
+
+    doctor = Doctor.objects.filter(user=request.user).first()
+    if not doctor:
+        return JsonResponse({'error': 'Doctor profile not found.'}, status=404)
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid page.'}, status=400)
+
+    links, has_next = search_doctor_patients(doctor, request.GET.get('q', ''), page)
+    return JsonResponse({
+        'results': [
+            {
+                'id': link.patient_id,
+                'name': link.patient.full_name,
+                'phone': link.patient.phone,
+                'last_visit': link.last_visit.isoformat(),
+                'visit_count': link.visit_count,
+            }
+            for link in links
+        ],
+        'page': page,
+        'has_next': has_next,
+    })
+
+# Seconds between keep-alive comments on idle event streams
+EVENT_STREAM_KEEPALIVE = 15
+
+@login_required
+async def appointment_events(request):
+    """
+    Server-Sent Events stream of the logged-in user's appointment updates.
+
+    Each open stream holds its connection for as long as the page is open, so
+    this view must be served under ASGI (healthcare/asgi.py); under WSGI every
+    stream would tie up a worker thread.
+    """
+    user = await _auser(request)
+    queue = broker.subscribe(user.id)
+
+    async def stream():
+        try:
+            # Have the browser wait a few seconds before reconnecting after a drop
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EVENT_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Comment lines keep proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event['appointment'])}\n\n"
+        finally:
+            broker.unsubscribe(user.id, queue)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
 def test_csrf(request):
     """Test view to verify CSRF token functionality"""
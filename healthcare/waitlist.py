@@ -0,0 +1,232 @@
+"""
+Waitlist for slots freed by cancelled appointments.
+
+Patients join the waitlist for a doctor, for any doctor of a specialization,
+or for any doctor, within a date window. When an appointment is cancelled
+with save() (as the cancel_appointment view does), its slot goes to the
+first matching entry in the queue order (priority, then the time the entry
+was made). The lookup walks the ``waitlist_queue_idx`` index and stops at
+the first match, so it doesn't scan the whole waitlist. Bulk cancellations,
+such as approved time off, don't free slots for the waitlist.
+
+The slot is held for the chosen patient for ``WAITLIST_OFFER_TTL_MINUTES``.
+The cancelled appointment row keeps the slot, so nobody else can book it while
+the offer is open. Accepting the offer books the slot for the waitlisted
+patient and withdraws the messages about the slot that haven't been sent yet,
+such as the previous patient's reminders. Declining it, leaving the waitlist, or letting the offer lapse passes
+the slot to the next entry. Lapsed offers are picked up by the
+``expire_waitlist_offers`` management command (run it from cron every minute).
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Appointment, WaitlistEntry
+
+logger = logging.getLogger(__name__)
+
+
+def _slot_start(appointment):
+    return timezone.make_aware(datetime.combine(appointment.appointment_date, appointment.appointment_time))
+
+
+def _wants_doctor(doctor):
+    """Match waitlist entries that would take a slot with this doctor"""
+    return (
+        Q(doctor_id=doctor.pk)
+        | Q(doctor__isnull=True, specialization='')
+        | Q(doctor__isnull=True, specialization__iexact=doctor.specialization or '')
+    )
+
+
+def _patient_is_busy(date, time):
+    """Subquery for patients who already have an appointment at the slot"""
+    return Exists(
+        Appointment.objects
+        .filter(patient_id=OuterRef('patient_id'), appointment_date=date, appointment_time=time)
+        .exclude(status='cancelled')
+    )
+
+
+def _is_held(appointment, now):
+    return WaitlistEntry.objects.filter(
+        status='offered', offered_appointment=appointment, offer_expires_at__gt=now,
+    ).exists()
+
+
+def _make_offer(entry, appointment, now):
+    from .notifications import queue_waitlist_offer
+
+    entry.status = 'offered'
+    entry.offered_appointment = appointment
+    entry.offer_expires_at = now + timedelta(minutes=settings.WAITLIST_OFFER_TTL_MINUTES)
+    entry.save(update_fields=['status', 'offered_appointment', 'offer_expires_at', 'updated_at'])
+    queue_waitlist_offer(entry)
+    logger.info(f'Offered appointment slot {appointment.pk} to waitlist entry {entry.pk}')
+
+
+def offer_slot(appointment_id, exclude=()):
+    """
+    Offer the slot of a cancelled appointment to the next waitlisted patient.
+
+    ``exclude`` lists entries that must not get the slot, e.g. the one that
+    just declined it.
+
+    Returns:
+        WaitlistEntry: The entry the slot is now held for, or None
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Locking the slot makes concurrent offers of it queue up
+        appointment = (
+            Appointment.objects.select_for_update().select_related('doctor')
+            .filter(pk=appointment_id, status='cancelled').first()
+        )
+        if appointment is None or _slot_start(appointment) <= now or _is_held(appointment, now):
+            return None
+
+        date, time = appointment.appointment_date, appointment.appointment_time
+        entry = (
+            WaitlistEntry.objects
+            .select_for_update(skip_locked=True)
+            .select_related('patient__user')
+            .filter(status='waiting', earliest_date__lte=date, latest_date__gte=date)
+            .filter(_wants_doctor(appointment.doctor))
+            .exclude(patient_id=appointment.patient_id)
+            .exclude(pk__in=exclude)
+            .exclude(_patient_is_busy(date, time))
+            .order_by('-priority', 'created_at')
+            .first()
+        )
+        if entry is not None:
+            _make_offer(entry, appointment, now)
+        return entry
+
+
+def offer_open_slot(entry):
+    """
+    Offer a new waitlist entry the earliest cancelled slot that nobody holds.
+
+    Returns:
+        Appointment: The slot now held for the entry, or None
+    """
+    now = timezone.localtime()
+    held = WaitlistEntry.objects.filter(
+        status='offered', offered_appointment=OuterRef('pk'), offer_expires_at__gt=now,
+    )
+    doctor_filter = Q(doctor_id=entry.doctor_id) if entry.doctor_id else (
+        Q(doctor__specialization__iexact=entry.specialization) if entry.specialization else Q()
+    )
+    busy = Appointment.objects.filter(
+        patient_id=entry.patient_id, appointment_date=OuterRef('appointment_date'),
+        appointment_time=OuterRef('appointment_time'),
+    ).exclude(status='cancelled')
+
+    with transaction.atomic():
+        entry = WaitlistEntry.objects.select_for_update().select_related('patient__user').get(pk=entry.pk)
+        if entry.status != 'waiting':
+            return None
+        appointment = (
+            Appointment.objects
+            .select_for_update(skip_locked=True)
+            .filter(doctor_filter, status='cancelled',
+                    appointment_date__range=(max(entry.earliest_date, now.date()), entry.latest_date))
+            .exclude(appointment_date=now.date(), appointment_time__lte=now.time())
+            .exclude(patient_id=entry.patient_id)
+            .exclude(Exists(held))
+            .exclude(Exists(busy))
+            .order_by('appointment_date', 'appointment_time')
+            .first()
+        )
+        if appointment is not None:
+            _make_offer(entry, appointment, now)
+        return appointment
+
+
+def accept_offer(entry):
+    """
+    Book the slot held for a waitlist entry.
+
+    Returns:
+        Appointment: The booked appointment, or None when the offer is no
+        longer open
+    """
+    from .caching import bump_data_version
+    from .notifications import cancel_pending_notifications
+
+    now = timezone.now()
+    with transaction.atomic():
+        entry = WaitlistEntry.objects.select_for_update(of=('self',)).select_related('patient').get(pk=entry.pk)
+        if entry.status != 'offered' or entry.offer_expires_at <= now or not entry.offered_appointment_id:
+            return None
+        appointment = (
+            Appointment.objects.select_for_update(of=('self',)).select_related('patient')
+            .filter(pk=entry.offered_appointment_id, status='cancelled').first()
+        )
+        if appointment is None or _slot_start(appointment) <= now:
+            return None
+
+        # The slot leaves the dashboard of the patient who cancelled it and joins the waitlisted patient's
+        user_ids = (appointment.patient.user_id, entry.patient.user_id)
+        transaction.on_commit(lambda: bump_data_version(*user_ids))
+        # Reminders still queued for the patient who cancelled, and the offer itself, are stale now
+        cancel_pending_notifications(appointment.pk, f'Booked from waitlist entry {entry.pk}')
+        appointment.patient_id = entry.patient_id
+        appointment.status = 'pending'
+        appointment.reason = entry.reason or 'Booked from the waitlist'
+        appointment.series = None
+        appointment.save()
+        entry.status = 'booked'
+        entry.save(update_fields=['status', 'updated_at'])
+    logger.info(f'Waitlist entry {entry.pk} booked appointment {appointment.pk}')
+    return appointment
+
+
+def release_offer(entry, status='waiting', lapsed_by=None):
+    """
+    Give up the slot held for an entry and pass it to the next one.
+
+    Declined and lapsed offers put the entry back in the queue; leaving the
+    waitlist uses status 'cancelled'. With ``lapsed_by``, the offer is only
+    released if it had lapsed by then (it may have been accepted meanwhile).
+    """
+    with transaction.atomic():
+        entry = WaitlistEntry.objects.select_for_update().get(pk=entry.pk)
+        if lapsed_by and not (entry.status == 'offered' and entry.offer_expires_at <= lapsed_by):
+            return
+        if entry.status not in ('waiting', 'offered'):
+            return
+        appointment_id = entry.offered_appointment_id if entry.status == 'offered' else None
+        entry.status = status
+        entry.offered_appointment = None
+        entry.offer_expires_at = None
+        entry.save(update_fields=['status', 'offered_appointment', 'offer_expires_at', 'updated_at'])
+    if appointment_id:
+        offer_slot(appointment_id, exclude=[entry.pk])
+
+
+def expire_offers(now=None):
+    """
+    Pass lapsed offers on to the next patient and close entries whose window has passed.
+
+    Returns:
+        dict: Number of offers that lapsed and of entries that expired
+    """
+    now = now or timezone.now()
+    lapsed = list(
+        WaitlistEntry.objects
+        .filter(status='offered', offer_expires_at__lte=now)
+        .only('pk', 'status', 'offered_appointment_id')
+    )
+    for entry in lapsed:
+        release_offer(entry, lapsed_by=now)
+    expired = WaitlistEntry.objects.filter(
+        status='waiting', latest_date__lt=timezone.localdate(now),
+    ).update(status='expired', updated_at=now)
+    logger.info(f'{len(lapsed)} waitlist offers lapsed, {expired} waitlist entries expired')
+    return {'lapsed': len(lapsed), 'expired': expired}